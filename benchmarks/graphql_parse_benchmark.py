@@ -0,0 +1,217 @@
+"""Compares parsing membersWithRole pages with .json() and with the streaming parser.
+
+Each synthetic page is shaped like a GitHub GraphQL response. The `.json()` path parses the
+whole response and copies each node out, as get_all_user_details did. The streaming path uses
+parse_members_page. Both are checked to produce the same members before timings are reported.
+
+CPU time is the fastest of several runs over every page. Allocations are measured with
+tracemalloc for one page: the peak traced memory and the number of blocks still allocated
+for the parsed result.
+
+The pages are then served from a local HTTP server and fetched both ways: with a plain
+requests POST and `.json()`, and with StreamingGraphQLInterface, which parses from the
+socket. That reports the wall time per page and the peak traced memory for one request.
+
+Usage:
+
+    poetry run python benchmarks/graphql_parse_benchmark.py --page-size 100 --pages 200
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import threading
+import timeit
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from graphql_stream import (  # noqa: E402
+    StreamingGraphQLInterface,
+    ijson,
+    parse_members_page,
+)
+from synthetic import iter_members  # noqa: E402
+
+REPEATS = 5
+
+
+def make_pages(page_size: int, pages: int) -> list[bytes]:
+    """Builds GraphQL response bodies for a synthetic organisation."""
+    members = list(iter_members(page_size * pages))
+    bodies = []
+    for index in range(pages):
+        nodes = [
+            {
+                "login": username,
+                "databaseId": account_id,
+                "organizationVerifiedDomainEmails": emails,
+            }
+            for username, emails, account_id in members[
+                index * page_size : (index + 1) * page_size
+            ]
+        ]
+        bodies.append(
+            json.dumps(
+                {
+                    "data": {
+                        "organization": {
+                            "membersWithRole": {
+                                "pageInfo": {
+                                    "hasNextPage": index + 1 < pages,
+                                    "endCursor": f"Y3Vyc29yOnYyOpH{index:08d}",
+                                },
+                                "nodes": nodes,
+                            }
+                        }
+                    }
+                }
+            ).encode("utf-8")
+        )
+    return bodies
+
+
+def parse_with_json(body: bytes):
+    """Parses a page the way .json() does and copies the nodes out."""
+    members_conn = json.loads(body)["data"]["organization"]["membersWithRole"]
+    page_info = members_conn["pageInfo"]
+    return (
+        page_info["hasNextPage"],
+        page_info["endCursor"],
+        [
+            (
+                node.get("login"),
+                node.get("databaseId"),
+                node.get("organizationVerifiedDomainEmails", []),
+            )
+            for node in members_conn["nodes"]
+        ],
+    )
+
+
+def allocations(parse, body: bytes) -> tuple[int, int]:
+    """Returns the peak traced bytes while parsing a page, and the blocks kept afterwards."""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    result = parse(body)
+    blocks = sum(
+        stat.count for stat in tracemalloc.take_snapshot().statistics("filename")
+    )
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak, blocks
+
+
+def serve_pages(bodies: list[bytes]) -> ThreadingHTTPServer:
+    """Starts a local server answering each POST with the next page, in turn."""
+    pages = itertools.cycle(bodies)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            body = next(pages)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def fetch_with_json(session: requests.Session, url: str):
+    """Fetches a page with a plain POST and parses it with .json()."""
+    response = session.post(url, json={"query": "", "variables": {}}, timeout=30)
+    members_conn = response.json()["data"]["organization"]["membersWithRole"]
+    page_info = members_conn["pageInfo"]
+    return (
+        page_info["hasNextPage"],
+        page_info["endCursor"],
+        [
+            (
+                node.get("login"),
+                node.get("databaseId"),
+                node.get("organizationVerifiedDomainEmails", []),
+            )
+            for node in members_conn["nodes"]
+        ],
+    )
+
+
+def http_comparison(bodies: list[bytes]) -> None:
+    """Fetches every page from a local server both ways and prints the results."""
+    server = serve_pages(bodies)
+    url = f"http://127.0.0.1:{server.server_address[1]}/graphql"
+    session = requests.Session()
+    streaming = StreamingGraphQLInterface("benchmark", url=url)
+    fetchers = (
+        ("json", lambda: fetch_with_json(session, url)),
+        ("streaming", lambda: streaming.make_ql_request("", {}).parse_members_page()),
+    )
+
+    print("  over HTTP from a local server")
+    for name, fetch in fetchers:
+        elapsed = min(
+            timeit.repeat(lambda: [fetch() for _ in bodies], number=1, repeat=REPEATS)
+        )
+        fetch()
+        tracemalloc.start()
+        fetch()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(
+            f"  {name:<10} {elapsed / len(bodies) * 1_000_000:8.1f} µs wall / page  "
+            f"{peak:>9,} B peak"
+        )
+    server.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=200)
+    args = parser.parse_args()
+
+    if ijson is None:
+        print("ijson is not installed; install the streaming extra to compare")
+        return
+
+    bodies = make_pages(args.page_size, args.pages)
+    for body in bodies:
+        if parse_with_json(body) != parse_members_page(body):
+            raise AssertionError("streaming parse differs from .json()")
+
+    print(
+        f"{args.pages} pages of {args.page_size} members, ijson backend {ijson.backend}"
+    )
+    for name, parse in (("json", parse_with_json), ("streaming", parse_members_page)):
+        elapsed = min(
+            timeit.repeat(
+                lambda: [parse(body) for body in bodies], number=1, repeat=REPEATS
+            )
+        )
+        peak, blocks = allocations(parse, bodies[0])
+        print(
+            f"  {name:<10} {elapsed / len(bodies) * 1_000_000:8.1f} µs CPU / page  "
+            f"{peak:>9,} B peak  {blocks:>6,} blocks kept"
+        )
+
+    http_comparison(bodies)
+
+
+if __name__ == "__main__":
+    main()
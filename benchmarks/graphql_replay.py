@@ -0,0 +1,176 @@
+"""Replays a GraphQL recording, for profiling runs against real traffic offline.
+
+Recordings are made with GRAPHQL_RECORDING (see docs/technical_documentation/api_graphql_recorder.md).
+
+    # Page through a recording with GitHubServices and print where the time went
+    poetry run python benchmarks/graphql_replay.py profile recording.jsonl --latency-scale 0.5
+
+    # Serve a recording over HTTP, for tools which make their own requests
+    poetry run python benchmarks/graphql_replay.py serve recording.jsonl --port 8080
+
+    # Record a synthetic organisation, to try the above without a real recording
+    poetry run python benchmarks/graphql_replay.py synthesize recording.jsonl --members 10000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from github_services import GitHubServices  # noqa: E402
+from graphql_recorder import (  # noqa: E402
+    RecordingGraphQLInterface,
+    ReplayGraphQLInterface,
+    load_recording,
+    make_replay_server,
+)
+from synthetic import iter_members  # noqa: E402
+from tracing import Tracer  # noqa: E402
+
+PAGE_SIZE = 100
+
+
+class QuietLogger:
+    """Drops GitHubServices' warnings, which would swamp the profile."""
+
+    def log_info(self, message: str) -> None:
+        pass
+
+    def log_warning(self, message: str) -> None:
+        pass
+
+    def log_error(self, message: str) -> None:
+        print(message, file=sys.stderr)
+
+
+class SyntheticResponse:
+    def __init__(self, body: dict):
+        self.status_code = 200
+        self.headers = {"content-type": "application/json"}
+        self.body = body
+
+    def json(self) -> dict:
+        return self.body
+
+
+class SyntheticQL:
+    """Serves a synthetic organisation in pages, taking page_ms per page."""
+
+    def __init__(self, members: int, page_ms: float):
+        self.members = list(iter_members(members))
+        self.page_ms = page_ms
+
+    def make_ql_request(self, query: str, params: dict) -> SyntheticResponse:
+        time.sleep(self.page_ms / 1000)
+        start = int(params["cursor"] or 0)
+        end = start + PAGE_SIZE
+        return SyntheticResponse(
+            {
+                "data": {
+                    "organization": {
+                        "membersWithRole": {
+                            "pageInfo": {
+                                "hasNextPage": end < len(self.members),
+                                "endCursor": f"{end:012d}",
+                            },
+                            "nodes": [
+                                {
+                                    "login": username,
+                                    "databaseId": account_id,
+                                    "organizationVerifiedDomainEmails": emails,
+                                }
+                                for username, emails, account_id in self.members[
+                                    start:end
+                                ]
+                            ],
+                        }
+                    }
+                }
+            }
+        )
+
+
+def profile(args: argparse.Namespace) -> None:
+    tracer = Tracer()
+    replay = ReplayGraphQLInterface(load_recording(args.recording), args.latency_scale)
+    services = GitHubServices(
+        "replay", QuietLogger(), None, "", "", tracer=tracer, ql=replay
+    )
+
+    start = time.perf_counter()
+    user_to_email, _, _ = services.get_all_user_details()
+    elapsed = (time.perf_counter() - start) * 1000
+
+    print(f"{len(user_to_email):,} members in {elapsed:,.1f} ms")
+    print(json.dumps(tracer.summary(), indent=2))
+    if args.trace:
+        tracer.write_chrome_trace(args.trace)
+        print(f"Wrote Chrome trace to {args.trace}")
+
+
+def serve(args: argparse.Namespace) -> None:
+    server = make_replay_server(
+        load_recording(args.recording), args.host, args.port, args.latency_scale
+    )
+    host, port = server.server_address[:2]
+    print(f"Replaying {args.recording} at http://{host}:{port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def synthesize(args: argparse.Namespace) -> None:
+    recorder = RecordingGraphQLInterface(
+        SyntheticQL(args.members, args.page_ms), args.recording, org="synthetic"
+    )
+    GitHubServices(
+        "synthetic", QuietLogger(), None, "", "", ql=recorder
+    ).get_all_user_details()
+    recorder.close()
+    print(f"Recorded {recorder.exchanges} pages to {args.recording}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    profile_parser = commands.add_parser("profile", help="Page through a recording")
+    profile_parser.add_argument("recording")
+    profile_parser.add_argument("--latency-scale", type=float, default=1.0)
+    profile_parser.add_argument("--trace", help="Write a Chrome trace to this path")
+    profile_parser.set_defaults(run=profile)
+
+    serve_parser = commands.add_parser("serve", help="Serve a recording over HTTP")
+    serve_parser.add_argument("recording")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8080)
+    serve_parser.add_argument("--latency-scale", type=float, default=1.0)
+    serve_parser.set_defaults(run=serve)
+
+    synthesize_parser = commands.add_parser(
+        "synthesize", help="Record a synthetic organisation"
+    )
+    synthesize_parser.add_argument(
+        "recording",
+        nargs="?",
+        default=os.path.join(tempfile.gettempdir(), "synthetic.jsonl"),
+    )
+    synthesize_parser.add_argument("--members", type=int, default=10_000)
+    synthesize_parser.add_argument("--page-ms", type=float, default=0)
+    synthesize_parser.set_defaults(run=synthesize)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Compares the peak memory of a run with the in-memory and SQLite member stores.
+
+Each run adds a synthetic organisation to a store in pages of 100, as get_all_user_details
+does, then writes the three JSON lookup files. Every run happens in a fresh process so its
+peak resident set size (ru_maxrss) can be reported on its own.
+
+Usage:
+
+    poetry run python benchmarks/member_store_benchmark.py --members 10000 100000 200000
+"""
+
+import argparse
+import itertools
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from member_store import InMemoryMemberStore, SqliteMemberStore  # noqa: E402
+from serializer import JsonSerializer  # noqa: E402
+from synthetic import iter_members  # noqa: E402
+
+PAGE_SIZE = 100
+STORES = {"memory": InMemoryMemberStore, "sqlite": SqliteMemberStore}
+
+
+def measure(store_name: str, members: int) -> dict:
+    """Runs one store in this process and returns its timings and peak RSS."""
+    start = time.perf_counter()
+    store = STORES[store_name]()
+
+    generated = iter_members(members)
+    while page := list(itertools.islice(generated, PAGE_SIZE)):
+        store.add_members(page)
+
+    serializer = JsonSerializer()
+    written = 0
+    with tempfile.TemporaryFile() as output:
+        for data in store.views():
+            output.seek(0)
+            written += serializer.dump(data, output)
+
+    store.close()
+
+    return {
+        "seconds": time.perf_counter() - start,
+        "bytes": written,
+        # Kilobytes on Linux
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def run(members: int) -> None:
+    print(f"\n{members} members")
+    for store_name in STORES:
+        result = subprocess.run(
+            [sys.executable, __file__, "--child", store_name, str(members)],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        measured = json.loads(result.stdout)
+        print(
+            f"  {store_name:<7} {measured['max_rss_mb']:8.1f} MB peak RSS  "
+            f"{measured['seconds'] * 1000:9.1f} ms  {measured['bytes']:>12,} B written"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--members", type=int, nargs="+", default=[10_000, 100_000, 200_000]
+    )
+    parser.add_argument(
+        "--child", nargs=2, metavar=("STORE", "MEMBERS"), help=argparse.SUPPRESS
+    )
+    args = parser.parse_args()
+
+    if args.child:
+        store_name, members = args.child
+        print(json.dumps(measure(store_name, int(members))))
+        return
+
+    for members in args.members:
+        run(members)
+
+
+if __name__ == "__main__":
+    main()
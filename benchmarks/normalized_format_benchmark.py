@@ -0,0 +1,84 @@
+"""Compares the normalized address book with the three JSON lookup files.
+
+For each synthetic organisation it reports the bytes stored (and transferred with gzip) and
+the time a consumer takes to parse the files, and to rebuild the three maps from the
+normalized file. The rebuilt maps are checked against the originals before timings are
+reported.
+
+Usage:
+
+    poetry run python benchmarks/normalized_format_benchmark.py --members 10000 100000 200000
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from normalized_format import (  # noqa: E402
+    build_normalized_address_book,
+    expand_normalized_address_book,
+)
+from serializer import JsonSerializer  # noqa: E402
+from synthetic import make_address_book  # noqa: E402
+
+REPEATS = 5
+
+
+def best_of(function) -> float:
+    """Returns the fastest of several runs in milliseconds."""
+    return min(timeit.repeat(function, number=1, repeat=REPEATS)) * 1000
+
+
+def run(members: int) -> None:
+    maps = make_address_book(members)
+    # Serialized as the sinks publish them
+    files = [JsonSerializer("json").dumps(data) for data in maps]
+    normalized = JsonSerializer("json", compact=True).dumps(
+        build_normalized_address_book(*maps)
+    )
+
+    if expand_normalized_address_book(json.loads(normalized)) != maps:
+        raise AssertionError("The normalized file doesn't rebuild the same maps")
+
+    rows = [
+        (
+            "three JSON files",
+            sum(map(len, files)),
+            sum(len(gzip.compress(body)) for body in files),
+            best_of(lambda: [json.loads(body) for body in files]),
+        ),
+        (
+            "normalized",
+            len(normalized),
+            len(gzip.compress(normalized)),
+            best_of(lambda: json.loads(normalized)),
+        ),
+    ]
+    expand = best_of(lambda: expand_normalized_address_book(json.loads(normalized)))
+
+    print(f"\n{members} members")
+    for name, size, compressed, parse in rows:
+        print(
+            f"  {name:<17} {size:>12,} B  gzip {compressed:>11,} B  parse {parse:8.2f} ms"
+        )
+    print(f"  normalized parse and rebuild maps {expand:8.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--members", type=int, nargs="+", default=[10_000, 100_000, 200_000]
+    )
+    args = parser.parse_args()
+
+    for members in args.members:
+        run(members)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Compares serializing the three address book maps serially and across worker processes.
+
+The maps are serialized as S3JsonSink does, once one after another and once with
+ParallelSerializer for each worker count. Output is checked to be byte-identical before
+timings are reported. Speed-ups need a full vCPU per worker, which Lambda gives for each
+1,769 MB of memory.
+
+Usage:
+
+    poetry run python benchmarks/parallel_serializer_benchmark.py --members 100000 200000 --workers 2 4
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from parallel_serializer import ParallelSerializer, available_cpus  # noqa: E402
+from serializer import JsonSerializer  # noqa: E402
+from synthetic import make_address_book  # noqa: E402
+
+REPEATS = 5
+
+
+def best_of(function) -> float:
+    """Returns the fastest of several runs in milliseconds."""
+    return min(timeit.repeat(function, number=1, repeat=REPEATS)) * 1000
+
+
+def run(members: int, worker_counts: list[int], backend: str) -> None:
+    maps = list(make_address_book(members))
+    serializer = JsonSerializer(backend)
+
+    reference = [serializer.dumps(data) for data in maps]
+    baseline = best_of(lambda: [serializer.dumps(data) for data in maps])
+
+    print(f"\n{members} members, {sum(map(len, reference)):,} B")
+    print(f"  serial     {baseline:8.2f} ms")
+    for workers in worker_counts:
+        parallel = ParallelSerializer(serializer, workers=workers, min_entries=0)
+        if parallel.dumps_many(maps) != reference:
+            raise AssertionError(f"Output differs with {workers} workers")
+
+        elapsed = best_of(lambda: parallel.dumps_many(maps))
+        print(f"  {workers} workers  {elapsed:8.2f} ms ({baseline / elapsed:4.1f}x)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--members", type=int, nargs="+", default=[100_000, 200_000])
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--backend", default="auto")
+    args = parser.parse_args()
+
+    print(f"{available_cpus()} CPUs available")
+    for members in args.members:
+        run(members, args.workers, args.backend)
+
+
+if __name__ == "__main__":
+    main()
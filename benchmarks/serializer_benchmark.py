@@ -0,0 +1,73 @@
+"""Compares the JSON serializer backends on synthetic address book maps.
+
+Each map is serialized with the stdlib backend and, when installed, the orjson backend in
+compatibility mode. Output is checked to be byte-identical before timings are reported.
+
+Usage:
+
+    poetry run python benchmarks/serializer_benchmark.py --members 10000 50000 100000 200000
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from serializer import JsonSerializer, orjson  # noqa: E402
+from synthetic import make_address_book  # noqa: E402
+
+REPEATS = 5
+
+
+def best_of(function) -> float:
+    """Returns the fastest of several runs in milliseconds."""
+    return min(timeit.repeat(function, number=1, repeat=REPEATS)) * 1000
+
+
+def run(members: int) -> None:
+    maps = dict(
+        zip(
+            ("user_to_email", "email_to_user", "user_to_id"),
+            make_address_book(members),
+        )
+    )
+
+    backends = [JsonSerializer("json")]
+    if orjson is not None:
+        backends.append(JsonSerializer("orjson"))
+
+    print(f"\n{members} members")
+    for name, data in maps.items():
+        reference = backends[0].dumps(data)
+        timings = []
+        for backend in backends:
+            if backend.dumps(data) != reference:
+                raise AssertionError(f"{backend.backend} output differs for {name}")
+            timings.append((backend.backend, best_of(lambda: backend.dumps(data))))
+
+        baseline = timings[0][1]
+        results = "  ".join(
+            f"{backend}: {elapsed:8.2f} ms ({baseline / elapsed:4.1f}x)"
+            for backend, elapsed in timings
+        )
+        print(f"  {name:<14} {len(reference):>12,} B  {results}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--members", type=int, nargs="+", default=[10_000, 50_000, 100_000, 200_000]
+    )
+    args = parser.parse_args()
+
+    if orjson is None:
+        print("orjson is not installed; only the stdlib backend is measured")
+
+    for members in args.members:
+        run(members)
+
+
+if __name__ == "__main__":
+    main()
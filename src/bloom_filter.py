@@ -0,0 +1,80 @@
+"""This file builds the Bloom filter published for fast "is this an org email" checks
+
+The filter covers the normalised keys of `email_to_user` and is sized for a configurable
+false-positive rate. It is sized from the number of keys and filled as they are iterated, so
+the SQLite member store's map is streamed without a copy of the keys being held in memory. It is read with the dependency-free `bloom_reader` module.
+
+Typical usage example:
+
+    body = build_bloom_filter(email_to_user, false_positive_rate=0.001)
+"""
+
+import math
+from typing import Collection
+
+from bloom_reader import HEADER, MAGIC, VERSION, bit_positions, normalise_key
+
+BLOOM_CONTENT_TYPE = "application/octet-stream"
+DEFAULT_FALSE_POSITIVE_RATE = 0.001
+
+
+def bloom_parameters(item_count: int, false_positive_rate: float) -> tuple[int, int]:
+    """
+    Calculates the optimal bit count and hash count for a filter
+
+    Args:
+        item_count: Number of keys to add
+        false_positive_rate: Target probability of a false positive, between 0 and 1
+
+    Raises:
+        ValueError: If the false-positive rate is not between 0 and 1
+
+    Returns:
+        tuple[int, int]: The number of bits and the number of hashes
+    """
+    if not 0 < false_positive_rate < 1:
+        raise ValueError(
+            f"false_positive_rate must be between 0 and 1, got {false_positive_rate}"
+        )
+
+    if item_count == 0:
+        return 8, 1
+
+    num_bits = math.ceil(
+        -item_count * math.log(false_positive_rate) / (math.log(2) ** 2)
+    )
+    # The hash count is stored in a single byte
+    num_hashes = min(255, max(1, round(num_bits / item_count * math.log(2))))
+
+    return num_bits, num_hashes
+
+
+def build_bloom_filter(
+    keys: Collection[str],
+    false_positive_rate: float = DEFAULT_FALSE_POSITIVE_RATE,
+) -> bytes:
+    """
+    Builds a Bloom filter over the normalised keys
+
+    The filter is sized for len(keys). Keys which only differ by case or whitespace set the
+    same bits, so they make the filter slightly larger than it needs to be but not less
+    accurate.
+
+    Args:
+        keys: The emails to add, e.g. the email_to_user map
+        false_positive_rate: Target probability of a false positive
+
+    Returns:
+        bytes: The filter object, in the layout described in bloom_reader
+    """
+    item_count = len(keys)
+    num_bits, num_hashes = bloom_parameters(item_count, false_positive_rate)
+
+    bits = bytearray((num_bits + 7) // 8)
+    for key in keys:
+        for position in bit_positions(normalise_key(key), num_hashes, num_bits):
+            bits[position >> 3] |= 1 << (position & 7)
+
+    header = HEADER.pack(MAGIC, VERSION, num_hashes, num_bits, item_count)
+
+    return header + bytes(bits)
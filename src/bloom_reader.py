@@ -0,0 +1,124 @@
+"""A tiny reader for the address book's email Bloom filter
+
+This module has no dependencies beyond the standard library, so services that only need to
+know whether an email belongs to an org member can copy it as-is and check emails against
+the few-kilobyte `AddressBook/addressBookEmails.bloom` object instead of downloading
+`addressBookEmailKey.json`.
+
+A Bloom filter never gives false negatives: if `might_contain` returns False the email is
+definitely not a member's. A True answer is wrong at most at the false-positive rate the
+filter was built with.
+
+File layout (little endian):
+
+    magic "ABBF" | version u8 | hash count u8 | 2 reserved bytes | bit count u32 | item count u32 | bit array
+
+Typical usage example:
+
+    bloom = BloomFilterReader.from_bytes(s3_object_body)
+    if bloom.might_contain("someone@ons.gov.uk"):
+        ...
+"""
+
+import hashlib
+import struct
+
+MAGIC = b"ABBF"
+VERSION = 1
+HEADER = struct.Struct("<4sBB2xII")
+
+
+def normalise_key(value: str) -> str:
+    """Trims and lower cases an email so lookups are case-insensitive."""
+    return value.strip().lower()
+
+
+def bit_positions(key: str, num_hashes: int, num_bits: int) -> list[int]:
+    """
+    Returns the bit positions a key sets, using double hashing over one BLAKE2b digest
+
+    Args:
+        key: The email to hash, normalised before hashing
+        num_hashes: Number of positions to derive
+        num_bits: Size of the bit array
+
+    Returns:
+        list[int]: The bit positions
+    """
+    digest = hashlib.blake2b(
+        normalise_key(key).encode("utf-8"), digest_size=16
+    ).digest()
+    first = int.from_bytes(digest[:8], "little")
+    second = int.from_bytes(digest[8:], "little") | 1
+
+    return [(first + i * second) % num_bits for i in range(num_hashes)]
+
+
+class BloomFilterReader:
+    """
+    Answers membership checks against a published address book Bloom filter
+
+    Atrributes:
+        num_hashes: Number of bit positions checked per key
+        num_bits: Size of the bit array
+        item_count: Number of keys the filter was built from
+        bits: The bit array
+
+    Methods:
+        from_bytes: Parses a filter object
+        might_contain: Checks whether a key may be in the set
+    """
+
+    def __init__(self, num_hashes: int, num_bits: int, item_count: int, bits: bytes):
+        """
+        Initialises the BloomFilterReader.
+        """
+        self.num_hashes = num_hashes
+        self.num_bits = num_bits
+        self.item_count = item_count
+        self.bits = bits
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "BloomFilterReader":
+        """
+        Parses a filter object
+
+        Args:
+            data: The object contents
+
+        Raises:
+            ValueError: If the data is not a supported Bloom filter
+
+        Returns:
+            BloomFilterReader: The parsed filter
+        """
+        if len(data) < HEADER.size:
+            raise ValueError("Bloom filter data is too short")
+
+        magic, version, num_hashes, num_bits, item_count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Unsupported Bloom filter format")
+
+        bits = bytes(data[HEADER.size :])
+        if len(bits) * 8 < num_bits or num_hashes < 1:
+            raise ValueError("Bloom filter data is truncated")
+
+        return cls(num_hashes, num_bits, item_count, bits)
+
+    def might_contain(self, key: str) -> bool:
+        """
+        Checks whether a key may be in the set
+
+        Args:
+            key: The email to check
+
+        Returns:
+            bool: False if the key is definitely absent, True if it is probably present
+        """
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in bit_positions(key, self.num_hashes, self.num_bits)
+        )
+
+    def __contains__(self, key: str) -> bool:
+        return self.might_contain(key)
@@ -1,5 +1,8 @@
 from typing import Tuple, Any
 import github_api_toolkit
+from tracing import NULL_TRACER
+from member_store import InMemoryMemberStore
+import graphql_stream
 
 
 class GitHubServices:
@@ -10,12 +13,16 @@ class GitHubServices:
         secret_manager: Any,
         secret_name: str,
         app_client_id: str,
+        tracer: Any = None,
+        ql: Any = None,
+        stream_parse: bool = False,
     ):
         """
         Initialises the GitHub Services Class
 
         Raises:
             Exception: if GitHub app installation token is not found
+            ImportError: if stream_parse is set but ijson is not installed
 
         Args:
             org - Organisation name
@@ -23,12 +30,23 @@ class GitHubServices:
             secret_manager - The S3 secrets manager
             secret_name - Secret name for AWS
             app_client_id - GitHub App Client ID
+            tracer - Optional Tracer timing the token fetch and each GraphQL page
+            ql - Optional GraphQL interface to use instead of authenticating with GitHub,
+                such as a graphql_recorder.ReplayGraphQLInterface
+            stream_parse - Request pages with graphql_stream.StreamingGraphQLInterface, which
+                parses each body as it is read from the connection instead of with .json()
         """
 
         self.org = org
         self.logger = logger
+        self.tracer = tracer or NULL_TRACER
 
-        token = self.get_access_token(secret_manager, secret_name, app_client_id)
+        if ql is not None:
+            self.ql = ql
+            return
+
+        with self.tracer.span("github.get_access_token"):
+            token = self.get_access_token(secret_manager, secret_name, app_client_id)
 
         # Ensure we have a valid token tuple before proceeding
         if not isinstance(token, tuple):
@@ -39,7 +57,10 @@ class GitHubServices:
 
         access_token = token[0]
 
-        self.ql = github_api_toolkit.github_graphql_interface(access_token)
+        if stream_parse:
+            self.ql = graphql_stream.StreamingGraphQLInterface(access_token)
+        else:
+            self.ql = github_api_toolkit.github_graphql_interface(access_token)
 
     def get_access_token(
         self, secret_manager: Any, secret_name: str, app_client_id: str
@@ -79,19 +100,61 @@ class GitHubServices:
 
         return token
 
-    def get_all_user_details(self) -> tuple[dict, dict, dict] | tuple:
+    def parse_page(self, response: Any) -> tuple | None:
+        """
+        Pulls the page info and member nodes out of a membersWithRole response
+
+        Args:
+            response - The GraphQL response. A graphql_stream.StreamedResponse is parsed
+                from the connection, anything else with .json()
+
+        Returns:
+            tuple | None - hasNextPage, endCursor and a (login, databaseId, emails) tuple
+            per node, or None if the organisation was not found
+        """
+        if isinstance(response, graphql_stream.StreamedResponse):
+            return response.parse_members_page()
+
+        response_json = response.json()
+        org_data = response_json.get("data", {}).get("organization")
+
+        if not org_data:
+            return None
+
+        members_conn = org_data.get("membersWithRole", {})
+        page_info = members_conn.get("pageInfo", {})
+
+        return (
+            page_info.get("hasNextPage", False),
+            page_info.get("endCursor"),
+            [
+                (
+                    node.get("login"),
+                    node.get("databaseId"),
+                    node.get("organizationVerifiedDomainEmails", []),
+                )
+                for node in members_conn.get("nodes", [])
+            ],
+        )
+
+    def get_all_user_details(self, store: Any = None) -> tuple:
         """
         Retrieve all the usernames within the GitHub organisation
 
+        Args:
+            store - Optional member store each page is added to, such as a SqliteMemberStore
+                to keep memory use flat for large organisations. Defaults to in-memory dicts.
+
         Returns:
-            list(dict) - members usernames, emails and account ids
+            list(dict) - members usernames, emails and account ids, as the store's maps
         """
 
-        user_to_email = {}
-        email_to_user = {}
-        user_to_id = {}
+        if store is None:
+            store = InMemoryMemberStore()
+
         has_next_page = True
         cursor = None
+        page = 0
 
         while has_next_page:
             query = """
@@ -114,28 +177,23 @@ class GitHubServices:
 
             params = {"org": self.org, "cursor": cursor}
 
-            # Use instance-aware request (passes headers/token and has fallback)
-            response_json = self.ql.make_ql_request(query, params).json()
+            page += 1
 
-            org_data = response_json.get("data", {}).get("organization")
+            # Use instance-aware request (passes headers/token and has fallback)
+            with self.tracer.span("github.graphql_page", page=page):
+                page_data = self.parse_page(self.ql.make_ql_request(query, params))
 
-            if not org_data:
+            if page_data is None:
                 org_error_message = (
                     f"Organisation '{self.org} not found or inaccessible'"
                 )
                 self.logger.log_error(org_error_message)
                 return ("NotFound", org_error_message)
 
-            members_conn = org_data.get("membersWithRole", {})
-            page_info = members_conn.get("pageInfo", {})
-            has_next_page = page_info.get("hasNextPage", False)
-            cursor = page_info.get("endCursor")
-
-            for node in members_conn.get("nodes", []):
-                username = node.get("login")
-                account_id = node.get("databaseId")
-                emails = node.get("organizationVerifiedDomainEmails", [])
+            has_next_page, cursor, nodes = page_data
 
+            page_members = []
+            for username, account_id, emails in nodes:
                 if not username:
                     self.logger.log_warning("Skipping member with empty username")
                     continue
@@ -146,10 +204,8 @@ class GitHubServices:
                     )
                     continue
 
-                user_to_email[username] = emails
-                if account_id is not None:
-                    user_to_id[username] = account_id
-                for address in emails:
-                    email_to_user[address] = username
+                page_members.append((username, emails, account_id))
+
+            store.add_members(page_members)
 
-        return user_to_email, email_to_user, user_to_id
+        return store.views()
@@ -0,0 +1,527 @@
+"""This file records GitHub GraphQL traffic and replays it, for reproducing runs offline
+
+RecordingGraphQLInterface wraps the GraphQL interface used by GitHubServices. Each request and
+response is written as one JSON line with its timings. Logins, emails, account IDs, cursors and
+the organisation name are replaced with keyed pseudonyms of the same length, so a recording
+keeps the sizes and shape of the real traffic without identifying anyone.
+
+A recording can be replayed in-process with ReplayGraphQLInterface, or served over HTTP by
+make_replay_server for HttpGraphQLInterface, with the recorded latencies scaled as needed.
+Requests are matched to responses by their cursor, so pages replay in the order they're asked
+for.
+
+Typical usage example:
+
+    github_services.ql = RecordingGraphQLInterface(github_services.ql, "run.jsonl", org)
+    github_services.get_all_user_details()
+    github_services.ql.close()
+
+    github_services.ql = ReplayGraphQLInterface(load_recording("run.jsonl"), latency_scale=0.5)
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+RECORDING_VERSION = 1
+RECORDING_CONTENT_TYPE = "application/x-ndjson"
+
+# Response headers kept in a recording, for reproducing throttling
+RECORDED_HEADERS = ("content-type", "retry-after", "x-github-request-id")
+RECORDED_HEADER_PREFIXES = ("x-ratelimit-",)
+
+# The alphabet pseudonyms are drawn from, valid in logins, email local parts and domains
+PSEUDONYM_ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789"
+
+
+class Sanitizer:
+    """
+    Replaces identifying values with consistent pseudonyms of the same length
+
+    The same value always gets the same pseudonym within a recording, so members, emails and
+    cursors still line up. Very short values may share a pseudonym.
+
+    Atrributes:
+        org: The organisation name, replaced wherever it appears in a string
+
+    Methods:
+        pseudonym: Returns a same-length pseudonym for a string
+        email: Pseudonymises an email address, keeping its top-level domain
+        text: Replaces the organisation name within free text
+        database_id: Pseudonymises an account ID, keeping its number of digits
+        variables: Sanitizes a request's variables
+        body: Sanitizes a parsed response body
+    """
+
+    def __init__(self, org: str | None = None, key: bytes | None = None):
+        """
+        Initialises the Sanitizer.
+
+        Args:
+            org: The organisation name
+            key: The pseudonym key, random if not given so pseudonyms can't be reversed by
+                hashing guesses
+        """
+        self.org = org
+        self._key = key or os.urandom(32)
+
+    def _digest(self, kind: str, value: str) -> bytes:
+        """Returns a keyed digest of a value, long enough for any pseudonym."""
+        digest = b""
+        counter = 0
+        while len(digest) < len(value):
+            digest += hmac.new(
+                self._key, f"{kind}:{counter}:{value}".encode(), hashlib.sha256
+            ).digest()
+            counter += 1
+        return digest
+
+    def pseudonym(self, value: str, kind: str = "text") -> str:
+        """
+        Returns a same-length pseudonym for a string
+
+        Args:
+            value: The string to replace
+            kind: Namespaces the pseudonym, so e.g. a login and a cursor never collide
+
+        Returns:
+            str: The pseudonym
+        """
+        digest = self._digest(kind, value)
+        return "".join(
+            PSEUDONYM_ALPHABET[digest[index] % len(PSEUDONYM_ALPHABET)]
+            for index in range(len(value))
+        )
+
+    def email(self, address: str) -> str:
+        """Pseudonymises an email address, keeping its top-level domain."""
+        if "@" not in address:
+            return self.pseudonym(address, "email")
+
+        local, _, domain = address.rpartition("@")
+        labels = domain.split(".")
+        return (
+            self.pseudonym(local, "email")
+            + "@"
+            + ".".join(
+                [self.pseudonym(label, "domain") for label in labels[:-1]] + labels[-1:]
+            )
+        )
+
+    def database_id(self, value: int) -> int:
+        """Pseudonymises an account ID, keeping its number of digits."""
+        digits = len(str(abs(value)))
+        low = 10 ** (digits - 1) if digits > 1 else 0
+        span = 10**digits - low
+        return low + int.from_bytes(self._digest("id", str(value))[:8], "big") % span
+
+    def text(self, value: str) -> str:
+        """Replaces the organisation name within free text, such as error messages."""
+        if self.org and self.org in value:
+            return value.replace(self.org, self.pseudonym(self.org, "org"))
+        return value
+
+    def variables(self, variables: dict | None) -> dict | None:
+        """
+        Sanitizes a request's variables
+
+        Args:
+            variables: The GraphQL variables, e.g. {"org": ..., "cursor": ...}
+
+        Returns:
+            dict | None: The variables with the org and cursor pseudonymised
+        """
+        if variables is None:
+            return None
+
+        sanitized = {}
+        for name, value in variables.items():
+            if isinstance(value, str) and name in ("cursor", "after", "before"):
+                value = self.pseudonym(value, "cursor")
+            elif isinstance(value, str) and name in ("org", "login"):
+                value = self.pseudonym(value, "org")
+            sanitized[name] = value
+
+        return sanitized
+
+    def body(self, data: Any, field: str | None = None) -> Any:
+        """
+        Sanitizes a parsed response body
+
+        Args:
+            data: The parsed JSON, or part of it
+            field: The name of the field data was found under
+
+        Returns:
+            Any: A sanitized copy
+        """
+        if isinstance(data, dict):
+            return {name: self.body(value, name) for name, value in data.items()}
+        if isinstance(data, list):
+            return [self.body(value, field) for value in data]
+
+        if isinstance(data, str):
+            if field == "login":
+                return self.pseudonym(data, "login")
+            if field in ("email", "organizationVerifiedDomainEmails"):
+                return self.email(data)
+            if field in ("endCursor", "startCursor", "cursor"):
+                return self.pseudonym(data, "cursor")
+            return self.text(data)
+
+        if (
+            field == "databaseId"
+            and isinstance(data, int)
+            and not isinstance(data, bool)
+        ):
+            return self.database_id(data)
+
+        return data
+
+
+class RecordingGraphQLInterface:
+    """
+    Wraps a GraphQL interface, recording sanitized requests and responses with their timings
+
+    Atrributes:
+        ql: The wrapped interface, e.g. github_api_toolkit.github_graphql_interface
+        path: The JSON lines file the recording is written to
+        sanitizer: Pseudonymises each request and response
+        exchanges: The number of requests recorded
+
+    Methods:
+        make_ql_request: Makes the request through the wrapped interface and records it
+        close: Closes the recording file
+    """
+
+    def __init__(
+        self,
+        ql: Any,
+        path: str,
+        org: str | None = None,
+        sanitizer: Sanitizer | None = None,
+    ):
+        """
+        Initialises the RecordingGraphQLInterface.
+
+        Args:
+            ql: The interface to wrap
+            path: The JSON lines file to write, replaced if it exists
+            org: The organisation name, pseudonymised wherever it appears
+            sanitizer: Pseudonymises the traffic, a Sanitizer for org with a random key if
+                not given
+        """
+        self.ql = ql
+        self.path = path
+        self.sanitizer = sanitizer or Sanitizer(org)
+        self.exchanges = 0
+
+        self._file = open(path, "w", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    def make_ql_request(self, query: str, params: dict | None) -> Any:
+        """
+        Makes the request through the wrapped interface and records it
+
+        Args:
+            query: The GraphQL query
+            params: The query's variables
+
+        Raises:
+            Exception: Whatever the wrapped interface raises, after recording it
+
+        Returns:
+            Any: The wrapped interface's response, unchanged
+        """
+        start = time.perf_counter()
+        exchange: dict[str, Any] = {
+            "version": RECORDING_VERSION,
+            "offset_ms": round((start - self._started) * 1000, 3),
+            "query": query,
+            "variables": self.sanitizer.variables(params),
+        }
+
+        try:
+            response = self.ql.make_ql_request(query, params)
+        except Exception as error:
+            exchange["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            exchange["error"] = self.sanitizer.text(f"{type(error).__name__}: {error}")
+            self._write(exchange)
+            raise
+
+        exchange["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        exchange["status"] = getattr(response, "status_code", 200)
+
+        headers = getattr(response, "headers", None) or {}
+        exchange["headers"] = {
+            name.lower(): value
+            for name, value in headers.items()
+            if name.lower() in RECORDED_HEADERS
+            or name.lower().startswith(RECORDED_HEADER_PREFIXES)
+        }
+
+        try:
+            exchange["body"] = self.sanitizer.body(response.json())
+        except ValueError:
+            exchange["text"] = self.sanitizer.text(getattr(response, "text", ""))
+
+        self._write(exchange)
+        return response
+
+    def _write(self, exchange: dict[str, Any]) -> None:
+        """Appends an exchange to the recording."""
+        line = json.dumps(exchange, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+            self.exchanges += 1
+
+    def close(self) -> None:
+        """Closes the recording file."""
+        with self._lock:
+            self._file.close()
+
+
+def load_recording(path: str) -> list[dict[str, Any]]:
+    """
+    Reads a recording
+
+    Args:
+        path: The JSON lines file written by RecordingGraphQLInterface
+
+    Raises:
+        ValueError: If the recording is from an unsupported version
+
+    Returns:
+        list[dict]: The exchanges, in the order they were recorded
+    """
+    exchanges = []
+    with open(path, encoding="utf-8") as recording:
+        for line in recording:
+            if not line.strip():
+                continue
+            exchange = json.loads(line)
+            if exchange.get("version") != RECORDING_VERSION:
+                raise ValueError(
+                    f"Unsupported recording version {exchange.get('version')} in {path}. "
+                    f"Expected {RECORDING_VERSION}"
+                )
+            exchanges.append(exchange)
+
+    return exchanges
+
+
+class ReplayResponse:
+    """
+    A recorded response, with the parts of requests.Response that GitHubServices uses
+
+    Atrributes:
+        status_code: The recorded HTTP status
+        headers: The recorded headers
+        content: The response body
+    """
+
+    def __init__(self, exchange: dict[str, Any]):
+        """
+        Initialises the ReplayResponse.
+
+        Args:
+            exchange: A recorded exchange
+        """
+        self.status_code = exchange.get("status", 200)
+        self.headers = CaseInsensitiveDict(exchange.get("headers", {}))
+        if "body" in exchange:
+            self.content = json.dumps(exchange["body"], separators=(",", ":")).encode()
+        else:
+            self.content = exchange.get("text", "").encode()
+
+    @property
+    def text(self) -> str:
+        return self.content.decode()
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+
+class ReplayGraphQLInterface:
+    """
+    Serves a recording in place of the GraphQL interface
+
+    Atrributes:
+        latency_scale: Multiplies the recorded latencies, e.g. 0 replays as fast as possible
+
+    Methods:
+        next_exchange: Returns the recorded exchange for a request, after its latency
+        make_ql_request: Returns the recorded response for a request
+    """
+
+    def __init__(
+        self,
+        exchanges: list[dict[str, Any]],
+        latency_scale: float = 1.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        Initialises the ReplayGraphQLInterface.
+
+        Args:
+            exchanges: The recording, from load_recording
+            latency_scale: Multiplies the recorded latencies
+            sleep: Waits for a number of seconds, replaceable for testing
+        """
+        self.latency_scale = latency_scale
+        self.sleep = sleep
+
+        # cursor → its exchanges in recorded order, so retried pages replay as recorded
+        self._exchanges: dict[Any, deque[dict[str, Any]]] = {}
+        for exchange in exchanges:
+            cursor = (exchange.get("variables") or {}).get("cursor")
+            self._exchanges.setdefault(cursor, deque()).append(exchange)
+        self._lock = threading.Lock()
+
+    def next_exchange(self, params: dict | None) -> dict[str, Any]:
+        """
+        Returns the recorded exchange for a request, after its latency
+
+        Args:
+            params: The request's variables
+
+        Raises:
+            LookupError: If nothing more was recorded for the request's cursor
+
+        Returns:
+            dict: The exchange
+        """
+        cursor = (params or {}).get("cursor")
+        with self._lock:
+            queue = self._exchanges.get(cursor)
+            if not queue:
+                raise LookupError(f"No recorded response for cursor {cursor!r}")
+            exchange = queue.popleft()
+
+        delay = exchange.get("elapsed_ms", 0) * self.latency_scale / 1000
+        if delay > 0:
+            self.sleep(delay)
+
+        return exchange
+
+    def make_ql_request(self, query: str, params: dict | None) -> ReplayResponse:
+        """
+        Returns the recorded response for a request
+
+        Args:
+            query: The GraphQL query, not checked
+            params: The query's variables
+
+        Raises:
+            LookupError: If nothing more was recorded for the request's cursor
+            Exception: If the recorded request failed
+
+        Returns:
+            ReplayResponse: The recorded response
+        """
+        exchange = self.next_exchange(params)
+        if "error" in exchange:
+            raise Exception(exchange["error"])
+
+        return ReplayResponse(exchange)
+
+
+class HttpGraphQLInterface:
+    """
+    A minimal GraphQL interface for an HTTP endpoint such as the replay server
+
+    Atrributes:
+        url: The GraphQL endpoint
+
+    Methods:
+        make_ql_request: POSTs the query and variables, as the GitHub interface does
+    """
+
+    def __init__(self, url: str, token: str = "replay", timeout: float = 30):
+        """
+        Initialises the HttpGraphQLInterface.
+
+        Args:
+            url: The GraphQL endpoint
+            token: Sent as the Authorization token
+            timeout: Seconds to wait for each response
+        """
+        self.url = url
+        self.timeout = timeout
+        self._session = requests.Session()
+        self._session.headers["Authorization"] = f"token {token}"
+
+    def make_ql_request(self, query: str, params: dict | None) -> requests.Response:
+        """POSTs the query and variables, as the GitHub interface does."""
+        return self._session.post(
+            self.url,
+            json={"query": query, "variables": params},
+            timeout=self.timeout,
+        )
+
+
+def make_replay_server(
+    exchanges: list[dict[str, Any]],
+    host: str = "127.0.0.1",
+    port: int = 0,
+    latency_scale: float = 1.0,
+) -> ThreadingHTTPServer:
+    """
+    Creates an HTTP server which answers GraphQL POSTs from a recording
+
+    Each response is sent after its scaled recorded latency, with the recorded status and
+    headers. A request the recording has no response for gets a 404, and a request which
+    failed when recorded gets a 502.
+
+    Args:
+        exchanges: The recording, from load_recording
+        host: The address to listen on
+        port: The port to listen on, any free port if 0
+        latency_scale: Multiplies the recorded latencies
+
+    Returns:
+        ThreadingHTTPServer: The server, not yet started. Call serve_forever to start it.
+    """
+    replay = ReplayGraphQLInterface(exchanges, latency_scale)
+
+    class ReplayHandler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+
+            try:
+                exchange = replay.next_exchange(request.get("variables"))
+            except LookupError as error:
+                self._send(404, {}, json.dumps({"message": str(error)}).encode())
+                return
+
+            if "error" in exchange:
+                self._send(502, {}, json.dumps({"message": exchange["error"]}).encode())
+                return
+
+            response = ReplayResponse(exchange)
+            self._send(response.status_code, dict(response.headers), response.content)
+
+        def _send(self, status: int, headers: dict[str, str], body: bytes) -> None:
+            self.send_response(status)
+            headers.setdefault("content-type", "application/json")
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            """Keeps request lines out of profiling output."""
+
+    return ThreadingHTTPServer((host, port), ReplayHandler)
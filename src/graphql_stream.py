@@ -0,0 +1,229 @@
+"""This file parses membersWithRole GraphQL pages as they are read from the socket
+
+Calling `.json()` on a page waits for the whole body, then builds the whole response as nested
+dicts and lists, which are copied into the member store and thrown away.
+StreamingGraphQLInterface instead sends each request with `stream=True` and leaves the body
+unread. parse_members_page then feeds the body to an incremental JSON parser straight from the
+connection. It keeps only each node's login, databaseId and verified emails, plus the page info.
+
+ijson is an optional dependency, installed with `poetry install --extras streaming`. Its C
+backend (yajl2_c) is used when available.
+
+Typical usage example:
+
+    ql = StreamingGraphQLInterface(access_token)
+    page = ql.make_ql_request(query, params).parse_members_page()
+"""
+
+import json
+from typing import Any, BinaryIO
+
+import requests
+
+try:
+    import ijson
+except ImportError:
+    ijson = None  # type: ignore[assignment]
+
+GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+
+ORGANIZATION = "data.organization"
+MEMBERS = ORGANIZATION + ".membersWithRole"
+HAS_NEXT_PAGE = MEMBERS + ".pageInfo.hasNextPage"
+END_CURSOR = MEMBERS + ".pageInfo.endCursor"
+NODE = MEMBERS + ".nodes.item"
+LOGIN = NODE + ".login"
+DATABASE_ID = NODE + ".databaseId"
+EMAIL = NODE + ".organizationVerifiedDomainEmails.item"
+
+# Bytes read from the body and handed to the parser at a time
+PARSE_BUFFER_SIZE = 4096
+
+
+def _require_ijson() -> None:
+    """Raises an ImportError explaining how to install ijson if it is missing."""
+    if ijson is None:
+        raise ImportError(
+            "ijson is required for streaming GraphQL parsing. "
+            "Install it with `poetry install --extras streaming`."
+        )
+
+
+def parse_members_page(
+    body: bytes | BinaryIO,
+) -> tuple[bool, str | None, list[tuple[Any, Any, list[str]]]] | None:
+    """
+    Parses one membersWithRole page without building the full response
+
+    Args:
+        body: The response body, as bytes or a binary file-like object read as it is parsed
+
+    Raises:
+        ImportError: If ijson is not installed
+
+    Returns:
+        tuple | None: hasNextPage, endCursor and a (login, databaseId, emails) tuple per
+        node, or None if the organisation is missing or empty, as `.json()` would show it
+    """
+    _require_ijson()
+
+    organization_found = False
+    has_next_page = False
+    cursor = None
+    nodes = []
+    login = database_id = None
+    emails: list[str] = []
+
+    for prefix, event, value in ijson.parse(body, buf_size=PARSE_BUFFER_SIZE):
+        if prefix == EMAIL:
+            emails.append(value)
+        elif prefix == LOGIN:
+            login = value
+        elif prefix == DATABASE_ID:
+            database_id = value
+        elif prefix == NODE:
+            if event == "start_map":
+                login = database_id = None
+                emails = []
+            elif event == "end_map":
+                nodes.append((login, database_id, emails))
+        elif prefix == HAS_NEXT_PAGE:
+            has_next_page = bool(value)
+        elif prefix == END_CURSOR:
+            cursor = value
+        elif prefix == ORGANIZATION and event == "map_key":
+            organization_found = True
+
+    if not organization_found:
+        return None
+
+    return has_next_page, cursor, nodes
+
+
+class StreamedResponse:
+    """
+    A GraphQL response whose body has not been read yet
+
+    Behaves like a requests.Response for code that reads the whole body, such as the
+    GraphQL recorder, and parse_members_page parses from whichever is left: the buffered
+    body if it was read, or the connection if not.
+
+    Atrributes:
+        response: The requests.Response, sent with stream=True
+        status_code: The HTTP status
+        headers: The response headers
+
+    Methods:
+        json: Reads the whole body and parses it
+        parse_members_page: Parses the page's members, reading the body from the connection
+        close: Releases the connection
+    """
+
+    def __init__(self, response: requests.Response):
+        """
+        Initialises the StreamedResponse.
+
+        Args:
+            response: The requests.Response, sent with stream=True
+        """
+        self.response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self._buffered = False
+
+    @property
+    def content(self) -> bytes:
+        """Reads the whole body."""
+        self._buffered = True
+        return self.response.content
+
+    @property
+    def text(self) -> str:
+        """Reads the whole body as text."""
+        self._buffered = True
+        return self.response.text
+
+    def json(self) -> Any:
+        """Reads the whole body and parses it."""
+        return json.loads(self.content)
+
+    def parse_members_page(
+        self,
+    ) -> tuple[bool, str | None, list[tuple[Any, Any, list[str]]]] | None:
+        """
+        Parses the page's members, reading the body from the connection as it goes
+
+        Returns:
+            tuple | None: As parse_members_page
+        """
+        try:
+            if self._buffered:
+                return parse_members_page(self.response.content)
+
+            # Undo any gzip or deflate as the body is read
+            self.response.raw.decode_content = True
+            return parse_members_page(self.response.raw)
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Releases the connection."""
+        self.response.close()
+
+
+class StreamingGraphQLInterface:
+    """
+    Sends GraphQL requests to GitHub without reading the response bodies
+
+    Atrributes:
+        url: The GraphQL endpoint
+        timeout: Seconds to wait for the connection and between bytes of the response
+
+    Methods:
+        make_ql_request: POSTs the query and variables and returns the unread response
+    """
+
+    def __init__(
+        self,
+        token: str,
+        url: str = GITHUB_GRAPHQL_URL,
+        timeout: float = 30,
+        session: requests.Session | None = None,
+    ):
+        """
+        Initialises the StreamingGraphQLInterface.
+
+        Args:
+            token: The GitHub App installation token
+            url: The GraphQL endpoint
+            timeout: Seconds to wait for the connection and between bytes of the response
+            session: Optional requests.Session, so connections are reused between pages
+
+        Raises:
+            ImportError: If ijson is not installed
+        """
+        _require_ijson()
+        self.url = url
+        self.timeout = timeout
+        self._session = session or requests.Session()
+        self._session.headers["Authorization"] = f"token {token}"
+
+    def make_ql_request(self, query: str, params: dict | None) -> StreamedResponse:
+        """
+        POSTs the query and variables and returns the response with its body unread
+
+        Args:
+            query: The GraphQL query
+            params: The query's variables
+
+        Returns:
+            StreamedResponse: The response, to be parsed with its parse_members_page
+        """
+        return StreamedResponse(
+            self._session.post(
+                self.url,
+                json={"query": query, "variables": params},
+                timeout=self.timeout,
+                stream=True,
+            )
+        )
@@ -6,14 +6,193 @@ import json
 
 from logger import wrapped_logging
 import boto3
-from s3writer import S3Writer
+from botocore.config import Config
+from s3writer import S3Writer, parse_replica_targets, REPLICA_MAX_POOL_CONNECTIONS
 from github_services import GitHubServices
+from graphql_recorder import RECORDING_CONTENT_TYPE, RecordingGraphQLInterface
+from serializer import JsonSerializer
+from output_sinks import (
+    check_output_formats,
+    create_sinks,
+    run_sinks,
+    summarise_uploads,
+)
+from member_store import SqliteMemberStore
+from snapshot_cache import SnapshotCache, diff_members
+from run_lock import S3RunLock, DEFAULT_TTL_SECONDS
+from tracing import Tracer
 from dotenv import load_dotenv
 import os
+import tempfile
+import time
+from typing import Any
 
 # Load environment variables from .env file
 load_dotenv()
 
+DEFAULT_OUTPUT_FORMATS = "json"
+RECORDING_FOLDER = "GraphQLRecordings/"
+
+
+def get_output_formats() -> set[str]:
+    """
+    Reads which outputs to publish from the OUTPUT_FORMATS environment variable
+
+    OUTPUT_FORMATS is a comma separated list, e.g. "json,sqlite,prefix-index". Defaults to "json".
+
+    Returns:
+        set[str]: The lower case output format names
+    """
+    formats = os.getenv("OUTPUT_FORMATS") or DEFAULT_OUTPUT_FORMATS
+    return {name.strip().lower() for name in formats.split(",") if name.strip()}
+
+
+def env_flag(name: str) -> bool:
+    """
+    Reads a true/false environment variable
+
+    Args:
+        name: The environment variable name
+
+    Returns:
+        bool: True if the variable is set to "true", "1" or "yes" (any case)
+    """
+    return (os.getenv(name) or "").strip().lower() in ("true", "1", "yes")
+
+
+def create_replica_clients() -> list[tuple[str, Any]]:
+    """
+    Creates an S3 client for each replica target in S3_REPLICA_TARGETS
+
+    Each client is created for its bucket's region with its own connection pool, sized so
+    every output can upload at once.
+
+    Raises:
+        ValueError: If S3_REPLICA_TARGETS is malformed
+
+    Returns:
+        list[tuple[str, Any]]: (bucket name, S3 client) pairs
+    """
+    config = Config(max_pool_connections=REPLICA_MAX_POOL_CONNECTIONS)
+
+    return [
+        (bucket_name, boto3.client("s3", region_name=region, config=config))
+        for bucket_name, region in parse_replica_targets(
+            os.getenv("S3_REPLICA_TARGETS")
+        )
+    ]
+
+
+def create_member_store() -> SqliteMemberStore | None:
+    """
+    Creates the member store selected by the MEMBER_STORE environment variable
+
+    MEMBER_STORE is "memory" (the default) to keep members in dicts, or "sqlite" to spill
+    them to a scratch database in /tmp so memory use stays flat for large organisations.
+
+    Raises:
+        ValueError: If MEMBER_STORE is not recognised
+
+    Returns:
+        SqliteMemberStore | None: The store, or None to use in-memory dicts
+    """
+    store_type = (os.getenv("MEMBER_STORE") or "memory").strip().lower()
+
+    if store_type == "memory":
+        return None
+    if store_type == "sqlite":
+        return SqliteMemberStore()
+
+    raise ValueError(
+        f"Unknown MEMBER_STORE '{store_type}'. Expected one of memory, sqlite"
+    )
+
+
+def emit_trace(tracer: Tracer, trace_output: str, logger) -> None:
+    """
+    Writes the run's spans where TRACE_OUTPUT asks for them
+
+    Args:
+        tracer: The run's Tracer
+        trace_output: "log" for a compact log record, otherwise a path for a Chrome trace file
+        logger: The Lambda functions logger
+    """
+    if trace_output.lower() == "log":
+        logger.log_info(json.dumps({"trace_summary": tracer.summary()}))
+        return
+
+    try:
+        tracer.write_chrome_trace(trace_output)
+    except OSError as error:
+        logger.log_warning(f"Unable to write trace to {trace_output}: {error}")
+    else:
+        logger.log_info(f"Wrote Chrome trace to {trace_output}")
+
+
+def start_graphql_recording(
+    github_services: GitHubServices, recording_output: str, org: str | None, logger
+) -> RecordingGraphQLInterface | None:
+    """
+    Wraps the GraphQL interface so the run's traffic is recorded where GRAPHQL_RECORDING asks
+
+    Args:
+        github_services: The run's GitHubServices
+        recording_output: "s3" to upload the recording to the bucket, otherwise a file path
+        org: Organisation name, pseudonymised in the recording
+        logger: The Lambda functions logger
+
+    Returns:
+        RecordingGraphQLInterface | None: The recorder, or None if it couldn't be started
+    """
+    if recording_output.lower() == "s3":
+        handle, path = tempfile.mkstemp(prefix="graphql-", suffix=".jsonl")
+        os.close(handle)
+    else:
+        path = recording_output
+
+    try:
+        recorder = RecordingGraphQLInterface(github_services.ql, path, org=org)
+    except OSError as error:
+        logger.log_warning(f"Unable to record GraphQL traffic to {path}: {error}")
+        return None
+
+    github_services.ql = recorder
+    return recorder
+
+
+def finish_graphql_recording(
+    recorder: RecordingGraphQLInterface, recording_output: str, s3writer, logger
+) -> None:
+    """
+    Closes the recording and, for GRAPHQL_RECORDING=s3, uploads it under RECORDING_FOLDER
+
+    Args:
+        recorder: The run's recorder
+        recording_output: "s3" or the recording's file path
+        s3writer: The S3Writer the recording is uploaded with
+        logger: The Lambda functions logger
+    """
+    recorder.close()
+
+    if recording_output.lower() != "s3":
+        logger.log_info(
+            f"Recorded {recorder.exchanges} GraphQL requests to {recorder.path}"
+        )
+        return
+
+    key = RECORDING_FOLDER + time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()) + ".jsonl"
+    try:
+        with open(recorder.path, "rb") as recording:
+            s3writer.write_data_to_s3(
+                key, recording, content_type=RECORDING_CONTENT_TYPE
+            )
+    except Exception as error:
+        logger.log_warning(f"Unable to upload the GraphQL recording: {error}")
+    else:
+        logger.log_info(f"Recorded {recorder.exchanges} GraphQL requests to {key}")
+    finally:
+        os.remove(recorder.path)
+
 
 def lambda_handler(event, context):
     """
@@ -27,38 +206,198 @@ def lambda_handler(event, context):
         Exception: If secret manager or s3client are None
         Exception: If the environmental variables are not found
         Exception: If there was a failure writing to S3
+        ValueError: If OUTPUT_FORMATS names an unknown format
 
     Returns:
-        dict: Response with statusCode and generated data
+        dict: Response with statusCode and generated data, or 409 if another run holds the refresh lock
     """
 
     org = os.getenv("GITHUB_ORG")
     secret_name = os.getenv("AWS_SECRET_NAME")
     app_client_id = os.getenv("GITHUB_APP_CLIENT_ID")
     bucket_name = os.getenv("S3_BUCKET_NAME")
+    json_backend = os.getenv("JSON_BACKEND") or "auto"
+    trace_output = os.getenv("TRACE_OUTPUT") or ""
 
-    logger = wrapped_logging(False)
+    logger = wrapped_logging(False, use_queue=env_flag("QUEUE_LOGGING"))
 
     try:
-        secret_manager = boto3.client("secretsmanager")
-        s3_client = boto3.client("s3")
-    except Exception:
-        secret_manager = None
-        s3_client = None
+        # Fail on a misspelt format before taking the lock or paging through GitHub
+        try:
+            check_output_formats(get_output_formats())
+        except ValueError as error:
+            logger.log_error(str(error))
+            raise
+
+        tracer = Tracer(enabled=bool(trace_output))
+
+        try:
+            secret_manager = boto3.client("secretsmanager")
+            s3_client = boto3.client("s3")
+        except Exception:
+            secret_manager = None
+            s3_client = None
 
-    if secret_manager is None or s3_client is None:
-        message = f"Unable to retrieve Secret Manager ({'empty' if secret_manager is None else 'Not empty'}) or S3Client({'empty' if secret_manager is None else 'Not empty'})"
-        logger.log_error(message)
-        raise Exception(message)
+        if secret_manager is None or s3_client is None:
+            message = f"Unable to retrieve Secret Manager ({'empty' if secret_manager is None else 'Not empty'}) or S3Client({'empty' if secret_manager is None else 'Not empty'})"
+            logger.log_error(message)
+            raise Exception(message)
+
+        # Stop overlapping runs from paginating the org and overwriting the outputs together
+        run_lock = None
+        if env_flag("RUN_LOCK_ENABLED"):
+            run_lock = S3RunLock(
+                logger,
+                s3_client,
+                bucket_name,
+                ttl_seconds=int(
+                    os.getenv("RUN_LOCK_TTL_SECONDS") or DEFAULT_TTL_SECONDS
+                ),
+                owner=getattr(context, "aws_request_id", None),
+            )
+
+            if not run_lock.acquire():
+                wait_seconds = float(os.getenv("RUN_LOCK_WAIT_SECONDS") or 0)
+                if wait_seconds and run_lock.wait_for_release(wait_seconds):
+                    return {
+                        "statusCode": 200,
+                        "body": json.dumps(
+                            {
+                                "message": "Address book was refreshed by a concurrent run"
+                            }
+                        ),
+                    }
+
+                # The wait timed out, the holder failed, or its lock expired and can be taken over
+                if not run_lock.acquire():
+                    return {
+                        "statusCode": 409,
+                        "body": json.dumps(
+                            {"message": "Address book refresh already in progress"}
+                        ),
+                    }
+
+        # Created inside the try, so a failure here still releases the lock
+        member_store = None
+        succeeded = False
+        try:
+            member_store = create_member_store()
+            response = refresh_address_book(
+                logger,
+                secret_manager,
+                s3_client,
+                org,
+                secret_name,
+                app_client_id,
+                bucket_name,
+                json_backend,
+                tracer,
+                create_replica_clients(),
+                member_store,
+            )
+            succeeded = response["statusCode"] == 200
+            return response
+        finally:
+            if member_store is not None:
+                member_store.close()
+            if run_lock is not None:
+                # Runs waiting on the lock only skip their refresh if this one succeeded
+                run_lock.release(succeeded)
+            if tracer.enabled:
+                emit_trace(tracer, trace_output, logger)
+    finally:
+        # Lambda freezes the container once the handler returns, so write out queued logs first
+        logger.close()
+
+
+def refresh_address_book(
+    logger,
+    secret_manager,
+    s3_client,
+    org,
+    secret_name,
+    app_client_id,
+    bucket_name,
+    json_backend,
+    tracer,
+    replicas=None,
+    member_store=None,
+):
+    """
+    Fetches the organisation's members from GitHub and publishes the address book outputs
+
+    Args:
+        logger: The Lambda functions logger
+        secret_manager: The boto3 Secrets Manager client
+        s3_client: The boto3 S3 client
+        org: Organisation name
+        secret_name: Secret name for AWS
+        app_client_id: GitHub App Client ID
+        bucket_name: The bucket the outputs are written to
+        json_backend: The JsonSerializer backend name
+        tracer: The run's Tracer
+        replicas: (bucket name, S3 client) pairs the outputs are also written to
+        member_store: Optional store members are spilled to while paginating
+
+    Raises:
+        Exception: If the environmental variables are not found
+        Exception: If there was a failure writing to S3
+
+    Returns:
+        dict: Response with statusCode and generated data
+    """
 
     github_services = GitHubServices(
-        org, logger, secret_manager, secret_name, app_client_id
+        org,
+        logger,
+        secret_manager,
+        secret_name,
+        app_client_id,
+        tracer=tracer,
+        stream_parse=env_flag("GRAPHQL_STREAM_PARSE"),
+    )
+    serializer = JsonSerializer(json_backend, tracer=tracer)
+    s3writer = S3Writer(
+        logger,
+        s3_client,
+        bucket_name,
+        serializer=serializer,
+        tracer=tracer,
+        replicas=replicas,
     )
-    s3writer = S3Writer(logger, s3_client, bucket_name)
+    output_formats = get_output_formats()
+
+    # Record the GraphQL traffic, sanitized, so the run can be replayed offline
+    recording_output = os.getenv("GRAPHQL_RECORDING") or ""
+    recorder = None
+    if recording_output:
+        recorder = start_graphql_recording(
+            github_services, recording_output, org, logger
+        )
+
+    # The snapshot tracks the published JSON files, so it is only kept when they are written.
+    # Loading and diffing it holds both address books in memory, which the SQLite member
+    # store is there to avoid, so it is skipped then.
+    snapshot_cache = None
+    previous = None
+    if env_flag("SNAPSHOT_CACHE") and member_store is not None:
+        logger.log_warning(
+            "SNAPSHOT_CACHE is ignored with MEMBER_STORE=sqlite, as it would load the address book into memory"
+        )
+    elif env_flag("SNAPSHOT_CACHE") and "json" in output_formats:
+        snapshot_cache = SnapshotCache(logger, s3_client, bucket_name)
+        with tracer.span("snapshot.load"):
+            try:
+                previous = snapshot_cache.load()
+            except Exception as error:
+                logger.log_warning(f"Unable to load the previous address book: {error}")
 
     # Fetch data from GitHub
     try:
-        response = github_services.get_all_user_details()
+        if member_store is None:
+            response = github_services.get_all_user_details()
+        else:
+            response = github_services.get_all_user_details(store=member_store)
 
         if response[0] == "NotFound":
             return {
@@ -77,24 +416,43 @@ def lambda_handler(event, context):
         raise Exception(
             f"Failed to fetch data from GitHub: {str(e)}. Are the environment variables set correctly?"
         )
+    finally:
+        if recorder is not None:
+            finish_graphql_recording(recorder, recording_output, s3writer, logger)
 
-    # Serialize and write to S3
+    # Build and write every output concurrently from the same member maps
     try:
-        username_key = "addressBookUsernameKey.json"
-        email_key = "addressBookEmailKey.json"
-        id_key = "addressBookIDKey.json"
-        folder = "AddressBook/"
-
-        s3writer.write_data_to_s3(
-            folder + username_key, json.dumps(user_to_email, indent=2)
+        sinks = create_sinks(
+            output_formats, s3writer, serializer, logger, tracer=tracer
         )
-        s3writer.write_data_to_s3(
-            folder + email_key, json.dumps(email_to_user, indent=2)
+        uploads = run_sinks(
+            sinks, user_to_email, email_to_user, user_to_id, tracer=tracer
         )
-        s3writer.write_data_to_s3(folder + id_key, json.dumps(user_to_id, indent=2))
     except Exception as e:
         raise Exception(f"Failed to write data to S3: {str(e)}")
 
+    logger.log_info(json.dumps({"s3_uploads": summarise_uploads(uploads)}))
+
+    if snapshot_cache is not None:
+        if previous is not None:
+            changes = diff_members(previous[0], user_to_email)
+            logger.log_info(
+                json.dumps(
+                    {
+                        "address_book_changes": {
+                            name: len(usernames) for name, usernames in changes.items()
+                        }
+                    }
+                )
+            )
+        # The ETags the primary bucket returned for the JSON files, so save needs no requests
+        json_etags = {
+            key: results.get(bucket_name, {}).get("etag")
+            for key, results in uploads.get("json", {}).items()
+        }
+        with tracer.span("snapshot.save"):
+            snapshot_cache.save((user_to_email, email_to_user, user_to_id), json_etags)
+
     return {
         "statusCode": 200,
         "body": json.dumps(
@@ -1,20 +1,71 @@
 """A python class which wraps the logging module to make testing easier."""
 
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+
+class _InProcessQueueHandler(QueueHandler):
+    """A QueueHandler which leaves formatting to the listener's handlers."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Returns the record unchanged.
+
+        The queue never leaves the process, so the record does not need to be made
+        picklable and formatting can happen on the listener thread.
+        Args:
+            record (logging.LogRecord): The record being queued.
+        """
+        return record
 
 
 class wrapped_logging:
-    def __init__(self, debug: bool) -> None:
+    def __init__(self, debug: bool, use_queue: bool = False) -> None:
         """Initialises the logger.
         Args:
             debug (bool): Whether to output debug logs.
+            use_queue (bool): Whether to hand records to a background thread, which formats
+                and writes them, instead of writing them on the calling thread.
         """
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.INFO)
+        self.listener: QueueListener | None = None
+        self.queue_handler: QueueHandler | None = None
 
         if debug:
             logging.basicConfig(filename="debug.log", filemode="w")
 
+        if use_queue:
+            self._start_queue()
+
+    def _start_queue(self) -> None:
+        """Routes records through a queue to the root logger's handlers on a listener thread."""
+        handlers = logging.getLogger().handlers or [logging.StreamHandler()]
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+
+        self.queue_handler = _InProcessQueueHandler(log_queue)
+        self.listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+
+        # The listener writes to the root handlers itself, so don't also propagate to them
+        self.logger.addHandler(self.queue_handler)
+        self.logger.propagate = False
+
+    def close(self) -> None:
+        """Writes any queued records and returns to logging on the calling thread.
+
+        Does nothing when the queue is not in use.
+        """
+        if self.listener is None or self.queue_handler is None:
+            return
+
+        # stop() blocks until every queued record has been handled
+        self.listener.stop()
+        self.logger.removeHandler(self.queue_handler)
+        self.logger.propagate = True
+        self.listener = None
+        self.queue_handler = None
+
     def log_info(self, message: str) -> None:
         """Logs an info message to the logger.
         Args:
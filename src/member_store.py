@@ -0,0 +1,345 @@
+"""This file contains the member stores which hold the organisation's members during a run
+
+GitHubServices.get_all_user_details adds each page of members to a store. The store then
+provides the three address book maps (username → emails, email → username and username →
+account ID) as read-only mappings.
+
+InMemoryMemberStore keeps the maps as dicts, as runs always have. SqliteMemberStore writes each
+page to a scratch SQLite database under /tmp instead, and its maps read from the database as
+they are iterated, so a run's memory use doesn't grow with the size of the organisation.
+
+Typical usage example:
+
+    store = SqliteMemberStore()
+    store.add_members([("alice", ["alice@ons.gov.uk"], 101)])
+    user_to_email, email_to_user, user_to_id = store.views()
+    for username, emails in user_to_email.items():
+        ...
+    store.close()
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from collections.abc import ItemsView, Mapping, ValuesView
+from typing import Any, Iterable, Iterator
+
+# A member as found on a GraphQL page: username, verified emails and account ID
+Member = tuple[str, list[str], int | None]
+
+# Rows fetched from SQLite at a time while streaming a map
+FETCH_SIZE = 1000
+
+
+class InMemoryMemberStore:
+    """
+    A member store holding the address book maps in dicts
+
+    Atrributes:
+        user_to_email: username → list of verified org emails
+        email_to_user: email → username
+        user_to_id: username → GitHub account ID
+
+    Methods:
+        add_members: Adds a page of members
+        views: Returns the three address book maps
+        close: Does nothing, for parity with SqliteMemberStore
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialises the InMemoryMemberStore.
+        """
+        self.user_to_email: dict[str, list[str]] = {}
+        self.email_to_user: dict[str, str] = {}
+        self.user_to_id: dict[str, int] = {}
+
+    def add_members(self, members: Iterable[Member]) -> None:
+        """
+        Adds a page of members
+
+        Args:
+            members: (username, emails, account ID) for each member
+        """
+        for username, emails, account_id in members:
+            self.user_to_email[username] = emails
+            if account_id is not None:
+                self.user_to_id[username] = account_id
+            for address in emails:
+                self.email_to_user[address] = username
+
+    def views(self) -> tuple[dict, dict, dict]:
+        """
+        Returns the three address book maps
+
+        Returns:
+            tuple: user_to_email, email_to_user and user_to_id
+        """
+        return self.user_to_email, self.email_to_user, self.user_to_id
+
+    def close(self) -> None:
+        """Does nothing, the maps are freed with the store."""
+
+
+class SqliteMemberStore:
+    """
+    A member store which spills members to a scratch SQLite database under /tmp
+
+    Members keep the order they were added in, and a member or email added twice keeps its
+    first position with the latest values, exactly as the dicts in InMemoryMemberStore do.
+
+    Atrributes:
+        path: The database file
+        connection: The connection members are written with
+
+    Methods:
+        add_members: Adds a page of members in one transaction
+        views: Returns the three address book maps, read from the database
+        close: Closes the database and deletes its file
+    """
+
+    def __init__(self, directory: str | None = None):
+        """
+        Initialises the SqliteMemberStore.
+
+        Args:
+            directory: Where to create the database, the system temp directory (/tmp in
+                Lambda) if not given
+        """
+        handle, self.path = tempfile.mkstemp(
+            prefix="members-", suffix=".sqlite3", dir=directory
+        )
+        os.close(handle)
+
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        # The database is scratch space, so durability isn't needed
+        self.connection.execute("PRAGMA journal_mode = OFF")
+        self.connection.execute("PRAGMA synchronous = OFF")
+        self.connection.executescript("""
+            CREATE TABLE members (
+                login TEXT PRIMARY KEY,
+                emails TEXT NOT NULL,
+                database_id INTEGER,
+                id_order INTEGER
+            );
+            CREATE INDEX idx_members_id_order ON members (id_order)
+                WHERE id_order IS NOT NULL;
+            CREATE TABLE emails (
+                email TEXT PRIMARY KEY,
+                login TEXT NOT NULL
+            );
+            """)
+
+        # Orders user_to_id by when a member's ID was first seen, as the dict would be
+        self._next_id_order = 0
+        self._local = threading.local()
+        self._readers: list[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+
+    def add_members(self, members: Iterable[Member]) -> None:
+        """
+        Adds a page of members in one transaction
+
+        Args:
+            members: (username, emails, account ID) for each member
+        """
+        members = list(members)
+
+        rows = []
+        for username, emails, account_id in members:
+            id_order = None
+            if account_id is not None:
+                id_order = self._next_id_order
+                self._next_id_order += 1
+            rows.append((username, json.dumps(emails), account_id, id_order))
+
+        with self.connection:
+            # Upserts keep the row's rowid, so a repeated key keeps its first position
+            self.connection.executemany(
+                """
+                INSERT INTO members (login, emails, database_id, id_order)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (login) DO UPDATE SET
+                    emails = excluded.emails,
+                    database_id = COALESCE(excluded.database_id, members.database_id),
+                    id_order = COALESCE(members.id_order, excluded.id_order)
+                """,
+                rows,
+            )
+            self.connection.executemany(
+                """
+                INSERT INTO emails (email, login) VALUES (?, ?)
+                ON CONFLICT (email) DO UPDATE SET login = excluded.login
+                """,
+                [
+                    (address, username)
+                    for username, emails, _ in members
+                    for address in emails
+                ],
+            )
+
+    def _reader(self) -> sqlite3.Connection:
+        """Returns this thread's read connection, so sinks can stream maps concurrently."""
+        reader = getattr(self._local, "connection", None)
+        if reader is None:
+            reader = sqlite3.connect(
+                f"file:{self.path}?mode=ro", uri=True, check_same_thread=False
+            )
+            self._local.connection = reader
+            with self._readers_lock:
+                self._readers.append(reader)
+
+        return reader
+
+    def views(self) -> tuple["SqliteMapping", "SqliteMapping", "SqliteMapping"]:
+        """
+        Returns the three address book maps, read from the database
+
+        Returns:
+            tuple: user_to_email, email_to_user and user_to_id
+        """
+        return (
+            SqliteMapping(
+                self,
+                "SELECT login, emails FROM members ORDER BY rowid",
+                "SELECT emails FROM members WHERE login = ?",
+                "SELECT COUNT(*) FROM members",
+                "SELECT login, emails FROM members WHERE login IN (SELECT value FROM json_each(?))",
+                json.loads,
+            ),
+            SqliteMapping(
+                self,
+                "SELECT email, login FROM emails ORDER BY rowid",
+                "SELECT login FROM emails WHERE email = ?",
+                "SELECT COUNT(*) FROM emails",
+                "SELECT email, login FROM emails WHERE email IN (SELECT value FROM json_each(?))",
+            ),
+            SqliteMapping(
+                self,
+                "SELECT login, database_id FROM members WHERE id_order IS NOT NULL ORDER BY id_order",
+                "SELECT database_id FROM members WHERE login = ? AND database_id IS NOT NULL",
+                "SELECT COUNT(*) FROM members WHERE database_id IS NOT NULL",
+                "SELECT login, database_id FROM members WHERE database_id IS NOT NULL AND login IN (SELECT value FROM json_each(?))",
+            ),
+        )
+
+    def close(self) -> None:
+        """Closes the database and deletes its file."""
+        with self._readers_lock:
+            for reader in self._readers:
+                reader.close()
+            self._readers = []
+        self.connection.close()
+
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class SqliteMapping(Mapping):
+    """
+    A read-only mapping over one of a SqliteMemberStore's tables
+
+    Iterating streams rows from the database in insertion order, FETCH_SIZE at a time.
+    """
+
+    def __init__(
+        self,
+        store: SqliteMemberStore,
+        items_query: str,
+        lookup_query: str,
+        count_query: str,
+        lookup_many_query: str,
+        decode: Any = None,
+    ):
+        """
+        Initialises the SqliteMapping.
+
+        Args:
+            store: The store to read from
+            items_query: Selects every (key, value) in order
+            lookup_query: Selects the value for one key
+            count_query: Counts the keys
+            lookup_many_query: Selects (key, value) for the keys in a JSON array
+            decode: Converts a stored value back to its Python value
+        """
+        self.store = store
+        self.items_query = items_query
+        self.lookup_query = lookup_query
+        self.count_query = count_query
+        self.lookup_many_query = lookup_many_query
+        self.decode = decode
+
+    def _rows(self) -> Iterator[tuple[Any, Any]]:
+        """Streams (key, stored value) rows in insertion order."""
+        cursor = self.store._reader().execute(self.items_query)
+        try:
+            while rows := cursor.fetchmany(FETCH_SIZE):
+                yield from rows
+        finally:
+            cursor.close()
+
+    def __getitem__(self, key: str) -> Any:
+        row = self.store._reader().execute(self.lookup_query, (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return self.decode(row[0]) if self.decode else row[0]
+
+    def __iter__(self) -> Iterator[str]:
+        for key, _ in self._rows():
+            yield key
+
+    def __len__(self) -> int:
+        return self.store._reader().execute(self.count_query).fetchone()[0]
+
+    def items(self) -> "SqliteItemsView":
+        return SqliteItemsView(self)
+
+    def values(self) -> "SqliteValuesView":
+        return SqliteValuesView(self)
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, Any]:
+        """
+        Looks up several keys in one query, rather than a query per key
+
+        Args:
+            keys: The keys to look up
+
+        Returns:
+            dict: key → value for the keys that are present
+        """
+        rows = (
+            self.store._reader()
+            .execute(self.lookup_many_query, (json.dumps(list(keys)),))
+            .fetchall()
+        )
+        return {
+            key: self.decode(value) if self.decode else value for key, value in rows
+        }
+
+    def stream_items(self) -> Iterator[tuple[str, Any]]:
+        """Streams (key, value) pairs in one query, rather than a lookup per key."""
+        for key, value in self._rows():
+            yield key, self.decode(value) if self.decode else value
+
+
+class SqliteItemsView(ItemsView):
+    """An items view which streams pairs from the database in one query."""
+
+    _mapping: SqliteMapping
+
+    def __iter__(self) -> Iterator[tuple[str, Any]]:
+        return self._mapping.stream_items()
+
+
+class SqliteValuesView(ValuesView):
+    """A values view which streams values from the database in one query."""
+
+    _mapping: SqliteMapping
+
+    def __iter__(self) -> Iterator[Any]:
+        for _, value in self._mapping.stream_items():
+            yield value
@@ -0,0 +1,128 @@
+"""This file builds and reads the normalized address book, a single file without repeated strings
+
+The three JSON lookup files repeat the same data: every login is in all three and every email
+is in two. The normalized file stores each login and each email once, in arrays indexed by
+ordinal. Account IDs are an array parallel to the logins, and both directions of the
+login ↔ email relation are arrays of ordinals:
+
+    {
+      "version": 1,
+      "logins": ["alice", "bob"],
+      "databaseIds": [101, null],
+      "emails": ["alice@ons.gov.uk", "bob@ons.gov.uk", "b@ons.gov.uk"],
+      "emailOwners": [0, 1, 1],
+      "memberEmails": [[0], [1, 2]]
+    }
+
+Each map is read once, in order, so maps read from a SqliteMemberStore are streamed.
+
+Typical usage example:
+
+    data = build_normalized_address_book(user_to_email, email_to_user, user_to_id)
+    user_to_email, email_to_user, user_to_id = expand_normalized_address_book(data)
+"""
+
+from typing import Any, Mapping
+
+NORMALIZED_VERSION = 1
+
+
+def build_normalized_address_book(
+    user_to_email: Mapping[str, list[str]],
+    email_to_user: Mapping[str, str],
+    user_to_id: Mapping[str, int],
+) -> dict[str, Any]:
+    """
+    Builds the normalized address book from the three member maps
+
+    Args:
+        user_to_email: username → list of verified org emails
+        email_to_user: email → username
+        user_to_id: username → GitHub account ID
+
+    Returns:
+        dict: The normalized address book, as described in the module docstring
+    """
+    logins: list[str] = []
+    login_ordinals: dict[str, int] = {}
+    emails: list[str] = []
+    email_ordinals: dict[str, int] = {}
+    member_emails: list[list[int]] = []
+
+    for login, addresses in user_to_email.items():
+        login_ordinals[login] = len(logins)
+        logins.append(login)
+
+        references = []
+        for address in addresses:
+            ordinal = email_ordinals.get(address)
+            if ordinal is None:
+                ordinal = email_ordinals[address] = len(emails)
+                emails.append(address)
+            references.append(ordinal)
+        member_emails.append(references)
+
+    email_owners: list[int | None] = [None] * len(emails)
+    for address, login in email_to_user.items():
+        ordinal = email_ordinals.get(address)
+        if ordinal is None:
+            # An email no longer in its owner's list, kept so the maps round trip
+            ordinal = email_ordinals[address] = len(emails)
+            emails.append(address)
+            email_owners.append(None)
+        email_owners[ordinal] = login_ordinals[login]
+
+    database_ids: list[int | None] = [None] * len(logins)
+    for login, database_id in user_to_id.items():
+        database_ids[login_ordinals[login]] = database_id
+
+    return {
+        "version": NORMALIZED_VERSION,
+        "logins": logins,
+        "databaseIds": database_ids,
+        "emails": emails,
+        "emailOwners": email_owners,
+        "memberEmails": member_emails,
+    }
+
+
+def expand_normalized_address_book(
+    data: dict[str, Any],
+) -> tuple[dict[str, list[str]], dict[str, str], dict[str, int]]:
+    """
+    Rebuilds the three member maps from a normalized address book
+
+    Args:
+        data: The parsed normalized file
+
+    Raises:
+        ValueError: If the file is from an unsupported version
+
+    Returns:
+        tuple: user_to_email, email_to_user and user_to_id, equal to the maps it was built from
+    """
+    if data.get("version") != NORMALIZED_VERSION:
+        raise ValueError(
+            f"Unsupported normalized address book version {data.get('version')}. "
+            f"Expected {NORMALIZED_VERSION}"
+        )
+
+    logins = data["logins"]
+    emails = data["emails"]
+
+    user_to_email = {
+        login: [emails[ordinal] for ordinal in references]
+        for login, references in zip(logins, data["memberEmails"])
+    }
+    email_to_user = {
+        address: logins[owner]
+        for address, owner in zip(emails, data["emailOwners"])
+        if owner is not None
+    }
+    user_to_id = {
+        login: database_id
+        for login, database_id in zip(logins, data["databaseIds"])
+        if database_id is not None
+    }
+
+    return user_to_email, email_to_user, user_to_id
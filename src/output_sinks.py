@@ -0,0 +1,475 @@
+"""This file contains the output sinks which publish the address book in each of its formats
+
+Each sink turns the shared member maps into one output, such as the JSON lookup files in S3 or
+the SQLite database, and writes it. Sinks are registered by name and selected with the
+OUTPUT_FORMATS environment variable. run_sinks runs the selected sinks concurrently, so adding a
+derived artifact does not lengthen the run by the time it takes to build and upload.
+
+Adding a format means subclassing OutputSink and registering it:
+
+    @register_sink("my-format")
+    class MyFormatSink(OutputSink):
+        def write(self, user_to_email, email_to_user, user_to_id):
+            self.upload(FOLDER + "addressBook.my", build_my_format(...))
+
+Typical usage example:
+
+    sinks = create_sinks(["json", "sqlite"], s3writer, serializer, logger)
+    uploads = run_sinks(sinks, user_to_email, email_to_user, user_to_id)
+"""
+
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Mapping
+
+from address_book_keys import (
+    BLOOM_KEY,
+    EMAIL_KEY,
+    FOLDER,
+    ID_KEY,
+    NORMALIZED_KEY,
+    PARQUET_KEY,
+    PREFIX_INDEX_FOLDER,
+    SQLITE_KEY,
+    USERNAME_KEY,
+)
+from bloom_filter import (
+    BLOOM_CONTENT_TYPE,
+    DEFAULT_FALSE_POSITIVE_RATE,
+    build_bloom_filter,
+)
+from normalized_format import build_normalized_address_book
+from parallel_serializer import ParallelSerializer
+from parquet_export import PARQUET_CONTENT_TYPE, build_address_book_parquet
+from prefix_index import DEFAULT_MAX_CHUNK_KEYS, build_prefix_index
+from serializer import JsonSerializer
+from sqlite_export import SQLITE_CONTENT_TYPE, build_address_book_db
+from tracing import NULL_TRACER
+
+# Output format name → sink class
+SINKS: dict[str, type["OutputSink"]] = {}
+
+
+def register_sink(name: str) -> Callable[[type["OutputSink"]], type["OutputSink"]]:
+    """
+    Registers a sink class under an OUTPUT_FORMATS name
+
+    Args:
+        name: The format name, e.g. "sqlite"
+
+    Returns:
+        Callable: A class decorator
+    """
+
+    def decorator(sink_class: type["OutputSink"]) -> type["OutputSink"]:
+        sink_class.name = name
+        SINKS[name] = sink_class
+        return sink_class
+
+    return decorator
+
+
+class OutputSink:
+    """
+    Base class for publishing the address book in one format
+
+    Sinks must not modify the member maps, as they are shared with the other sinks running
+    at the same time.
+
+    Atrributes:
+        name: The OUTPUT_FORMATS name the sink is registered under
+        s3writer: The S3Writer outputs are uploaded with
+        serializer: The run's JsonSerializer
+        logger: The variable which connects to the logger class
+        tracer: The run's Tracer
+        uploads: key → the S3Writer's per-bucket results, for each file uploaded
+
+    Methods:
+        prepare: Does CPU-bound work which has to run before the sinks' threads start
+        write: Builds the output from the member maps and publishes it
+        upload: Uploads one file with the S3Writer and keeps its results
+    """
+
+    name = ""
+
+    def __init__(self, s3writer, serializer: JsonSerializer, logger, tracer=None):
+        """
+        Initialises the OutputSink.
+
+        Args:
+            s3writer: The S3Writer outputs are uploaded with
+            serializer: The run's JsonSerializer
+            logger: The Lambda functions logger
+            tracer: Optional Tracer for the run
+        """
+        self.s3writer = s3writer
+        self.serializer = serializer
+        self.logger = logger
+        self.tracer = tracer or NULL_TRACER
+        self.uploads: dict[str, dict[str, dict[str, Any]]] = {}
+
+    def upload(self, key: str, data: Any, **kwargs: Any) -> None:
+        """
+        Uploads one file with the S3Writer and keeps its results in uploads
+
+        Args:
+            key: The S3 key to write
+            data: The file contents, as accepted by S3Writer.write_data_to_s3
+            **kwargs: Passed on to S3Writer.write_data_to_s3, e.g. content_type
+        """
+        self.uploads[key] = self.s3writer.write_data_to_s3(key, data, **kwargs) or {}
+
+    def prepare(
+        self,
+        user_to_email: Mapping[str, list[str]],
+        email_to_user: Mapping[str, str],
+        user_to_id: Mapping[str, int],
+    ) -> None:
+        """
+        Does CPU-bound work which has to run before the sinks' threads start
+
+        Sinks are prepared one at a time in the calling thread, so they can fork worker
+        processes safely. Does nothing unless overridden.
+
+        Args:
+            user_to_email: username → list of verified org emails
+            email_to_user: email → username
+            user_to_id: username → GitHub account ID
+        """
+
+    def write(
+        self,
+        user_to_email: Mapping[str, list[str]],
+        email_to_user: Mapping[str, str],
+        user_to_id: Mapping[str, int],
+    ) -> None:
+        """
+        Builds the output from the member maps and publishes it
+
+        Args:
+            user_to_email: username → list of verified org emails
+            email_to_user: email → username
+            user_to_id: username → GitHub account ID
+        """
+        raise NotImplementedError
+
+
+@register_sink("json")
+class S3JsonSink(OutputSink):
+    """
+    Writes the three JSON lookup files to S3
+
+    In-memory maps large enough to be worth it are serialized across SERIALIZATION_WORKERS
+    processes (the available CPUs by default) while preparing, so write only uploads the
+    bytes. Otherwise they are serialized in write, on the sink's own thread.
+    """
+
+    def __init__(self, s3writer, serializer: JsonSerializer, logger, tracer=None):
+        super().__init__(s3writer, serializer, logger, tracer)
+        self.bodies: dict[str, bytes] = {}
+
+    def prepare(self, user_to_email, email_to_user, user_to_id):
+        maps = {
+            USERNAME_KEY: user_to_email,
+            EMAIL_KEY: email_to_user,
+            ID_KEY: user_to_id,
+        }
+        in_memory = {
+            file_name: data
+            for file_name, data in maps.items()
+            if isinstance(data, dict)
+        }
+        if not in_memory:
+            return
+
+        workers = os.getenv("SERIALIZATION_WORKERS")
+        parallel = ParallelSerializer(
+            self.serializer, workers=int(workers) if workers else None
+        )
+        values = list(in_memory.values())
+        # Serial encoding is left to write, so it overlaps with the other sinks
+        if not parallel.will_fork(values):
+            return
+
+        self.bodies = dict(zip(in_memory, parallel.dumps_many(values)))
+
+    def write(self, user_to_email, email_to_user, user_to_id):
+        for file_name, data in (
+            (USERNAME_KEY, user_to_email),
+            (EMAIL_KEY, email_to_user),
+            (ID_KEY, user_to_id),
+        ):
+            if isinstance(data, dict):
+                body = self.bodies.pop(file_name, None)
+                if body is None:
+                    body = self.serializer.dumps(data)
+                self.upload(FOLDER + file_name, body)
+                continue
+
+            # Maps read from a member store are streamed through a temporary file
+            with tempfile.TemporaryFile() as json_file:
+                self.serializer.dump(data, json_file)
+                json_file.seek(0)
+                self.upload(FOLDER + file_name, json_file)
+
+
+@register_sink("local-json")
+class LocalJsonSink(OutputSink):
+    """
+    Writes the three JSON lookup files to LOCAL_OUTPUT_DIR, for local runs and debugging
+
+    Files are laid out as in S3, e.g. <LOCAL_OUTPUT_DIR>/AddressBook/addressBookEmailKey.json.
+    """
+
+    def write(self, user_to_email, email_to_user, user_to_id):
+        output_dir = os.path.join(os.getenv("LOCAL_OUTPUT_DIR") or "output", FOLDER)
+        os.makedirs(output_dir, exist_ok=True)
+
+        for file_name, data in (
+            (USERNAME_KEY, user_to_email),
+            (EMAIL_KEY, email_to_user),
+            (ID_KEY, user_to_id),
+        ):
+            path = os.path.join(output_dir, file_name)
+            # Write then rename so a reader never sees a half written file
+            with open(path + ".tmp", "wb") as output_file:
+                self.serializer.dump(data, output_file)
+            os.replace(path + ".tmp", path)
+
+        self.logger.log_info(f"Wrote address book JSON files to {output_dir}")
+
+
+@register_sink("sqlite")
+class SqliteSink(OutputSink):
+    """Writes the indexed SQLite database to S3."""
+
+    def write(self, user_to_email, email_to_user, user_to_id):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = build_address_book_db(
+                user_to_email,
+                email_to_user,
+                user_to_id,
+                os.path.join(tmp_dir, SQLITE_KEY),
+            )
+            # Stream the file rather than reading it into memory
+            with open(db_path, "rb") as db_file:
+                self.upload(
+                    FOLDER + SQLITE_KEY,
+                    db_file,
+                    content_type=SQLITE_CONTENT_TYPE,
+                )
+
+
+@register_sink("parquet")
+class ParquetSink(OutputSink):
+    """Writes the Parquet export to S3."""
+
+    def write(self, user_to_email, email_to_user, user_to_id):
+        self.upload(
+            FOLDER + PARQUET_KEY,
+            build_address_book_parquet(user_to_email, user_to_id),
+            content_type=PARQUET_CONTENT_TYPE,
+        )
+
+
+@register_sink("bloom")
+class BloomSink(OutputSink):
+    """Writes the email Bloom filter to S3, sized by BLOOM_FALSE_POSITIVE_RATE."""
+
+    def write(self, user_to_email, email_to_user, user_to_id):
+        false_positive_rate = float(
+            os.getenv("BLOOM_FALSE_POSITIVE_RATE") or DEFAULT_FALSE_POSITIVE_RATE
+        )
+        self.upload(
+            FOLDER + BLOOM_KEY,
+            build_bloom_filter(email_to_user, false_positive_rate),
+            content_type=BLOOM_CONTENT_TYPE,
+        )
+
+
+@register_sink("normalized")
+class NormalizedSink(OutputSink):
+    """Writes the normalized address book, every member in one compact file, to S3."""
+
+    def write(self, user_to_email, email_to_user, user_to_id):
+        compact_serializer = JsonSerializer(
+            self.serializer.backend, compact=True, tracer=self.tracer
+        )
+        self.upload(
+            FOLDER + NORMALIZED_KEY,
+            compact_serializer.dumps(
+                build_normalized_address_book(user_to_email, email_to_user, user_to_id)
+            ),
+        )
+
+
+@register_sink("prefix-index")
+class PrefixIndexSink(OutputSink):
+    """Writes the type-ahead prefix index chunks and manifest to S3."""
+
+    def write(self, user_to_email, email_to_user, user_to_id):
+        manifest, chunks = build_prefix_index(
+            user_to_email,
+            email_to_user,
+            int(os.getenv("PREFIX_INDEX_MAX_CHUNK_KEYS") or DEFAULT_MAX_CHUNK_KEYS),
+        )
+        # Chunks are fetched on every keystroke, so keep them compact
+        compact_serializer = JsonSerializer(
+            self.serializer.backend, compact=True, tracer=self.tracer
+        )
+        for chunk_entry in manifest["chunks"]:
+            self.upload(
+                FOLDER + PREFIX_INDEX_FOLDER + chunk_entry["file"],
+                compact_serializer.dumps(chunks[chunk_entry["prefix"]]),
+            )
+        # The manifest goes last so clients never see chunks that are not uploaded yet
+        self.upload(
+            FOLDER + PREFIX_INDEX_FOLDER + "manifest.json",
+            compact_serializer.dumps(manifest),
+        )
+
+
+def check_output_formats(output_formats: Iterable[str]) -> None:
+    """
+    Checks every output format has a registered sink
+
+    Args:
+        output_formats: The format names, e.g. from OUTPUT_FORMATS
+
+    Raises:
+        ValueError: If a format has no registered sink
+    """
+    unknown = sorted(set(output_formats) - set(SINKS))
+    if unknown:
+        raise ValueError(
+            f"Unknown output format(s) {', '.join(unknown)}. "
+            f"Expected any of {', '.join(sorted(SINKS))}"
+        )
+
+
+def create_sinks(
+    output_formats: Iterable[str],
+    s3writer,
+    serializer: JsonSerializer,
+    logger,
+    tracer=None,
+) -> list[OutputSink]:
+    """
+    Creates the sinks for the requested output formats
+
+    Args:
+        output_formats: The format names, e.g. from OUTPUT_FORMATS
+        s3writer: The S3Writer outputs are uploaded with
+        serializer: The run's JsonSerializer
+        logger: The Lambda functions logger
+        tracer: Optional Tracer for the run
+
+    Raises:
+        ValueError: If a format has no registered sink
+
+    Returns:
+        list[OutputSink]: One sink per format, in name order
+    """
+    check_output_formats(output_formats)
+
+    return [
+        SINKS[name](s3writer, serializer, logger, tracer)
+        for name in sorted(set(output_formats))
+    ]
+
+
+def run_sinks(
+    sinks: list[OutputSink],
+    user_to_email: Mapping[str, list[str]],
+    email_to_user: Mapping[str, str],
+    user_to_id: Mapping[str, int],
+    tracer=None,
+) -> dict[str, dict[str, dict[str, dict[str, Any]]]]:
+    """
+    Runs the sinks concurrently on the shared member maps
+
+    Each sink is prepared in this thread first, then written in its own thread. Every sink
+    runs to completion, even if another fails.
+
+    Args:
+        sinks: The sinks to run
+        user_to_email: username → list of verified org emails
+        email_to_user: email → username
+        user_to_id: username → GitHub account ID
+        tracer: Optional Tracer, recording an "output.<name>" span per sink, and a
+            "prepare.<name>" span for sinks which prepare
+
+    Raises:
+        Exception: Naming each sink that failed, and why
+
+    Returns:
+        dict: sink name → key → bucket name → {"ok", "seconds", "etag", "error"} for every
+        upload
+    """
+    tracer = tracer or NULL_TRACER
+
+    def run(sink: OutputSink) -> None:
+        with tracer.span(f"output.{sink.name}"):
+            sink.write(user_to_email, email_to_user, user_to_id)
+
+    if not sinks:
+        return {}
+
+    # Preparing may fork worker processes, which is only safe before the threads start
+    failed: dict[str, BaseException | None] = {}
+    for sink in sinks:
+        if type(sink).prepare is OutputSink.prepare:
+            continue
+        try:
+            with tracer.span(f"prepare.{sink.name}"):
+                sink.prepare(user_to_email, email_to_user, user_to_id)
+        except Exception as error:
+            failed[sink.name] = error
+
+    ready = [sink for sink in sinks if sink.name not in failed]
+    if ready:
+        with ThreadPoolExecutor(max_workers=len(ready)) as executor:
+            futures = {sink.name: executor.submit(run, sink) for sink in ready}
+
+        failed.update(
+            (name, future.exception())
+            for name, future in futures.items()
+            if future.exception() is not None
+        )
+
+    if failed:
+        raise Exception(
+            "; ".join(
+                f"{name} output failed: {error}" for name, error in failed.items()
+            )
+        )
+
+    return {sink.name: sink.uploads for sink in sinks}
+
+
+def summarise_uploads(
+    uploads: dict[str, dict[str, dict[str, dict[str, Any]]]],
+) -> dict[str, dict[str, dict[str, Any]]]:
+    """
+    Summarises run_sinks' upload results for the logs
+
+    Args:
+        uploads: The results run_sinks returns
+
+    Returns:
+        dict: sink name → bucket name → the "files" uploaded and their total "seconds"
+    """
+    summary: dict[str, dict[str, dict[str, Any]]] = {}
+    for name, keys in uploads.items():
+        buckets = summary.setdefault(name, {})
+        for results in keys.values():
+            for bucket_name, result in results.items():
+                totals = buckets.setdefault(bucket_name, {"files": 0, "seconds": 0.0})
+                totals["files"] += 1
+                totals["seconds"] += result["seconds"]
+
+    for buckets in summary.values():
+        for totals in buckets.values():
+            totals["seconds"] = round(totals["seconds"], 3)
+    return summary
@@ -0,0 +1,308 @@
+"""This file contains the ParallelSerializer class which serializes the address book maps on several cores
+
+Serializing is CPU-bound and holds the GIL, so threads don't help. Larger Lambda memory sizes
+come with more CPU time, so the maps are split into tasks (a whole map, or a chunk of keys from
+a large one) which are serialized by forked worker processes and sent back over pipes.
+
+Lambda has no /dev/shm, so multiprocessing.Pool and Queue can't be used there. Each worker is a
+forked multiprocessing.Process with a Pipe back to the parent. Forking means the workers
+already have the maps, so only the encoded bytes cross a pipe.
+
+Forking while other threads run can copy a lock one of them holds into the child, so the
+serializer stays serial unless this is the only thread. That includes native threads, so it
+stays serial while QUEUE_LOGGING's listener runs, or once pyarrow has been loaded.
+
+A chunk is serialized as its own JSON object, and the chunks' entries are joined back together
+so the output is byte-identical to serializing the whole map at once.
+
+Typical usage example:
+
+    parallel = ParallelSerializer(JsonSerializer())
+    bodies = parallel.dumps_many([user_to_email, email_to_user, user_to_id])
+"""
+
+import gc
+import math
+import multiprocessing
+import os
+import threading
+from itertools import islice
+from multiprocessing.connection import Connection, wait
+from typing import Any, cast
+
+from serializer import JsonSerializer
+
+# Below this many entries in total, forking costs more than it saves
+PARALLEL_MIN_ENTRIES = 20_000
+
+# Lambda allocates CPU in proportion to memory, a full vCPU for each 1,769 MB
+LAMBDA_MB_PER_VCPU = 1769
+
+# A task serializes values[index], or the entries start:stop of it when stop is not None
+Task = tuple[int, int, int | None]
+
+
+def available_cpus() -> int:
+    """Returns the number of CPUs this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def default_workers() -> int:
+    """
+    Returns the worker processes this process has the CPU for
+
+    Lambda reports at least 2 CPUs at every memory size, but below 3,538 MB the function's
+    share is less than two vCPUs, so on Lambda the count is based on the memory size.
+
+    Returns:
+        int: The full vCPUs from AWS_LAMBDA_FUNCTION_MEMORY_SIZE, capped at the available
+        CPUs, or the available CPUs outside Lambda
+    """
+    cpus = available_cpus()
+    memory_size = os.getenv("AWS_LAMBDA_FUNCTION_MEMORY_SIZE")
+    if not memory_size:
+        return cpus
+    return max(1, min(cpus, int(memory_size) // LAMBDA_MB_PER_VCPU))
+
+
+def thread_count() -> int:
+    """Returns the threads in this process, including ones Python didn't start where possible."""
+    try:
+        native = len(os.listdir("/proc/self/task"))
+    except OSError:
+        native = 0
+    return max(threading.active_count(), native)
+
+
+def _fork_context() -> Any:
+    """Returns the fork multiprocessing context, or None where fork isn't available."""
+    try:
+        return multiprocessing.get_context("fork")
+    except ValueError:
+        return None
+
+
+def _weight(value: Any) -> int:
+    """Estimates the work of serializing a value: its entries, plus the items of list values."""
+    if not isinstance(value, dict):
+        return 1
+    if value and isinstance(next(iter(value.values())), list):
+        return len(value) + sum(map(len, value.values()))
+    return len(value)
+
+
+def _task_value(values: list[Any], task: Task) -> Any:
+    """Returns the value a task serializes, slicing the chunk out of its dict if needed."""
+    index, start, stop = task
+    if stop is None:
+        return values[index]
+    return dict(islice(values[index].items(), start, stop))
+
+
+def _worker(
+    connection: Connection,
+    serializer: JsonSerializer,
+    values: list[Any],
+    tasks: list[Task],
+) -> None:
+    """Serializes tasks in a forked process and sends each result back in order."""
+    # A collection would touch every inherited object, copying the parent's memory pages
+    gc.disable()
+    try:
+        for task in tasks:
+            connection.send_bytes(serializer._dumps(_task_value(values, task)))
+    finally:
+        connection.close()
+
+
+class ParallelSerializer:
+    """
+    Serializes several values at once on forked worker processes
+
+    Atrributes:
+        serializer: The JsonSerializer used for each value or chunk
+        workers: The most worker processes to use
+        min_entries: The fewest dict entries in total worth serializing in parallel
+
+    Methods:
+        will_fork: Whether dumps_many would serialize the values on worker processes
+        dumps_many: Serializes each value to JSON bytes, in parallel where worthwhile
+    """
+
+    def __init__(
+        self,
+        serializer: JsonSerializer,
+        workers: int | None = None,
+        min_entries: int | None = None,
+    ):
+        """
+        Initialises the ParallelSerializer.
+
+        Args:
+            serializer: The JsonSerializer used for each value or chunk
+            workers: The most worker processes to use. 1 serializes in this process. If not
+                given, default_workers() with the stdlib backend, or 1 with orjson, whose
+                workers cost about as much as they save.
+            min_entries: The fewest dict entries in total worth serializing in parallel,
+                PARALLEL_MIN_ENTRIES if not given
+        """
+        self.serializer = serializer
+        if workers is None:
+            workers = default_workers() if serializer.backend == "json" else 1
+        self.workers = max(1, workers)
+        self.min_entries = PARALLEL_MIN_ENTRIES if min_entries is None else min_entries
+
+    def _context(self, values: list[Any]) -> Any:
+        """Returns the fork context to serialize the values with, or None to stay serial."""
+        total = sum(len(value) for value in values if isinstance(value, dict))
+        if self.workers == 1 or total < self.min_entries:
+            return None
+        # Another thread could hold a lock the workers would inherit
+        if thread_count() > 1:
+            return None
+        return _fork_context()
+
+    def will_fork(self, values: list[Any]) -> bool:
+        """
+        Whether dumps_many would serialize the values on worker processes
+
+        Args:
+            values: The values to serialize
+
+        Returns:
+            bool: False if dumps_many would serialize them one after another in this process
+        """
+        return self._context(values) is not None
+
+    def dumps_many(self, values: list[Any]) -> list[bytes]:
+        """
+        Serializes each value to JSON bytes, in parallel where worthwhile
+
+        Falls back to serializing in this process on a single CPU, for small values, while
+        other threads are running, where fork isn't available, or if a worker fails.
+
+        Args:
+            values: The values to serialize, normally the three address book maps
+
+        Returns:
+            list[bytes]: The same bytes serializer.dumps returns for each value
+        """
+        context = self._context(values)
+        if context is None:
+            return [self.serializer.dumps(value) for value in values]
+
+        with self.serializer.tracer.span(
+            "json.parallel_dumps", workers=self.workers
+        ) as span:
+            # Only dicts with more than a worker's share of the work are split, as slicing
+            # out a chunk costs about as much as serializing it. The workers slice their
+            # own chunks, so nothing is copied here.
+            weights = [_weight(value) for value in values]
+            share = math.ceil(sum(weights) / self.workers)
+            tasks: list[Task] = []
+            task_weights: list[float] = []
+            for index, (value, weight) in enumerate(zip(values, weights)):
+                if isinstance(value, dict) and weight > share:
+                    parts = math.ceil(weight / share)
+                    size = math.ceil(len(value) / parts)
+                    starts = range(0, len(value), size)
+                    tasks.extend((index, start, start + size) for start in starts)
+                    task_weights.extend(weight / len(starts) for _ in starts)
+                else:
+                    tasks.append((index, 0, None))
+                    task_weights.append(weight)
+            span["tasks"] = len(tasks)
+
+            results = self._run(context, values, tasks, task_weights)
+
+            bodies = []
+            for index in range(len(values)):
+                chunks = [
+                    result for task, result in zip(tasks, results) if task[0] == index
+                ]
+                bodies.append(
+                    chunks[0] if len(chunks) == 1 else self._join_chunks(chunks)
+                )
+
+        return bodies
+
+    def _run(
+        self,
+        context: Any,
+        values: list[Any],
+        tasks: list[Task],
+        task_weights: list[float],
+    ) -> list[bytes]:
+        """
+        Serializes the tasks across forked workers
+
+        Returns:
+            list[bytes]: Each task's JSON, in task order
+        """
+        # Heaviest first, each to the least loaded worker
+        worker_count = min(self.workers, len(tasks))
+        assignments: list[list[int]] = [[] for _ in range(worker_count)]
+        loads = [0.0] * worker_count
+        for task_id in sorted(range(len(tasks)), key=lambda i: -task_weights[i]):
+            worker = loads.index(min(loads))
+            assignments[worker].append(task_id)
+            loads[worker] += task_weights[task_id]
+
+        results: list[bytes | None] = [None] * len(tasks)
+        pending: dict[Connection, list[int]] = {}
+        processes = []
+        for task_ids in assignments:
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(
+                target=_worker,
+                args=(
+                    sender,
+                    self.serializer,
+                    values,
+                    [tasks[task_id] for task_id in task_ids],
+                ),
+                daemon=True,
+            )
+            process.start()
+            sender.close()
+            processes.append(process)
+            pending[receiver] = task_ids
+
+        # Read from whichever worker is ready, so no worker blocks on a full pipe
+        while pending:
+            for ready in wait(list(pending)):
+                receiver = cast(Connection, ready)
+                task_ids = pending[receiver]
+                try:
+                    results[task_ids.pop(0)] = receiver.recv_bytes()
+                except EOFError:
+                    task_ids.clear()
+                if not task_ids:
+                    receiver.close()
+                    del pending[receiver]
+
+        for process in processes:
+            process.join()
+
+        # Anything a failed worker didn't send is serialized here instead
+        return [
+            (
+                self.serializer._dumps(_task_value(values, tasks[task_id]))
+                if result is None
+                else result
+            )
+            for task_id, result in enumerate(results)
+        ]
+
+    def _join_chunks(self, chunks: list[bytes]) -> bytes:
+        """Joins the JSON objects of consecutive chunks into the JSON of the whole dict."""
+        if self.serializer.compact:
+            # b'{"a":1}' → b'"a":1'
+            return b"{" + b",".join(memoryview(chunk)[1:-1] for chunk in chunks) + b"}"
+
+        # b'{\n  "a": 1\n}' → b'  "a": 1'
+        return (
+            b"{\n" + b",\n".join(memoryview(chunk)[2:-2] for chunk in chunks) + b"\n}"
+        )
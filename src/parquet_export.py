@@ -0,0 +1,75 @@
+"""This file builds a columnar Parquet export of the address book for analytics consumers
+
+The export has one row per login and email pair, plus the member's GitHub database ID, so it
+can be loaded straight into a dataframe without parsing nested JSON. String columns are
+dictionary-encoded, so repeated logins are stored once per row group.
+
+pyarrow is an optional dependency, installed with `poetry install --extras parquet`.
+
+Typical usage example:
+
+    body = build_address_book_parquet(user_to_email, user_to_id)
+"""
+
+from typing import Mapping
+
+PARQUET_CONTENT_TYPE = "application/vnd.apache.parquet"
+
+
+def build_address_book_parquet(
+    user_to_email: Mapping[str, list[str]],
+    user_to_id: Mapping[str, int],
+    compression: str = "zstd",
+) -> memoryview:
+    """
+    Builds a Parquet file with one row per login and email pair
+
+    Args:
+        user_to_email: username → list of verified org emails
+        user_to_id: username → GitHub account ID
+        compression: Parquet compression codec
+
+    Raises:
+        ImportError: If pyarrow is not installed
+
+    Returns:
+        memoryview: The Parquet file contents, viewed in place over pyarrow's buffer
+    """
+
+    # Imported here so runs without the parquet stage don't pay for loading pyarrow
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as error:
+        raise ImportError(
+            "pyarrow is required for the parquet output. "
+            "Install it with `poetry install --extras parquet`."
+        ) from error
+
+    logins = []
+    emails = []
+    database_ids = []
+    for username, addresses in user_to_email.items():
+        account_id = user_to_id.get(username)
+        for address in addresses:
+            logins.append(username)
+            emails.append(address)
+            database_ids.append(account_id)
+
+    table = pa.table(
+        {
+            "login": pa.array(logins, type=pa.string()).dictionary_encode(),
+            "email": pa.array(emails, type=pa.string()),
+            "database_id": pa.array(database_ids, type=pa.int64()),
+        }
+    )
+
+    sink = pa.BufferOutputStream()
+    pq.write_table(
+        table,
+        sink,
+        compression=compression,
+        use_dictionary=["login", "email"],
+    )
+
+    return memoryview(sink.getvalue())
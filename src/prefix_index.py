@@ -0,0 +1,167 @@
+"""This file builds a sorted prefix index of usernames and emails for type-ahead search
+
+Instead of scanning the full username and email maps on every keystroke, clients fetch a small
+manifest once, then only the chunk covering what has been typed so far, and answer from it by
+binary search over its sorted keys.
+
+Keys are normalised (trimmed, lower case) usernames and emails, each paired with the login it
+belongs to. Keys are grouped into chunks by their leading characters. A chunk holding more than
+`max_chunk_keys` keys is split again on one more character, so busy prefixes get longer chunk
+prefixes and every chunk stays small.
+
+Typical usage example:
+
+    manifest, chunks = build_prefix_index(user_to_email, email_to_user)
+    for chunk_prefix in chunks_for_prefix(manifest, "ali"):
+        matches = search_chunk(chunks[chunk_prefix], "ali")
+"""
+
+from bisect import bisect_left
+from typing import Any, Mapping
+from urllib.parse import quote
+
+from sqlite_export import normalise_key
+
+PREFIX_INDEX_VERSION = 1
+DEFAULT_MAX_CHUNK_KEYS = 2000
+
+
+def chunk_file_name(prefix: str) -> str:
+    """Returns a URL and S3 key safe file name for a chunk prefix."""
+    return quote(prefix, safe="") + ".json"
+
+
+def _split_into_chunks(
+    entries: list[tuple[str, str]], length: int, max_chunk_keys: int
+) -> list[tuple[str, list[tuple[str, str]]]]:
+    """
+    Groups sorted entries by their first `length` characters, splitting large groups further
+
+    Args:
+        entries: Sorted (key, login) pairs
+        length: Number of leading characters to group on
+        max_chunk_keys: Largest chunk size before it is split on one more character
+
+    Returns:
+        list: (chunk prefix, entries) pairs in key order
+    """
+    groups: list[tuple[str, list[tuple[str, str]]]] = []
+    for entry in entries:
+        prefix = entry[0][:length]
+        if groups and groups[-1][0] == prefix:
+            groups[-1][1].append(entry)
+        else:
+            groups.append((prefix, [entry]))
+
+    chunks = []
+    for prefix, group in groups:
+        # Only split when a longer prefix would actually separate the keys
+        if len(group) > max_chunk_keys and any(len(key) > length for key, _ in group):
+            chunks.extend(_split_into_chunks(group, length + 1, max_chunk_keys))
+        else:
+            chunks.append((prefix, group))
+
+    return chunks
+
+
+def build_prefix_index(
+    user_to_email: Mapping[str, list[str]],
+    email_to_user: Mapping[str, str],
+    max_chunk_keys: int = DEFAULT_MAX_CHUNK_KEYS,
+) -> tuple[dict[str, Any], dict[str, dict[str, Any]]]:
+    """
+    Builds the prefix index manifest and chunks
+
+    Args:
+        user_to_email: username → list of verified org emails
+        email_to_user: email → username
+        max_chunk_keys: Largest chunk size before it is split on one more character
+
+    Returns:
+        tuple: The manifest, and the chunks keyed by chunk prefix. Each chunk holds sorted
+        "keys" and a parallel "logins" array.
+    """
+
+    entries: set[tuple[str, str]] = set()
+    for username in user_to_email:
+        entries.add((normalise_key(username), username))
+    for address, username in email_to_user.items():
+        entries.add((normalise_key(address), username))
+
+    sorted_entries = sorted(entries)
+
+    chunks = {}
+    manifest_chunks = []
+    for prefix, group in _split_into_chunks(sorted_entries, 1, max_chunk_keys):
+        chunks[prefix] = {
+            "prefix": prefix,
+            "keys": [key for key, _ in group],
+            "logins": [login for _, login in group],
+        }
+        manifest_chunks.append(
+            {
+                "prefix": prefix,
+                "file": chunk_file_name(prefix),
+                "count": len(group),
+            }
+        )
+
+    manifest = {
+        "version": PREFIX_INDEX_VERSION,
+        "count": len(sorted_entries),
+        "chunks": manifest_chunks,
+    }
+
+    return manifest, chunks
+
+
+def chunks_for_prefix(manifest: Mapping[str, Any], typed: str) -> list[str]:
+    """
+    Finds the chunks a client needs for the text typed so far
+
+    This is usually a single chunk. While fewer characters have been typed than a busy
+    prefix was split on, every chunk starting with the typed text is needed.
+
+    Args:
+        manifest: The prefix index manifest
+        typed: The text typed so far
+
+    Returns:
+        list[str]: The chunk prefixes to fetch
+    """
+    typed = normalise_key(typed)
+
+    return [
+        chunk["prefix"]
+        for chunk in manifest["chunks"]
+        if typed.startswith(chunk["prefix"]) or chunk["prefix"].startswith(typed)
+    ]
+
+
+def search_chunk(
+    chunk: Mapping[str, Any], typed: str, limit: int = 10
+) -> list[tuple[str, str]]:
+    """
+    Finds the keys in a chunk starting with the typed text by binary search
+
+    Args:
+        chunk: A prefix index chunk
+        typed: The text typed so far
+        limit: The most matches to return
+
+    Returns:
+        list: (key, login) pairs in key order
+    """
+    typed = normalise_key(typed)
+    keys = chunk["keys"]
+    logins = chunk["logins"]
+
+    matches: list[tuple[str, str]] = []
+    position = bisect_left(keys, typed)
+    while position < len(keys) and len(matches) < limit:
+        if not keys[position].startswith(typed):
+            break
+        matches.append((keys[position], logins[position]))
+        position += 1
+
+    return matches
@@ -0,0 +1,277 @@
+"""This file contains the S3RunLock class which stops overlapping runs refreshing the address book together
+
+Manual triggers, retries and the EventBridge schedule can overlap. The lock is an S3 object
+created with a conditional `If-None-Match: *` write, so only one invocation can create it.
+The object records its owner and an expiry time, so a lock left behind by a crashed run is
+taken over (with a conditional `If-Match` write) once its TTL has passed.
+
+A run which refreshed the address book releases the lock by overwriting it with its outcome
+rather than deleting it, so runs waiting on it know the refresh succeeded. A failed run deletes
+the lock, and waiting runs refresh the address book themselves.
+
+Typical usage example:
+
+    run_lock = S3RunLock(logger, s3_client, bucket_name)
+    if run_lock.acquire():
+        succeeded = False
+        try:
+            refresh_address_book()
+            succeeded = True
+        finally:
+            run_lock.release(succeeded)
+"""
+
+import json
+import time
+import uuid
+from typing import Any, Callable
+
+from botocore.exceptions import ClientError
+
+LOCK_KEY = "AddressBook/.refresh.lock"
+DEFAULT_TTL_SECONDS = 900
+
+# Returned when a conditional write loses to an existing object or a concurrent writer
+CONFLICT_CODES = {"PreconditionFailed", "ConditionalRequestConflict", "412", "409"}
+MISSING_CODES = {"NoSuchKey", "NotFound", "404"}
+
+
+def _error_code(error: ClientError) -> str:
+    """Returns the S3 error code of a ClientError."""
+    return str(error.response.get("Error", {}).get("Code", ""))
+
+
+class S3RunLock:
+    """
+    A lease held as an S3 object so only one full refresh runs at a time
+
+    Atrributes:
+        logger: The variable which connects to the logger class
+        s3_client: The boto3 S3 client
+        bucket_name: The bucket holding the lock object
+        key: The key of the lock object
+        ttl_seconds: How long the lock is held before another run may take it over
+        owner: Identifies this run in the lock object, e.g. the Lambda request ID
+        etag: The ETag of the lock object while this run holds it
+
+    Methods:
+        acquire: Tries to take the lock without waiting
+        release: Releases the lock if this run still holds it, recording a successful refresh
+        wait_for_release: Waits for another run to finish and record a successful refresh
+    """
+
+    def __init__(
+        self,
+        logger,
+        s3_client,
+        bucket_name: str,
+        key: str = LOCK_KEY,
+        ttl_seconds: int = DEFAULT_TTL_SECONDS,
+        owner: str | None = None,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        Initialises the S3RunLock.
+
+        Args:
+            logger: The Lambda functions logger
+            s3_client: The boto3 S3 client
+            bucket_name: The bucket holding the lock object
+            key: The key of the lock object
+            ttl_seconds: How long the lock is held before another run may take it over
+            owner: Identifies this run in the lock object, a random ID if not given
+            clock: Returns the current time in seconds, replaceable for testing
+            sleep: Sleeps for a number of seconds, replaceable for testing
+        """
+        self.logger = logger
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.key = key
+        self.ttl_seconds = ttl_seconds
+        self.owner = owner or str(uuid.uuid4())
+        self.clock = clock
+        self.sleep = sleep
+        self.etag: str | None = None
+
+    def _lock_body(self) -> bytes:
+        """Builds the lock object contents."""
+        return json.dumps(
+            {"owner": self.owner, "expires_at": self.clock() + self.ttl_seconds}
+        ).encode("utf-8")
+
+    def _released_body(self) -> bytes:
+        """Builds the lock object left by a successful run, which has already expired."""
+        return json.dumps(
+            {"owner": self.owner, "expires_at": self.clock(), "outcome": "succeeded"}
+        ).encode("utf-8")
+
+    def _read_lock(self) -> tuple[str, dict[str, Any]] | None:
+        """
+        Reads the current lock object
+
+        Returns:
+            tuple | None: The lock's ETag and contents, or None if there is no lock
+        """
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=self.key)
+        except ClientError as error:
+            if _error_code(error) in MISSING_CODES:
+                return None
+            raise
+
+        try:
+            contents = json.loads(response["Body"].read())
+        except ValueError:
+            # An unreadable lock is treated as expired so it cannot block runs forever
+            contents = {}
+
+        return response["ETag"], contents
+
+    def acquire(self) -> bool:
+        """
+        Tries to take the lock without waiting
+
+        Returns:
+            bool: True if this run now holds the lock, False if another run does
+        """
+
+        # A lock can disappear between the failed create and the read, so retry a few times
+        for _ in range(3):
+            try:
+                response = self.s3_client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=self.key,
+                    Body=self._lock_body(),
+                    ContentType="application/json",
+                    IfNoneMatch="*",
+                )
+            except ClientError as error:
+                if _error_code(error) not in CONFLICT_CODES:
+                    raise
+            else:
+                self.etag = response["ETag"]
+                self.logger.log_info(f"Acquired refresh lock {self.key} ({self.owner})")
+                return True
+
+            holder = self._read_lock()
+            if holder is None:
+                continue
+
+            holder_etag, contents = holder
+            if contents.get("expires_at", 0) > self.clock():
+                self.logger.log_info(
+                    f"Refresh lock {self.key} is held by {contents.get('owner')}"
+                )
+                return False
+
+            # The holder's lease has expired, so take it over if nobody else has
+            try:
+                response = self.s3_client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=self.key,
+                    Body=self._lock_body(),
+                    ContentType="application/json",
+                    IfMatch=holder_etag,
+                )
+            except ClientError as error:
+                code = _error_code(error)
+                if code in MISSING_CODES:
+                    continue
+                if code in CONFLICT_CODES:
+                    return False
+                raise
+            else:
+                self.etag = response["ETag"]
+                if contents.get("outcome") == "succeeded":
+                    self.logger.log_info(
+                        f"Acquired refresh lock {self.key} ({self.owner}) after a completed run"
+                    )
+                else:
+                    self.logger.log_warning(
+                        f"Took over expired refresh lock {self.key} from {contents.get('owner')}"
+                    )
+                return True
+
+        return False
+
+    def release(self, succeeded: bool = False) -> None:
+        """
+        Releases the lock if this run still holds it
+
+        A successful run overwrites the lock with its outcome, which has already expired, so
+        waiting runs can tell the refresh succeeded. Otherwise the lock is deleted. Failures
+        are logged rather than raised, as the lock expires on its own.
+
+        Args:
+            succeeded: Whether this run refreshed the address book
+        """
+        if self.etag is None:
+            return
+
+        if succeeded:
+            try:
+                self.s3_client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=self.key,
+                    Body=self._released_body(),
+                    ContentType="application/json",
+                    IfMatch=self.etag,
+                )
+            except ClientError as error:
+                self.logger.log_warning(
+                    f"Unable to release refresh lock {self.key}, it will expire on its own: {error}"
+                )
+            else:
+                self.logger.log_info(
+                    f"Released refresh lock {self.key} after a successful refresh"
+                )
+            finally:
+                self.etag = None
+            return
+
+        try:
+            self.s3_client.delete_object(
+                Bucket=self.bucket_name, Key=self.key, IfMatch=self.etag
+            )
+        except ClientError as error:
+            if _error_code(error) not in MISSING_CODES:
+                self.logger.log_warning(
+                    f"Unable to release refresh lock {self.key}, it will expire on its own: {error}"
+                )
+        else:
+            self.logger.log_info(f"Released refresh lock {self.key}")
+        finally:
+            self.etag = None
+
+    def wait_for_release(self, timeout: float, poll_interval: float = 5) -> bool:
+        """
+        Waits for another run to finish and record a successful refresh
+
+        Args:
+            timeout: The longest time to wait in seconds
+            poll_interval: Seconds between checks of the lock object
+
+        Returns:
+            bool: True if the holder recorded a successful refresh within the timeout. False
+            if it timed out, the holder deleted the lock after a failed run, or the lock
+            expired without being released (the other run likely crashed)
+        """
+        deadline = self.clock() + timeout
+
+        while True:
+            holder = self._read_lock()
+            if holder is None:
+                return False
+
+            if holder[1].get("outcome") == "succeeded":
+                return True
+
+            if holder[1].get("expires_at", 0) <= self.clock():
+                return False
+
+            remaining = deadline - self.clock()
+            if remaining <= 0:
+                return False
+
+            self.sleep(min(poll_interval, remaining))
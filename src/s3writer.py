@@ -1,18 +1,195 @@
 """This file contains the S3Writer class to weekly upload the GitHub usernames and ONS emails to S3
 
+Outputs can also be published to replica buckets, for example in the regions consumers read
+from. Each upload goes to the primary and every replica concurrently, so publishing takes about
+as long as the slowest single target.
+
 Typical usage example:
 
     s3writer = S3Writer(logger)
     s3writer.write_data_to_s3(file_to_update, data) # These are the filename of the updated file and its contents respectively
 """
 
-import json
-from typing import Any
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO
 from dotenv import load_dotenv
+from serializer import JsonSerializer
+from tracing import NULL_TRACER
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Connection pool size for replica clients, enough for every output to upload at once
+REPLICA_MAX_POOL_CONNECTIONS = 25
+
+
+def parse_replica_targets(value: str | None) -> list[tuple[str, str]]:
+    """
+    Parses replica targets from the S3_REPLICA_TARGETS environment variable
+
+    Args:
+        value: Comma separated "bucket:region" pairs, e.g. "book-dr:eu-west-1,book-us:us-east-1"
+
+    Raises:
+        ValueError: If a target has no bucket or region
+
+    Returns:
+        list[tuple[str, str]]: (bucket name, region) pairs
+    """
+    targets = []
+    for item in (value or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+
+        bucket_name, _, region = item.partition(":")
+        if not bucket_name.strip() or not region.strip():
+            raise ValueError(
+                f"Invalid replica target '{item}'. Expected bucket:region, e.g. my-bucket:eu-west-1"
+            )
+        targets.append((bucket_name.strip(), region.strip()))
+
+    return targets
+
+
+class MemoryviewReader(io.RawIOBase):
+    """
+    A read-only, seekable file-like view over a memoryview
+
+    boto3 only accepts bytes, bytearray or file-like bodies, and wrapping a memoryview in
+    io.BytesIO copies it. This reader hands the buffer to boto3 chunk by chunk instead.
+    """
+
+    def __init__(self, view: memoryview):
+        """
+        Initialises the MemoryviewReader.
+
+        Args:
+            view: The buffer to read from, cast to unsigned bytes without copying
+        """
+        super().__init__()
+        self.view = view.cast("B")
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:  # type: ignore[override]
+        chunk = self.view[self.position : self.position + len(buffer)]
+        size = len(chunk)
+        buffer[:size] = chunk
+        self.position += size
+        return size
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        elif whence == io.SEEK_END:
+            self.position = len(self.view) + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence})")
+        return self.position
+
+    def tell(self) -> int:
+        return self.position
+
+    def __len__(self) -> int:
+        return len(self.view)
+
+
+class FileRangeReader(io.RawIOBase):
+    """
+    A read-only, seekable file-like view over part of an open file, with its own position
+
+    Reads with os.pread, so several readers can share one file descriptor and be read
+    concurrently without moving each other's position, or the file's.
+    """
+
+    def __init__(self, fileno: int, start: int, end: int):
+        """
+        Initialises the FileRangeReader.
+
+        Args:
+            fileno: The open file's descriptor, which the caller keeps open and closes
+            start: The offset the view starts at
+            end: The offset the view ends at
+        """
+        super().__init__()
+        self.fileno_ = fileno
+        self.start = start
+        self.end = end
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:  # type: ignore[override]
+        size = max(0, min(len(buffer), len(self) - self.position))
+        chunk = os.pread(self.fileno_, size, self.start + self.position)
+        buffer[: len(chunk)] = chunk
+        self.position += len(chunk)
+        return len(chunk)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        elif whence == io.SEEK_END:
+            self.position = len(self) + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence})")
+        return self.position
+
+    def tell(self) -> int:
+        return self.position
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+
+def target_bodies(body: Any, count: int) -> list[Any]:
+    """
+    Gives each of count uploads a body it can read independently
+
+    Buffers are shared. A real file is shared through a FileRangeReader per upload, from its
+    current position to its end. Other streams can only be read once, so they are read into
+    memory and the bytes shared.
+
+    Args:
+        body: The payload
+        count: The number of uploads
+
+    Returns:
+        list: A body per upload
+    """
+    if isinstance(body, (bytes, bytearray, memoryview)):
+        return [body] * count
+
+    try:
+        if not (hasattr(os, "pread") and body.seekable()):
+            raise io.UnsupportedOperation("not a seekable file")
+        body.flush()
+        fileno = body.fileno()
+        start = body.tell()
+        end = os.fstat(fileno).st_size
+    except (AttributeError, OSError, ValueError):
+        data = body.read()
+        return [data] * count
+
+    return [FileRangeReader(fileno, start, end) for _ in range(count)]
+
 
 class S3Writer:
     """
@@ -24,17 +201,34 @@ class S3Writer:
         s3_resrouce: The established 'session' or connection to AWS servers
         bucket_name: The name of the bucket to store the new JSON files
         logger: The variable which connects to the logger class
+        serializer: The JsonSerializer used for dict payloads
+        tracer: Times each put_object call
+        replicas: (bucket name, client) pairs every output is also uploaded to
 
     Methods:
         write_data_to_s3: Allows the program to connect to the S3 bucket and upload the JSON
     """
 
-    def __init__(self, logger, s3_client, bucket_name):
+    def __init__(
+        self,
+        logger,
+        s3_client,
+        bucket_name,
+        serializer=None,
+        tracer=None,
+        replicas=None,
+    ):
         """
         Initialises the S3Writer.
+
+        replicas is an optional list of (bucket name, client) pairs. Each client should be
+        created for its bucket's region with a connection pool large enough for concurrent uploads.
         """
         self.logger = logger
         self.s3_client = s3_client
+        self.serializer = serializer or JsonSerializer()
+        self.tracer = tracer or NULL_TRACER
+        self.replicas = list(replicas or [])
 
         # Load bucket name from environment variable
         self.bucket_name = bucket_name
@@ -45,18 +239,34 @@ class S3Writer:
             )
 
     def write_data_to_s3(
-        self, file_to_update: str | None, data: dict[str, Any] | str | None
+        self,
+        file_to_update: str | None,
+        data: dict[str, Any] | str | bytes | bytearray | memoryview | BinaryIO | None,
+        content_type: str = "application/json",
     ):
         """
         Writes the data to a specific filename within the specificed s3 bucket
 
+        bytes, bytearray, memoryview and file-like payloads are passed to S3 without being
+        copied. S3 verifies each upload with the CRC32 checksum botocore computes as it sends
+        the body, so the payload is not read an extra time to hash it.
+
+        With replicas, the data is uploaded to the primary bucket and every replica
+        concurrently. Each target reads a real file through its own FileRangeReader, so the
+        file is never held in memory. Other streams can only be read once, so they are read
+        into memory first.
+
         Args:
             file_to_update: Name of the file to update within S3
             data: Contents of the new and updated file
+            content_type: MIME type stored against the object
 
             Raises:
             Exception: If filename or data is empty
-            Exception: If S3 update fails
+            Exception: If S3 update fails, for any target when uploading to replicas
+
+        Returns:
+            dict: bucket name → {"ok", "seconds", "etag", "error"} for each target
         """
 
         # Ensure that the arguments are not None
@@ -65,34 +275,104 @@ class S3Writer:
             self.logger.log_error(message)
             raise Exception(message)
 
-        # Convert dict to JSON string if needed
+        # Convert dict or str to bytes if needed
+        body: bytes | bytearray | memoryview | BinaryIO
         if isinstance(data, dict):
-            data_str = json.dumps(data, indent=2)
+            body = self.serializer.dumps(data)
+        elif isinstance(data, str):
+            body = data.encode("utf-8")
         else:
-            data_str = data
+            body = data
 
         # Upload the file to S3 within the bucket directly
         key = f"{file_to_update}"
 
-        try:
-
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=key,
-                Body=(
-                    data_str.encode("utf-8")
-                    if isinstance(data_str, str)
-                    else json.dumps(data_str).encode("utf-8")
-                ),
-                ContentType="application/json",
+        if not self.replicas:
+            result = self._put_object(
+                self.s3_client, self.bucket_name, key, body, content_type
             )
+            if result["error"] is not None:
+                self.logger.log_error(
+                    f"Unable to upload updated username and email data to S3, {result['error']}"
+                )
+                raise result["error"]
 
-        except Exception as error:
-            self.logger.log_error(
-                f"Unable to upload updated username and email data to S3, {error}"
-            )
-            raise error
-        else:
             self.logger.log_info(
                 "Successfully uploaded updated username and email data to S3"
             )
+            return {self.bucket_name: result}
+
+        targets = [(self.bucket_name, self.s3_client)] + self.replicas
+        bodies = target_bodies(body, len(targets))
+        with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+            futures = {
+                bucket_name: executor.submit(
+                    self._put_object,
+                    s3_client,
+                    bucket_name,
+                    key,
+                    target_body,
+                    content_type,
+                )
+                for (bucket_name, s3_client), target_body in zip(targets, bodies)
+            }
+            results = {
+                bucket_name: future.result() for bucket_name, future in futures.items()
+            }
+
+        failed = {
+            bucket_name: result["error"]
+            for bucket_name, result in results.items()
+            if result["error"] is not None
+        }
+        if failed:
+            message = (
+                f"Unable to upload {key} to {len(failed)} of {len(targets)} S3 targets: "
+                + ", ".join(
+                    f"{bucket_name}: {error}" for bucket_name, error in failed.items()
+                )
+            )
+            self.logger.log_error(message)
+            raise Exception(message)
+
+        self.logger.log_info(
+            f"Successfully uploaded {key} to {len(targets)} S3 targets in "
+            f"{max(result['seconds'] for result in results.values()):.3f}s"
+        )
+        return results
+
+    def _put_object(self, s3_client, bucket_name, key, body, content_type):
+        """
+        Uploads one payload to one bucket
+
+        Returns:
+            dict: "ok", the upload's "seconds", the object's "etag" and the "error" raised,
+            if any
+        """
+        start = time.perf_counter()
+
+        try:
+            with self.tracer.span("s3.put_object", key=key, bucket=bucket_name):
+                response = s3_client.put_object(
+                    Bucket=bucket_name,
+                    Key=key,
+                    Body=(
+                        MemoryviewReader(body) if isinstance(body, memoryview) else body
+                    ),
+                    ContentType=content_type,
+                )
+
+        except Exception as error:
+            return {
+                "ok": False,
+                "seconds": time.perf_counter() - start,
+                "etag": None,
+                "error": error,
+            }
+
+        return {
+            "ok": True,
+            "seconds": time.perf_counter() - start,
+            "etag": (response or {}).get("ETag"),
+            "error": None,
+        }
@@ -0,0 +1,186 @@
+"""This file contains the JsonSerializer class which turns the address book maps into JSON bytes
+
+orjson is used when it is installed (`poetry install --extras fast-json`) and produces bytes
+directly, without building an intermediate str. Otherwise the stdlib json module is used.
+
+In compatibility mode (the default) the output is byte-identical to
+`json.dumps(data, indent=2).encode("utf-8")`, which is what the published files have always
+contained. orjson writes non-ASCII characters as UTF-8 rather than `\\uXXXX` escapes, so any
+payload where that would make a difference is serialized with the stdlib instead.
+
+Typical usage example:
+
+    serializer = JsonSerializer()
+    body = serializer.dumps(user_to_email)
+"""
+
+import json
+from collections.abc import Mapping
+from typing import Any, BinaryIO
+
+from tracing import NULL_TRACER
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+BACKENDS = ("auto", "orjson", "json")
+
+# Bytes buffered before each write when streaming a mapping to a file
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+class JsonSerializer:
+    """
+    A class for serializing the address book maps to JSON bytes
+
+    Atrributes:
+        backend: The backend in use, either "orjson" or "json"
+        compatible: Whether output must match the stdlib byte for byte
+        compact: Whether output is written without whitespace instead of indented
+        tracer: Times each dumps call
+
+    Methods:
+        dumps: Serializes a value to JSON bytes
+        dump: Writes a value as JSON to a binary file, streaming mappings entry by entry
+    """
+
+    def __init__(
+        self,
+        backend: str = "auto",
+        compatible: bool = True,
+        compact: bool = False,
+        tracer: Any = None,
+    ):
+        """
+        Initialises the JsonSerializer.
+
+        Args:
+            backend: "auto" to use orjson when installed, or "orjson" / "json" to force one
+            compatible: Produce output byte-identical to json.dumps(data, indent=2), or to
+                json.dumps(data, separators=(",", ":")) when compact
+            compact: Write JSON without whitespace, for artifacts fetched by clients
+            tracer: Optional Tracer recording a "json.dumps" span per call
+
+        Raises:
+            ValueError: If the backend name is unknown
+            ImportError: If "orjson" is requested but not installed
+        """
+        if backend not in BACKENDS:
+            raise ValueError(
+                f"Unknown JSON backend '{backend}'. Expected one of {', '.join(BACKENDS)}"
+            )
+
+        if backend == "orjson" and orjson is None:
+            raise ImportError(
+                "orjson is not installed. Install it with `poetry install --extras fast-json`."
+            )
+
+        if backend == "auto":
+            backend = "json" if orjson is None else "orjson"
+
+        self.backend = backend
+        self.compatible = compatible
+        self.compact = compact
+        self.tracer = tracer or NULL_TRACER
+
+    def dumps(self, data: Any) -> bytes:
+        """
+        Serializes a value to JSON bytes
+
+        Args:
+            data: The value to serialize, normally one of the address book maps
+
+        Returns:
+            bytes: UTF-8 encoded JSON
+        """
+        with self.tracer.span("json.dumps", backend=self.backend) as span:
+            body = self._dumps(data)
+            span["bytes"] = len(body)
+
+        return body
+
+    def dump(self, data: Any, output: BinaryIO) -> int:
+        """
+        Writes a value as JSON to a binary file
+
+        Mappings other than dicts (such as the SqliteMemberStore maps) are written one entry
+        at a time, so they are never held in memory whole. The output is the same as dumps.
+
+        Args:
+            data: The value to serialize
+            output: The binary file to write to
+
+        Returns:
+            int: The number of bytes written
+        """
+        if isinstance(data, dict) or not isinstance(data, Mapping):
+            body = self.dumps(data)
+            output.write(body)
+            return len(body)
+
+        with self.tracer.span("json.dump", backend=self.backend) as span:
+            written = 0
+            buffer = bytearray()
+            for entry in self._stream_mapping(data):
+                buffer += entry
+                if len(buffer) >= STREAM_BUFFER_SIZE:
+                    written += output.write(buffer)
+                    buffer.clear()
+            written += output.write(buffer)
+            span["bytes"] = written
+
+        return written
+
+    def _stream_mapping(self, data: Mapping) -> Any:
+        """
+        Yields a mapping's JSON in pieces, matching json.dumps with indent=2 or compact separators
+
+        Each value is serialized on its own, and nested lines are indented one more level.
+        """
+        if self.compact:
+            opening, separator, key_separator, closing = b"{", b",", b":", b"}"
+        else:
+            opening, separator, key_separator, closing = (
+                b"{\n  ",
+                b",\n  ",
+                b": ",
+                b"\n}",
+            )
+
+        first = True
+        for key, value in data.items():
+            yield opening if first else separator
+            first = False
+
+            body = self._dumps(value)
+            if not self.compact:
+                body = body.replace(b"\n", b"\n  ")
+            yield self._dumps(key) + key_separator + body
+
+        yield b"{}" if first else closing
+
+    def _dumps(self, data: Any) -> bytes:
+        """Serializes a value with the selected backend."""
+        if self.backend == "orjson":
+            try:
+                body = orjson.dumps(
+                    data, option=None if self.compact else orjson.OPT_INDENT_2
+                )
+            except TypeError:
+                # orjson is stricter than the stdlib (e.g. non-str keys, 64-bit int limit)
+                body = None
+
+            # The stdlib escapes everything outside printable ASCII, orjson does not
+            if body is not None and (
+                not self.compatible or (body.isascii() and b"\x7f" not in body)
+            ):
+                return body
+
+        if self.compact:
+            return json.dumps(
+                data, separators=(",", ":"), ensure_ascii=self.compatible
+            ).encode("utf-8")
+
+        return json.dumps(data, indent=2, ensure_ascii=self.compatible).encode("utf-8")
@@ -0,0 +1,209 @@
+"""This file contains the SnapshotCache class which keeps the last published address book in /tmp
+
+Change detection needs the previous run's member maps. Rather than downloading and parsing
+the published JSON files on every invocation, the maps are kept in a marshal snapshot in /tmp
+together with the ETags of the S3 objects they were read from or written to. A warm Lambda
+container checks the ETags with head_object and, when they still match, loads the snapshot
+without downloading anything.
+
+Typical usage example:
+
+    snapshot_cache = SnapshotCache(logger, s3_client, bucket_name)
+    previous = snapshot_cache.load()
+    ... publish ...
+    snapshot_cache.save((user_to_email, email_to_user, user_to_id), etags)
+"""
+
+import json
+import marshal
+import os
+import tempfile
+from typing import Any
+
+from botocore.exceptions import ClientError
+
+from address_book_keys import EMAIL_KEY, FOLDER, ID_KEY, USERNAME_KEY
+
+SNAPSHOT_VERSION = 1
+DEFAULT_SNAPSHOT_PATH = os.path.join(
+    tempfile.gettempdir(), "address-book-snapshot.marshal"
+)
+
+# The published files the snapshot holds, in the order of the maps
+SNAPSHOT_FILES = (USERNAME_KEY, EMAIL_KEY, ID_KEY)
+
+MISSING_CODES = {"NoSuchKey", "NotFound", "404"}
+
+
+def diff_members(
+    previous: dict[str, list[str]], current: dict[str, list[str]]
+) -> dict[str, list[str]]:
+    """
+    Compares two username → emails maps
+
+    Args:
+        previous: The previously published map
+        current: The new map
+
+    Returns:
+        dict: The sorted usernames "added", "removed" and with "changed" emails
+    """
+    return {
+        "added": sorted(current.keys() - previous.keys()),
+        "removed": sorted(previous.keys() - current.keys()),
+        "changed": sorted(
+            username
+            for username in current.keys() & previous.keys()
+            if current[username] != previous[username]
+        ),
+    }
+
+
+class SnapshotCache:
+    """
+    A marshal snapshot of the last published member maps, validated against S3 ETags
+
+    Atrributes:
+        logger: The variable which connects to the logger class
+        s3_client: The boto3 S3 client
+        bucket_name: The bucket the address book is published to
+        path: The snapshot file
+
+    Methods:
+        load: Returns the published maps, from the snapshot when it is current
+        save: Snapshots newly published maps with the ETags their uploads returned
+    """
+
+    def __init__(
+        self,
+        logger,
+        s3_client,
+        bucket_name: str,
+        path: str | None = None,
+        folder: str = FOLDER,
+    ):
+        """
+        Initialises the SnapshotCache.
+
+        Args:
+            logger: The Lambda functions logger
+            s3_client: The boto3 S3 client
+            bucket_name: The bucket the address book is published to
+            path: The snapshot file, DEFAULT_SNAPSHOT_PATH in /tmp if not given, so it
+                survives between warm invocations
+            folder: The key prefix of the address book files
+        """
+        self.logger = logger
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.path = path or DEFAULT_SNAPSHOT_PATH
+        self.keys = [folder + file_name for file_name in SNAPSHOT_FILES]
+
+    def _read_snapshot(self) -> tuple[dict[str, str], tuple] | None:
+        """Reads the snapshot file, returning its ETags and maps, or None if unusable."""
+        try:
+            with open(self.path, "rb") as snapshot_file:
+                snapshot = marshal.load(snapshot_file)
+        except FileNotFoundError:
+            return None
+        except (EOFError, ValueError, TypeError) as error:
+            self.logger.log_warning(
+                f"Ignoring unreadable snapshot {self.path}: {error}"
+            )
+            return None
+
+        if (
+            not isinstance(snapshot, dict)
+            or snapshot.get("version") != SNAPSHOT_VERSION
+        ):
+            return None
+
+        return snapshot["etags"], snapshot["maps"]
+
+    def _write_snapshot(self, etags: dict[str, str], maps: tuple) -> None:
+        """Writes the snapshot file, replacing the old one only once it is complete."""
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "wb") as snapshot_file:
+            marshal.dump(
+                {"version": SNAPSHOT_VERSION, "etags": etags, "maps": maps},
+                snapshot_file,
+            )
+        os.replace(temporary_path, self.path)
+
+    def _current_etags(self) -> dict[str, str] | None:
+        """Returns the published objects' ETags, or None if any is missing."""
+        etags = {}
+        for key in self.keys:
+            try:
+                response = self.s3_client.head_object(Bucket=self.bucket_name, Key=key)
+            except ClientError as error:
+                if str(error.response.get("Error", {}).get("Code")) in MISSING_CODES:
+                    return None
+                raise
+            etags[key] = response["ETag"]
+
+        return etags
+
+    def load(self) -> tuple | None:
+        """
+        Returns the published maps, from the snapshot when it is current
+
+        When the snapshot is missing or out of date the objects are downloaded and the
+        snapshot is rewritten.
+
+        Returns:
+            tuple | None: user_to_email, email_to_user and user_to_id as last published, or
+            None if nothing has been published yet
+        """
+        etags = self._current_etags()
+        if etags is None:
+            return None
+
+        snapshot = self._read_snapshot()
+        if snapshot is not None and snapshot[0] == etags:
+            self.logger.log_info("Loaded the previous address book from the snapshot")
+            return snapshot[1]
+
+        maps = []
+        for key in self.keys:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
+            maps.append(json.loads(response["Body"].read()))
+            etags[key] = response["ETag"]
+
+        self._write_snapshot(etags, tuple(maps))
+        self.logger.log_info("Downloaded the previous address book into a new snapshot")
+
+        return tuple(maps)
+
+    def save(self, maps: tuple[Any, Any, Any], etags: dict[str, str | None]) -> None:
+        """
+        Snapshots newly published maps with the ETags their uploads returned
+
+        The ETags come from the put_object responses, so nothing is requested from S3 here.
+        Maps that are not dicts (e.g. read from a SqliteMemberStore) are not snapshotted, as
+        that would load them into memory. Failures are logged, as the snapshot is only a cache.
+
+        Args:
+            maps: user_to_email, email_to_user and user_to_id as just published
+            etags: key → ETag of each object as uploaded to bucket_name
+        """
+        if not all(type(data) is dict for data in maps):
+            self.logger.log_info("Not snapshotting member maps that are not in memory")
+            return
+
+        uploaded_etags = {}
+        for key in self.keys:
+            etag = etags.get(key)
+            if not etag:
+                self.logger.log_warning(
+                    f"Unable to save the address book snapshot: no ETag for {key}"
+                )
+                return
+            uploaded_etags[key] = etag
+
+        try:
+            self._write_snapshot(uploaded_etags, tuple(maps))
+        except (OSError, ValueError) as error:
+            self.logger.log_warning(
+                f"Unable to save the address book snapshot: {error}"
+            )
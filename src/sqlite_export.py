@@ -0,0 +1,152 @@
+"""This file builds a queryable SQLite database of the address book
+
+The database holds one row per member and one row per verified email, with indexes on the
+normalised (trimmed, lower case) login and email so lookups only touch a handful of pages.
+Rows are inserted FETCH_SIZE at a time as the maps are iterated, so the SQLite member store's
+maps are streamed into the file without a copy of the address book being held in memory.
+A small page size is used so that HTTP range-request readers (e.g. sql.js-httpvfs) can query
+the object in place on S3 without downloading the whole file.
+
+Typical usage example:
+
+    path = build_address_book_db(user_to_email, email_to_user, user_to_id, "/tmp/addressBook.sqlite3")
+"""
+
+import os
+import sqlite3
+from itertools import islice
+from typing import Any, Iterable, Iterator, Mapping
+
+from member_store import FETCH_SIZE
+
+# Small pages keep each range request cheap for HTTP VFS readers
+SQLITE_PAGE_SIZE = 1024
+
+SQLITE_CONTENT_TYPE = "application/vnd.sqlite3"
+
+SCHEMA = """
+    CREATE TABLE members (
+        member_id INTEGER PRIMARY KEY,
+        login TEXT NOT NULL,
+        login_normalised TEXT NOT NULL,
+        database_id INTEGER
+    );
+    CREATE TABLE emails (
+        email TEXT NOT NULL,
+        email_normalised TEXT NOT NULL,
+        member_id INTEGER NOT NULL REFERENCES members(member_id)
+    );
+"""
+
+INDEXES = """
+    CREATE INDEX idx_members_login ON members(login_normalised);
+    CREATE INDEX idx_emails_email ON emails(email_normalised);
+    CREATE INDEX idx_emails_member ON emails(member_id);
+"""
+
+
+def normalise_key(value: str) -> str:
+    """
+    Normalises a login or email address for case-insensitive lookups
+
+    Args:
+        value: The login or email address
+
+    Returns:
+        str: The trimmed, lower case value
+    """
+    return value.strip().lower()
+
+
+def _batches(items: Iterable[Any]) -> Iterator[list[Any]]:
+    """Splits items into lists of FETCH_SIZE."""
+    iterator = iter(items)
+    while batch := list(islice(iterator, FETCH_SIZE)):
+        yield batch
+
+
+def _lookup_many(mapping: Mapping[str, Any], keys: list[str]) -> dict[str, Any]:
+    """Looks up a batch of keys, in one query if the mapping is a SqliteMapping."""
+    get_many = getattr(mapping, "get_many", None)
+    if get_many is not None:
+        return get_many(keys)
+
+    return {key: mapping[key] for key in keys if key in mapping}
+
+
+def build_address_book_db(
+    user_to_email: Mapping[str, list[str]],
+    email_to_user: Mapping[str, str],
+    user_to_id: Mapping[str, int],
+    path: str,
+    page_size: int = SQLITE_PAGE_SIZE,
+) -> str:
+    """
+    Builds an indexed SQLite database holding the members, emails and IDs
+
+    Args:
+        user_to_email: username → list of verified org emails
+        email_to_user: email → username
+        user_to_id: username → GitHub account ID
+        path: Where to write the database file, replaced if it already exists
+        page_size: SQLite page size in bytes
+
+    Returns:
+        str: The path of the written database
+    """
+
+    if os.path.exists(path):
+        os.remove(path)
+
+    connection = sqlite3.connect(path)
+
+    try:
+        # page_size must be set before the first table is created
+        connection.execute(f"PRAGMA page_size = {int(page_size)}")
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.executescript(SCHEMA)
+
+        # Resolves each email's member_id while the emails are inserted, dropped afterwards
+        connection.execute(
+            "CREATE UNIQUE INDEX idx_members_login_exact ON members(login)"
+        )
+
+        with connection:
+            member_id = 0
+            for usernames in _batches(user_to_email):
+                ids = _lookup_many(user_to_id, usernames)
+                rows = []
+                for username in usernames:
+                    member_id += 1
+                    rows.append(
+                        (
+                            member_id,
+                            username,
+                            normalise_key(username),
+                            ids.get(username),
+                        )
+                    )
+                connection.executemany("INSERT INTO members VALUES (?, ?, ?, ?)", rows)
+
+            # Emails of a username with no member row are skipped by the SELECT
+            for pairs in _batches(email_to_user.items()):
+                connection.executemany(
+                    "INSERT INTO emails SELECT ?, ?, member_id FROM members WHERE login = ?",
+                    [
+                        (address, normalise_key(address), username)
+                        for address, username in pairs
+                    ],
+                )
+
+        connection.execute("DROP INDEX idx_members_login_exact")
+
+        # Building indexes after the bulk insert keeps them compact
+        connection.executescript(INDEXES)
+        connection.execute("ANALYZE")
+        connection.commit()
+        connection.execute("VACUUM")
+    finally:
+        connection.close()
+
+    return path
@@ -0,0 +1,145 @@
+"""This file contains the Tracer class for timing the stages of a run
+
+Spans are recorded around the slow calls of a run (fetching the access token, each GraphQL page,
+each serialization and each S3 upload) so a slow run shows where its time went. The spans can be
+written as a Chrome trace-event file for local runs, to open in chrome://tracing or
+https://ui.perfetto.dev, or summarised into a compact record for the Lambda logs.
+
+Typical usage example:
+
+    tracer = Tracer()
+    with tracer.span("s3.put_object", key=key):
+        s3_client.put_object(...)
+    tracer.write_chrome_trace("trace.json")
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+
+class Tracer:
+    """
+    Records timed spans and exports them as trace events or a summary
+
+    Atrributes:
+        enabled: Whether spans are recorded
+        spans: The recorded spans as (name, start ns, duration ns, thread id, args) tuples
+
+    Methods:
+        span: Context manager timing the code inside it
+        to_chrome_trace: Returns the spans in Chrome trace-event format
+        write_chrome_trace: Writes the Chrome trace-event JSON to a file
+        summary: Returns per-span-name totals for logging
+    """
+
+    def __init__(self, enabled: bool = True):
+        """
+        Initialises the Tracer.
+
+        Args:
+            enabled: Record spans. A disabled tracer costs almost nothing to call.
+        """
+        self.enabled = enabled
+        self.origin_ns = time.perf_counter_ns()
+        self.spans: list[tuple[str, int, int, int, dict[str, Any]]] = []
+
+    @contextmanager
+    def span(self, name: str, **args: Any) -> Iterator[dict[str, Any]]:
+        """
+        Times the code inside the with block
+
+        Args:
+            name: The span name, e.g. "s3.put_object"
+            args: Details shown with the span in a trace viewer
+
+        Yields:
+            dict: The span's args, which the block may add to (e.g. a response size)
+        """
+        if not self.enabled:
+            yield args
+            return
+
+        start = time.perf_counter_ns()
+        try:
+            yield args
+        finally:
+            # list.append is atomic, so spans can be recorded from worker threads
+            self.spans.append(
+                (
+                    name,
+                    start,
+                    time.perf_counter_ns() - start,
+                    threading.get_ident(),
+                    args,
+                )
+            )
+
+    def to_chrome_trace(self) -> dict[str, Any]:
+        """
+        Returns the spans in Chrome trace-event format
+
+        Returns:
+            dict: A trace with one complete ("X") event per span, times in microseconds
+        """
+        pid = os.getpid()
+
+        return {
+            "traceEvents": [
+                {
+                    "name": name,
+                    "cat": name.split(".")[0],
+                    "ph": "X",
+                    "ts": (start - self.origin_ns) / 1000,
+                    "dur": duration / 1000,
+                    "pid": pid,
+                    "tid": thread_id,
+                    "args": {key: str(value) for key, value in args.items()},
+                }
+                for name, start, duration, thread_id, args in self.spans
+            ],
+            "displayTimeUnit": "ms",
+        }
+
+    def write_chrome_trace(self, path: str) -> None:
+        """
+        Writes the Chrome trace-event JSON to a file
+
+        Args:
+            path: Where to write the trace
+        """
+        with open(path, "w") as trace_file:
+            json.dump(self.to_chrome_trace(), trace_file)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """
+        Returns per-span-name totals, compact enough for a single log record
+
+        Returns:
+            dict: span name → count, total_ms and max_ms
+        """
+        totals: dict[str, dict[str, float]] = {}
+        for name, _, duration, _, _ in self.spans:
+            entry = totals.setdefault(
+                name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0}
+            )
+            milliseconds = duration / 1_000_000
+            entry["count"] += 1
+            entry["total_ms"] += milliseconds
+            entry["max_ms"] = max(entry["max_ms"], milliseconds)
+
+        return {
+            name: {
+                "count": entry["count"],
+                "total_ms": round(entry["total_ms"], 3),
+                "max_ms": round(entry["max_ms"], 3),
+            }
+            for name, entry in totals.items()
+        }
+
+
+# Shared disabled tracer used when no tracer is passed in
+NULL_TRACER = Tracer(enabled=False)
@@ -61,6 +61,18 @@ data "aws_iam_policy_document" "lambda_s3_policy" {
       "arn:aws:s3:::*/*" # Allows access to all objects within all buckets
     ]
   }
+
+  statement {
+    effect = "Allow"
+
+    actions = [
+      "s3:DeleteObject" # Allows releasing the refresh lock, and nothing else
+    ]
+
+    resources = [
+      "arn:aws:s3:::${local.bucket_name}/AddressBook/.refresh.lock"
+    ]
+  }
 }
 
 data "aws_iam_policy_document" "lambda_secret_manager_policy" {
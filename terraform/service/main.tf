@@ -55,6 +55,10 @@ resource "aws_lambda_function" "lambda_function" {
       AWS_SECRET_NAME      = var.aws_secret_name
       AWS_ACCOUNT_NAME     = var.env_name
       S3_BUCKET_NAME       = local.bucket_name
+      OUTPUT_FORMATS       = var.output_formats
+      S3_REPLICA_TARGETS   = var.s3_replica_targets
+      RUN_LOCK_ENABLED     = "true"
+      RUN_LOCK_TTL_SECONDS = var.lambda_timeout * 2
     }
   }
 }
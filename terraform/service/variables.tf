@@ -83,6 +83,18 @@ variable "lambda_memory" {
   default     = 128
 }
 
+variable "output_formats" {
+  description = "Comma separated list of address book outputs to publish (json, sqlite, parquet, bloom, prefix-index, normalized)"
+  type        = string
+  default     = "json"
+}
+
+variable "s3_replica_targets" {
+  description = "Comma separated bucket:region pairs the address book is also published to, e.g. address-book-dr:eu-west-1"
+  type        = string
+  default     = ""
+}
+
 variable "region" {
   description = "AWS region"
   type        = string
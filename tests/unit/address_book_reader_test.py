@@ -0,0 +1,146 @@
+import json
+import pytest
+from botocore.exceptions import ClientError
+from address_book_reader import AddressBookReader, PARSED_SIZE_MULTIPLIER
+from fixtures import local_s3
+
+BUCKET = "bucket"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def publish(s3, file_name, data):
+    s3.put_object(
+        Bucket=BUCKET,
+        Key="AddressBook/" + file_name,
+        Body=json.dumps(data, indent=2).encode(),
+    )
+
+
+@pytest.fixture
+def published(local_s3):
+    publish(local_s3, "addressBookUsernameKey.json", {"alice": ["a@ons.gov.uk"]})
+    publish(local_s3, "addressBookEmailKey.json", {"a@ons.gov.uk": "alice"})
+    publish(local_s3, "addressBookIDKey.json", {"alice": 101})
+    return local_s3
+
+
+def get_calls(s3):
+    return [call for call in s3.calls if call[0] == "get_object"]
+
+
+def test_lookups(published):
+    """Answers each lookup from the published files."""
+    reader = AddressBookReader(published, BUCKET)
+
+    assert reader.user_for_email("a@ons.gov.uk") == "alice"
+    assert reader.user_for_email("nobody@ons.gov.uk") is None
+    assert reader.emails_for_user("alice") == ["a@ons.gov.uk"]
+    assert reader.emails_for_user("nobody") == []
+    assert reader.id_for_user("alice") == 101
+    assert reader.id_for_user("nobody") is None
+
+
+def test_cached_within_ttl(published):
+    """Repeated lookups within the TTL don't call S3."""
+    reader = AddressBookReader(published, BUCKET, clock=FakeClock())
+
+    for _ in range(5):
+        reader.user_for_email("a@ons.gov.uk")
+
+    assert len(get_calls(published)) == 1
+    assert reader.stats == {"hits": 4, "not_modified": 0, "downloads": 1}
+
+
+def test_revalidates_with_etag_after_ttl(published):
+    """An unchanged file costs one 304 once the TTL has passed."""
+    clock = FakeClock()
+    reader = AddressBookReader(published, BUCKET, ttl_seconds=60, clock=clock)
+    reader.user_for_email("a@ons.gov.uk")
+
+    clock.now = 61
+    assert reader.user_for_email("a@ons.gov.uk") == "alice"
+
+    assert reader.stats == {"hits": 0, "not_modified": 1, "downloads": 1}
+    assert len(get_calls(published)) == 2
+
+    # The 304 restarts the TTL
+    clock.now = 100
+    reader.user_for_email("a@ons.gov.uk")
+    assert reader.stats["hits"] == 1
+
+
+def test_downloads_changed_file(published):
+    """A republished file is downloaded again after the TTL."""
+    clock = FakeClock()
+    reader = AddressBookReader(published, BUCKET, ttl_seconds=60, clock=clock)
+    reader.user_for_email("b@ons.gov.uk")
+
+    publish(published, "addressBookEmailKey.json", {"b@ons.gov.uk": "bob"})
+    clock.now = 61
+
+    assert reader.user_for_email("b@ons.gov.uk") == "bob"
+    assert reader.stats["downloads"] == 2
+
+
+def test_evicts_least_recently_used(published):
+    """Keeps the cache within its size limit, evicting the least recently used file."""
+    sizes = {
+        key: len(stored["Body"]) * PARSED_SIZE_MULTIPLIER
+        for (_, key), stored in published.objects.items()
+    }
+    limit = (
+        sizes["AddressBook/addressBookIDKey.json"]
+        + sizes["AddressBook/addressBookUsernameKey.json"]
+    )
+    reader = AddressBookReader(
+        published, BUCKET, max_cache_bytes=limit, clock=FakeClock()
+    )
+
+    reader.user_for_email("a@ons.gov.uk")
+    reader.id_for_user("alice")
+    reader.emails_for_user("alice")
+
+    assert list(reader._cache) == [
+        "AddressBook/addressBookIDKey.json",
+        "AddressBook/addressBookUsernameKey.json",
+    ]
+    assert reader._cache_bytes == limit
+
+    reader.user_for_email("a@ons.gov.uk")
+    assert reader.stats["downloads"] == 4
+    assert "AddressBook/addressBookIDKey.json" not in reader._cache
+
+
+def test_missing_file_raises(local_s3):
+    """Raises S3 errors other than 304."""
+    reader = AddressBookReader(local_s3, BUCKET)
+
+    with pytest.raises(ClientError):
+        reader.user_for_email("a@ons.gov.uk")
+
+
+def test_sends_etag_when_revalidating(published):
+    """Revalidates with the cached file's ETag."""
+    requests = []
+
+    class RecordingClient:
+        def get_object(self, **kwargs):
+            requests.append(kwargs)
+            return published.get_object(**kwargs)
+
+    clock = FakeClock()
+    reader = AddressBookReader(RecordingClient(), BUCKET, ttl_seconds=60, clock=clock)
+    reader.id_for_user("alice")
+    clock.now = 61
+    reader.id_for_user("alice")
+
+    etag = published.objects[(BUCKET, "AddressBook/addressBookIDKey.json")]["ETag"]
+    assert "IfNoneMatch" not in requests[0]
+    assert requests[1]["IfNoneMatch"] == etag
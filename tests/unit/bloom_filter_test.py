@@ -0,0 +1,62 @@
+import pytest
+from bloom_filter import build_bloom_filter, bloom_parameters
+from bloom_reader import BloomFilterReader, HEADER
+
+
+def test_bloom_filter_contains_all_keys():
+    """Every added email is reported as present, ignoring case and whitespace."""
+    emails = [f"user{i}@ons.gov.uk" for i in range(2000)]
+    bloom = BloomFilterReader.from_bytes(build_bloom_filter(emails))
+
+    assert bloom.item_count == 2000
+    assert all(email in bloom for email in emails)
+    assert bloom.might_contain("  USER42@ONS.gov.uk ")
+
+
+def test_bloom_filter_false_positive_rate():
+    """The observed false-positive rate stays near the configured rate."""
+    emails = [f"user{i}@ons.gov.uk" for i in range(5000)]
+    bloom = BloomFilterReader.from_bytes(build_bloom_filter(emails, 0.01))
+
+    trials = 20000
+    false_positives = sum(
+        bloom.might_contain(f"stranger{i}@example.com") for i in range(trials)
+    )
+
+    assert false_positives / trials < 0.02
+
+
+def test_bloom_filter_is_small():
+    """A 5,000 email filter at 0.1% fits in a few kilobytes."""
+    emails = [f"user{i}@ons.gov.uk" for i in range(5000)]
+    body = build_bloom_filter(emails, 0.001)
+
+    assert len(body) < 10 * 1024
+
+
+def test_bloom_filter_empty():
+    """An empty filter contains nothing."""
+    bloom = BloomFilterReader.from_bytes(build_bloom_filter([]))
+
+    assert bloom.item_count == 0
+    assert "anyone@ons.gov.uk" not in bloom
+
+
+def test_bloom_parameters_rejects_bad_rate():
+    """The false-positive rate must be between 0 and 1."""
+    with pytest.raises(ValueError):
+        bloom_parameters(10, 0)
+    with pytest.raises(ValueError):
+        bloom_parameters(10, 1.5)
+
+
+def test_reader_rejects_invalid_data():
+    """Rejects objects that are not a supported filter."""
+    body = build_bloom_filter(["a@ons.gov.uk"])
+
+    with pytest.raises(ValueError):
+        BloomFilterReader.from_bytes(b"ABBF")
+    with pytest.raises(ValueError):
+        BloomFilterReader.from_bytes(b"XXXX" + body[4:])
+    with pytest.raises(ValueError):
+        BloomFilterReader.from_bytes(body[: HEADER.size])
@@ -1,4 +1,8 @@
+import hashlib
+import io
+import threading
 import pytest
+from botocore.exceptions import ClientError
 
 
 @pytest.fixture
@@ -60,3 +64,83 @@ def set_env(monkeypatch):
     monkeypatch.setenv("GITHUB_ORG", "test-org")
     monkeypatch.setenv("AWS_SECRET_NAME", "test-secret")
     monkeypatch.setenv("GITHUB_APP_CLIENT_ID", "12345")
+
+
+@pytest.fixture
+def local_s3():
+    class LocalS3:
+        """In-memory S3 stand-in supporting the conditional requests S3 implements."""
+
+        def __init__(self):
+            self.objects = {}
+            self.calls = []
+            self.lock = threading.Lock()
+
+        @staticmethod
+        def _error(code, status, operation):
+            return ClientError(
+                {
+                    "Error": {"Code": code, "Message": code},
+                    "ResponseMetadata": {"HTTPStatusCode": status},
+                },
+                operation,
+            )
+
+        def _get(self, bucket, key, operation, status=404):
+            stored = self.objects.get((bucket, key))
+            if stored is None:
+                code = "NoSuchKey" if operation == "GetObject" else str(status)
+                raise self._error(code, status, operation)
+            return stored
+
+        def put_object(
+            self, Bucket, Key, Body, IfNoneMatch=None, IfMatch=None, **kwargs
+        ):
+            body = Body.read() if hasattr(Body, "read") else bytes(Body)
+            with self.lock:
+                self.calls.append(("put_object", Key))
+                existing = self.objects.get((Bucket, Key))
+                if IfNoneMatch == "*" and existing is not None:
+                    raise self._error("PreconditionFailed", 412, "PutObject")
+                if IfMatch is not None:
+                    if existing is None:
+                        raise self._error("NoSuchKey", 404, "PutObject")
+                    if existing["ETag"] != IfMatch:
+                        raise self._error("PreconditionFailed", 412, "PutObject")
+
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                self.objects[(Bucket, Key)] = {
+                    "Body": body,
+                    "ETag": etag,
+                    "ContentType": kwargs.get("ContentType"),
+                }
+                return {"ETag": etag}
+
+        def get_object(self, Bucket, Key, IfNoneMatch=None, **kwargs):
+            with self.lock:
+                self.calls.append(("get_object", Key))
+                stored = self._get(Bucket, Key, "GetObject")
+                if IfNoneMatch is not None and IfNoneMatch == stored["ETag"]:
+                    raise self._error("304", 304, "GetObject")
+                return {
+                    "Body": io.BytesIO(stored["Body"]),
+                    "ETag": stored["ETag"],
+                    "ContentLength": len(stored["Body"]),
+                }
+
+        def head_object(self, Bucket, Key, **kwargs):
+            with self.lock:
+                self.calls.append(("head_object", Key))
+                stored = self._get(Bucket, Key, "HeadObject")
+                return {"ETag": stored["ETag"], "ContentLength": len(stored["Body"])}
+
+        def delete_object(self, Bucket, Key, IfMatch=None, **kwargs):
+            with self.lock:
+                self.calls.append(("delete_object", Key))
+                stored = self._get(Bucket, Key, "DeleteObject")
+                if IfMatch is not None and stored["ETag"] != IfMatch:
+                    raise self._error("PreconditionFailed", 412, "DeleteObject")
+                del self.objects[(Bucket, Key)]
+                return {}
+
+    return LocalS3()
@@ -354,3 +354,240 @@ def test_get_all_user_details_no_org(monkeypatch, logger_spy, secret_manager_val
         "Organisation 'test-org not found or inaccessible'" in m
         for m in logger_spy.all_calls
     )
+
+
+def test_get_all_user_details_traced(monkeypatch, logger_spy, secret_manager_valid):
+    """Records a span for the token fetch and for each GraphQL page."""
+    from tracing import Tracer
+
+    monkeypatch.setattr(
+        github_services.github_api_toolkit,
+        "get_token_as_installation",
+        lambda org, pem, app_client_id: ("token123", "inst1"),
+    )
+
+    class FakeResponse:
+        def __init__(self, has_next_page):
+            self.has_next_page = has_next_page
+
+        def json(self):
+            return {
+                "data": {
+                    "organization": {
+                        "membersWithRole": {
+                            "pageInfo": {
+                                "hasNextPage": self.has_next_page,
+                                "endCursor": "CUR" if self.has_next_page else None,
+                            },
+                            "nodes": [],
+                        }
+                    }
+                }
+            }
+
+    class FakeQL:
+        def __init__(self):
+            self.calls = 0
+
+        def make_ql_request(self, query, params):
+            self.calls += 1
+            return FakeResponse(has_next_page=self.calls < 3)
+
+    monkeypatch.setattr(
+        github_services.github_api_toolkit,
+        "github_graphql_interface",
+        lambda token: FakeQL(),
+    )
+
+    tracer = Tracer()
+    services = github_services.GitHubServices(
+        org="test-org",
+        logger=logger_spy,
+        secret_manager=secret_manager_valid,
+        secret_name="test-secret",
+        app_client_id="12345",
+        tracer=tracer,
+    )
+    services.get_all_user_details()
+
+    assert [(span[0], span[4]) for span in tracer.spans] == [
+        ("github.get_access_token", {}),
+        ("github.graphql_page", {"page": 1}),
+        ("github.graphql_page", {"page": 2}),
+        ("github.graphql_page", {"page": 3}),
+    ]
+
+
+def test_get_all_user_details_into_store(monkeypatch, logger_spy, secret_manager_valid):
+    """Adds each page of members to the given store and returns its maps."""
+    from member_store import SqliteMemberStore
+
+    monkeypatch.setattr(
+        github_services.github_api_toolkit,
+        "get_token_as_installation",
+        lambda org, pem, app_client_id: ("token123", "inst1"),
+    )
+
+    pages = [
+        [
+            {
+                "login": "alice",
+                "databaseId": 101,
+                "organizationVerifiedDomainEmails": ["a@org.com"],
+            }
+        ],
+        [
+            {
+                "login": "bob",
+                "databaseId": 202,
+                "organizationVerifiedDomainEmails": ["b@org.com"],
+            },
+            {
+                "login": "carol",
+                "databaseId": 303,
+                "organizationVerifiedDomainEmails": [],
+            },
+        ],
+    ]
+
+    class FakeResponse:
+        def __init__(self, index):
+            self.index = index
+
+        def json(self):
+            has_next_page = self.index + 1 < len(pages)
+            return {
+                "data": {
+                    "organization": {
+                        "membersWithRole": {
+                            "pageInfo": {
+                                "hasNextPage": has_next_page,
+                                "endCursor": "CUR" if has_next_page else None,
+                            },
+                            "nodes": pages[self.index],
+                        }
+                    }
+                }
+            }
+
+    class FakeQL:
+        def __init__(self):
+            self.calls = 0
+
+        def make_ql_request(self, query, params):
+            self.calls += 1
+            return FakeResponse(self.calls - 1)
+
+    monkeypatch.setattr(
+        github_services.github_api_toolkit,
+        "github_graphql_interface",
+        lambda token: FakeQL(),
+    )
+
+    class RecordingStore(SqliteMemberStore):
+        def __init__(self):
+            super().__init__()
+            self.pages = []
+
+        def add_members(self, members):
+            self.pages.append(list(members))
+            super().add_members(members)
+
+    services = github_services.GitHubServices(
+        org="test-org",
+        logger=logger_spy,
+        secret_manager=secret_manager_valid,
+        secret_name="test-secret",
+        app_client_id="12345",
+    )
+    store = RecordingStore()
+
+    user_to_email, email_to_user, user_to_id = services.get_all_user_details(
+        store=store
+    )
+
+    assert store.pages == [
+        [("alice", ["a@org.com"], 101)],
+        [("bob", ["b@org.com"], 202)],
+    ]
+    assert dict(user_to_email) == {"alice": ["a@org.com"], "bob": ["b@org.com"]}
+    assert dict(email_to_user) == {"a@org.com": "alice", "b@org.com": "bob"}
+    assert dict(user_to_id) == {"alice": 101, "bob": 202}
+    store.close()
+
+
+def test_get_all_user_details_stream_parse(
+    monkeypatch, logger_spy, secret_manager_valid
+):
+    """Pages requested through the streaming interface are parsed from the connection."""
+    pytest.importorskip("ijson")
+
+    monkeypatch.setattr(
+        github_services.github_api_toolkit,
+        "get_token_as_installation",
+        lambda org, pem, app_client_id: ("token123", "inst1"),
+    )
+
+    class FakeStreamedResponse(github_services.graphql_stream.StreamedResponse):
+        def __init__(self):
+            pass
+
+        def json(self):
+            raise AssertionError("the response should be stream parsed")
+
+        def parse_members_page(self):
+            return (
+                False,
+                None,
+                [("alice", 101, ["a@org.com"]), ("bob", 202, [])],
+            )
+
+    class FakeStreamingQL:
+        def __init__(self, token):
+            assert token == "token123"
+
+        def make_ql_request(self, query, params):
+            return FakeStreamedResponse()
+
+    monkeypatch.setattr(
+        github_services.graphql_stream, "StreamingGraphQLInterface", FakeStreamingQL
+    )
+
+    services = github_services.GitHubServices(
+        org="test-org",
+        logger=logger_spy,
+        secret_manager=secret_manager_valid,
+        secret_name="test-secret",
+        app_client_id="12345",
+        stream_parse=True,
+    )
+
+    assert isinstance(services.ql, FakeStreamingQL)
+    assert services.get_all_user_details() == (
+        {"alice": ["a@org.com"]},
+        {"a@org.com": "alice"},
+        {"alice": 101},
+    )
+    assert logger_spy.warnings == [
+        "Skipping member 'bob' with no verified domain emails"
+    ]
+
+
+def test_stream_parse_requires_ijson(monkeypatch, logger_spy, secret_manager_valid):
+    """Fails when streaming is requested without ijson installed."""
+    monkeypatch.setattr(
+        github_services.github_api_toolkit,
+        "get_token_as_installation",
+        lambda org, pem, app_client_id: ("token123", "inst1"),
+    )
+    monkeypatch.setattr(github_services.graphql_stream, "ijson", None)
+
+    with pytest.raises(ImportError, match="--extras streaming"):
+        github_services.GitHubServices(
+            org="test-org",
+            logger=logger_spy,
+            secret_manager=secret_manager_valid,
+            secret_name="test-secret",
+            app_client_id="12345",
+            stream_parse=True,
+        )
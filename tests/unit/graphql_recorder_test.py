@@ -0,0 +1,198 @@
+import json
+import threading
+import pytest
+import github_services
+from graphql_recorder import (
+    HttpGraphQLInterface,
+    RecordingGraphQLInterface,
+    ReplayGraphQLInterface,
+    Sanitizer,
+    load_recording,
+    make_replay_server,
+)
+from fixtures import logger_spy
+
+MEMBERS = [
+    ("alice", 101, ["alice@ons.gov.uk"]),
+    ("bob", 20202, ["bob@ons.gov.uk", "robert@statistics.gov.uk"]),
+    ("carol", 3, ["carol@ons.gov.uk"]),
+]
+
+
+class FakeResponse:
+    def __init__(self, body, status_code=200, headers=None):
+        self.body = body
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def json(self):
+        return self.body
+
+
+class FakeQL:
+    """Serves MEMBERS in pages of two, with real-looking cursors."""
+
+    def __init__(self):
+        self.requests = []
+
+    def make_ql_request(self, query, params):
+        self.requests.append(params)
+        start = 0 if params["cursor"] is None else int(params["cursor"][-1])
+        nodes = MEMBERS[start : start + 2]
+        return FakeResponse(
+            {
+                "data": {
+                    "organization": {
+                        "membersWithRole": {
+                            "pageInfo": {
+                                "hasNextPage": start + 2 < len(MEMBERS),
+                                "endCursor": f"Y3Vyc29yOnYyOpHO{start + 2}",
+                            },
+                            "nodes": [
+                                {
+                                    "login": login,
+                                    "databaseId": database_id,
+                                    "organizationVerifiedDomainEmails": emails,
+                                }
+                                for login, database_id, emails in nodes
+                            ],
+                        }
+                    }
+                }
+            },
+            headers={"X-RateLimit-Remaining": "4999", "Set-Cookie": "secret"},
+        )
+
+
+def services_with(ql, logger):
+    return github_services.GitHubServices(
+        "test-org", logger, None, "test-secret", "12345", ql=ql
+    )
+
+
+def record(tmp_path, logger, sanitizer=None):
+    path = str(tmp_path / "recording.jsonl")
+    recorder = RecordingGraphQLInterface(
+        FakeQL(), path, org="test-org", sanitizer=sanitizer
+    )
+    maps = services_with(recorder, logger).get_all_user_details()
+    recorder.close()
+    return path, maps
+
+
+def test_sanitizer_is_consistent_and_keeps_lengths():
+    sanitizer = Sanitizer("test-org", key=b"k")
+
+    login = sanitizer.pseudonym("alice", "login")
+    assert login == Sanitizer(key=b"k").pseudonym("alice", "login")
+    assert len(login) == 5 and login != "alice"
+    assert login != sanitizer.pseudonym("alice", "cursor")
+
+    email = sanitizer.email("alice@ons.gov.uk")
+    assert len(email) == len("alice@ons.gov.uk")
+    assert email.endswith(".uk") and "ons" not in email
+
+    assert len(str(sanitizer.database_id(20202))) == 5
+    assert sanitizer.text("Could not resolve 'test-org'") == (
+        f"Could not resolve '{sanitizer.pseudonym('test-org', 'org')}'"
+    )
+
+
+def test_recording_is_sanitized(tmp_path, logger_spy):
+    """No login, email, ID, cursor or org name reaches the recording."""
+    path, maps = record(tmp_path, logger_spy)
+
+    assert maps[0]["bob"] == ["bob@ons.gov.uk", "robert@statistics.gov.uk"]
+    text = open(path).read()
+    for secret in ("alice", "robert", "ons.gov", "Y3Vyc29y", "test-org"):
+        assert secret not in text
+
+    exchanges = load_recording(path)
+    assert len(exchanges) == 2
+    assert exchanges[0]["variables"]["cursor"] is None
+    assert exchanges[0]["headers"] == {"x-ratelimit-remaining": "4999"}
+    assert exchanges[0]["elapsed_ms"] >= 0
+    # The next request's cursor matches the previous page's, so pages still chain
+    assert (
+        exchanges[1]["variables"]["cursor"]
+        == exchanges[0]["body"]["data"]["organization"]["membersWithRole"]["pageInfo"][
+            "endCursor"
+        ]
+    )
+
+
+def test_replay_reproduces_the_run(tmp_path, logger_spy):
+    """Replaying gives the pseudonymised members, with latencies scaled."""
+    sanitizer = Sanitizer("test-org", key=b"k")
+    path, _ = record(tmp_path, logger_spy, sanitizer)
+    delays = []
+
+    replay = ReplayGraphQLInterface(
+        load_recording(path), latency_scale=2.0, sleep=delays.append
+    )
+    user_to_email, _, user_to_id = services_with(
+        replay, logger_spy
+    ).get_all_user_details()
+
+    bob = sanitizer.pseudonym("bob", "login")
+    assert list(user_to_email) == [
+        sanitizer.pseudonym(login, "login") for login, _, _ in MEMBERS
+    ]
+    assert user_to_email[bob] == [
+        sanitizer.email("bob@ons.gov.uk"),
+        sanitizer.email("robert@statistics.gov.uk"),
+    ]
+    assert user_to_id[bob] == sanitizer.database_id(20202)
+    assert delays == [
+        exchange["elapsed_ms"] * 2 / 1000 for exchange in load_recording(path)
+    ]
+
+
+def test_replay_failures(tmp_path):
+    """Recorded errors are raised again, and unrecorded requests are refused."""
+
+    class FailingQL:
+        def make_ql_request(self, query, params):
+            raise ConnectionError("test-org unreachable")
+
+    path = str(tmp_path / "recording.jsonl")
+    recorder = RecordingGraphQLInterface(FailingQL(), path, org="test-org")
+    with pytest.raises(ConnectionError):
+        recorder.make_ql_request("query", {"org": "test-org", "cursor": None})
+    recorder.close()
+
+    replay = ReplayGraphQLInterface(load_recording(path), latency_scale=0)
+    with pytest.raises(Exception, match="ConnectionError") as error:
+        replay.make_ql_request("query", {"cursor": None})
+    assert "test-org" not in str(error.value)
+
+    with pytest.raises(LookupError):
+        replay.make_ql_request("query", {"cursor": None})
+
+
+def test_load_recording_rejects_other_versions(tmp_path):
+    path = tmp_path / "recording.jsonl"
+    path.write_text(json.dumps({"version": 99}) + "\n")
+
+    with pytest.raises(ValueError, match="version 99"):
+        load_recording(str(path))
+
+
+def test_replay_server(tmp_path, logger_spy):
+    """The replay server answers GraphQL POSTs with the recorded responses."""
+    path, _ = record(tmp_path, logger_spy)
+    server = make_replay_server(load_recording(path), latency_scale=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        ql = HttpGraphQLInterface(f"http://127.0.0.1:{server.server_address[1]}/")
+        user_to_email, _, _ = services_with(ql, logger_spy).get_all_user_details()
+
+        response = ql.make_ql_request("query", {"cursor": None})
+        assert response.status_code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert len(user_to_email) == len(MEMBERS)
@@ -0,0 +1,195 @@
+import gzip
+import io
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import graphql_stream
+from graphql_stream import parse_members_page, StreamingGraphQLInterface
+
+pytest.importorskip("ijson")
+
+
+def page(organization):
+    return json.dumps({"data": {"organization": organization}}).encode("utf-8")
+
+
+def test_parses_page_info_and_nodes():
+    """Pulls the page info and each node's fields out of the response."""
+    body = page(
+        {
+            "membersWithRole": {
+                "pageInfo": {"hasNextPage": True, "endCursor": "CUR1"},
+                "nodes": [
+                    {
+                        "login": "alice",
+                        "databaseId": 101,
+                        "organizationVerifiedDomainEmails": ["a@org.com", "a2@org.com"],
+                    },
+                    {
+                        "databaseId": 202,
+                        "organizationVerifiedDomainEmails": ["b@org.com"],
+                    },
+                    {
+                        "login": "carol",
+                        "databaseId": None,
+                        "organizationVerifiedDomainEmails": None,
+                    },
+                    {"login": "dave", "organizationVerifiedDomainEmails": []},
+                ],
+            }
+        }
+    )
+
+    assert parse_members_page(body) == (
+        True,
+        "CUR1",
+        [
+            ("alice", 101, ["a@org.com", "a2@org.com"]),
+            (None, 202, ["b@org.com"]),
+            ("carol", None, []),
+            ("dave", None, []),
+        ],
+    )
+
+
+def test_last_page():
+    """Reads the end of pagination."""
+    body = page(
+        {
+            "membersWithRole": {
+                "nodes": [],
+                "pageInfo": {"hasNextPage": False, "endCursor": None},
+            }
+        }
+    )
+
+    assert parse_members_page(body) == (False, None, [])
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        page(None),
+        page({}),
+        json.dumps({"data": {}}).encode(),
+        json.dumps({"errors": [{"message": "Could not resolve"}]}).encode(),
+    ],
+)
+def test_missing_organisation(body):
+    """Returns None when the organisation is missing, as the .json() path does."""
+    assert parse_members_page(body) is None
+
+
+def test_requires_ijson(monkeypatch):
+    """Explains how to install ijson when it is missing."""
+    monkeypatch.setattr(graphql_stream, "ijson", None)
+
+    with pytest.raises(ImportError, match="--extras streaming"):
+        parse_members_page(page({}))
+
+
+def test_parses_file_like_body():
+    """Reads the body from a file-like object as it parses."""
+    body = page(
+        {
+            "membersWithRole": {
+                "pageInfo": {"hasNextPage": False, "endCursor": None},
+                "nodes": [{"login": "alice", "databaseId": 1}],
+            }
+        }
+    )
+
+    assert parse_members_page(io.BytesIO(body)) == (False, None, [("alice", 1, [])])
+
+
+@pytest.fixture
+def graphql_server():
+    """Serves one membersWithRole page, gzipped if asked, and records the requests."""
+    body = page(
+        {
+            "membersWithRole": {
+                "pageInfo": {"hasNextPage": True, "endCursor": "CUR1"},
+                "nodes": [
+                    {
+                        "login": "alice",
+                        "databaseId": 101,
+                        "organizationVerifiedDomainEmails": ["a@org.com"],
+                    }
+                ],
+            }
+        }
+    )
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            requests_seen.append(
+                (
+                    self.headers["Authorization"],
+                    json.loads(self.rfile.read(int(self.headers["Content-Length"]))),
+                )
+            )
+            data = body
+            self.send_response(200)
+            if "gzip" in self.path:
+                data = gzip.compress(body)
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", requests_seen
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("path", ["/graphql", "/gzip"])
+def test_streaming_interface_parses_from_socket(graphql_server, path):
+    """Posts the query and parses the unread body from the connection."""
+    url, requests_seen = graphql_server
+    ql = StreamingGraphQLInterface("token123", url=url + path)
+
+    response = ql.make_ql_request("query", {"cursor": None})
+
+    assert response.status_code == 200
+    assert not response.response._content_consumed
+    assert response.parse_members_page() == (
+        True,
+        "CUR1",
+        [("alice", 101, ["a@org.com"])],
+    )
+    assert requests_seen == [
+        ("token token123", {"query": "query", "variables": {"cursor": None}})
+    ]
+
+
+def test_streamed_response_after_json(graphql_server):
+    """Still parses once the body was read whole, as the GraphQL recorder does."""
+    url, _ = graphql_server
+    response = StreamingGraphQLInterface("token123", url=url).make_ql_request(
+        "query", {}
+    )
+
+    assert response.json()["data"]["organization"]["membersWithRole"]["nodes"]
+    assert response.parse_members_page() == (
+        True,
+        "CUR1",
+        [("alice", 101, ["a@org.com"])],
+    )
+
+
+def test_streaming_interface_requires_ijson(monkeypatch):
+    """Fails when it is created without ijson installed."""
+    monkeypatch.setattr(graphql_stream, "ijson", None)
+
+    with pytest.raises(ImportError, match="--extras streaming"):
+        StreamingGraphQLInterface("token123")
@@ -1,9 +1,10 @@
 import json
+import logging
 import os
 import builtins
 import pytest
 from lambda_function import lambda_handler
-from fixtures import set_env
+from fixtures import set_env, local_s3, logger_spy
 
 
 def test_lambda_valid(monkeypatch):
@@ -140,3 +141,596 @@ def test_lambda_handles_s3_write_failure(set_env, monkeypatch):
         lambda_handler(event={}, context=None)
 
     assert "S3 boom" in str(excinfo.value)
+
+
+def test_lambda_writes_sqlite_output(set_env, monkeypatch):
+    """Publishes the SQLite database alongside the JSON when enabled."""
+    monkeypatch.setenv("OUTPUT_FORMATS", "json,sqlite")
+    monkeypatch.setattr("lambda_function.boto3.client", lambda name: object())
+
+    class FakeServices:
+        def get_all_user_details(self):
+            return (
+                {"alice": ["alice@ons.gov.uk"]},
+                {"alice@ons.gov.uk": "alice"},
+                {"alice": 101},
+            )
+
+    class S3WriterStub:
+        def __init__(self):
+            self.writes = {}
+
+        def write_data_to_s3(self, filename, payload, content_type="application/json"):
+            if hasattr(payload, "read"):
+                payload = payload.read()
+            self.writes[filename] = (bytes(payload), content_type)
+
+    s3writer_stub = S3WriterStub()
+    monkeypatch.setattr(
+        "lambda_function.GitHubServices", lambda *a, **k: FakeServices()
+    )
+    monkeypatch.setattr("lambda_function.S3Writer", lambda *a, **k: s3writer_stub)
+
+    result = lambda_handler(event={}, context=None)
+
+    assert result["statusCode"] == 200
+    assert len(s3writer_stub.writes) == 4
+    payload, content_type = s3writer_stub.writes["AddressBook/addressBook.sqlite3"]
+    assert payload.startswith(b"SQLite format 3\x00")
+    assert content_type == "application/vnd.sqlite3"
+
+
+def test_lambda_sqlite_only(set_env, monkeypatch):
+    """Skips the JSON files when they are not listed in OUTPUT_FORMATS."""
+    monkeypatch.setenv("OUTPUT_FORMATS", "sqlite")
+    monkeypatch.setattr("lambda_function.boto3.client", lambda name: object())
+
+    class FakeServices:
+        def get_all_user_details(self):
+            return ({"alice": ["a@ons.gov.uk"]}, {"a@ons.gov.uk": "alice"}, {})
+
+    class S3WriterStub:
+        def __init__(self):
+            self.filenames = []
+
+        def write_data_to_s3(self, filename, payload, content_type="application/json"):
+            self.filenames.append(filename)
+
+    s3writer_stub = S3WriterStub()
+    monkeypatch.setattr(
+        "lambda_function.GitHubServices", lambda *a, **k: FakeServices()
+    )
+    monkeypatch.setattr("lambda_function.S3Writer", lambda *a, **k: s3writer_stub)
+
+    lambda_handler(event={}, context=None)
+
+    assert s3writer_stub.filenames == ["AddressBook/addressBook.sqlite3"]
+
+
+def test_lambda_writes_parquet_output(set_env, monkeypatch):
+    """Publishes the Parquet export when it is listed in OUTPUT_FORMATS."""
+    pytest.importorskip("pyarrow")
+    monkeypatch.setenv("OUTPUT_FORMATS", "parquet")
+    monkeypatch.setattr("lambda_function.boto3.client", lambda name: object())
+
+    class FakeServices:
+        def get_all_user_details(self):
+            return ({"alice": ["a@ons.gov.uk"]}, {"a@ons.gov.uk": "alice"}, {})
+
+    class S3WriterStub:
+        def __init__(self):
+            self.writes = {}
+
+        def write_data_to_s3(self, filename, payload, content_type="application/json"):
+            if hasattr(payload, "read"):
+                payload = payload.read()
+            self.writes[filename] = (bytes(payload), content_type)
+
+    s3writer_stub = S3WriterStub()
+    monkeypatch.setattr(
+        "lambda_function.GitHubServices", lambda *a, **k: FakeServices()
+    )
+    monkeypatch.setattr("lambda_function.S3Writer", lambda *a, **k: s3writer_stub)
+
+    lambda_handler(event={}, context=None)
+
+    payload, content_type = s3writer_stub.writes["AddressBook/addressBook.parquet"]
+    assert payload.startswith(b"PAR1")
+    assert content_type == "application/vnd.apache.parquet"
+
+
+def test_lambda_refresh_lock_held(set_env, monkeypatch, local_s3, logger_spy):
+    """Exits with 409 before touching GitHub when another run holds the lock."""
+    from run_lock import S3RunLock
+
+    monkeypatch.setenv("RUN_LOCK_ENABLED", "true")
+    monkeypatch.setenv("S3_BUCKET_NAME", "bucket")
+    monkeypatch.setattr(
+        "lambda_function.boto3.client",
+        lambda name: local_s3 if name == "s3" else object(),
+    )
+
+    def fail_if_called(*args, **kwargs):
+        raise AssertionError("GitHub must not be queried while the lock is held")
+
+    monkeypatch.setattr("lambda_function.GitHubServices", fail_if_called)
+
+    holder = S3RunLock(logger_spy, local_s3, "bucket", owner="other-run")
+    assert holder.acquire()
+
+    result = lambda_handler(event={}, context=None)
+
+    assert result["statusCode"] == 409
+    assert "already in progress" in json.loads(result["body"])["message"]
+
+
+def test_lambda_refresh_lock_released(set_env, monkeypatch, local_s3):
+    """Takes the lock for the run and records the successful refresh on release."""
+    monkeypatch.setenv("RUN_LOCK_ENABLED", "true")
+    monkeypatch.setenv("S3_BUCKET_NAME", "bucket")
+    monkeypatch.setattr(
+        "lambda_function.boto3.client",
+        lambda name: local_s3 if name == "s3" else object(),
+    )
+
+    class FakeServices:
+        def get_all_user_details(self):
+            return ({"alice": ["a@ons.gov.uk"]}, {"a@ons.gov.uk": "alice"}, {})
+
+    monkeypatch.setattr(
+        "lambda_function.GitHubServices", lambda *a, **k: FakeServices()
+    )
+
+    result = lambda_handler(event={}, context=None)
+
+    assert result["statusCode"] == 200
+    lock = json.loads(local_s3.objects[("bucket", "AddressBook/.refresh.lock")]["Body"])
+    assert lock["outcome"] == "succeeded"
+    assert ("bucket", "AddressBook/addressBookUsernameKey.json") in local_s3.objects
+
+
+def test_lambda_waits_for_failed_holder_then_refreshes(
+    set_env, monkeypatch, local_s3, logger_spy
+):
+    """A waiting run refreshes itself when the holder releases the lock after failing."""
+    from run_lock import S3RunLock
+
+    monkeypatch.setenv("RUN_LOCK_ENABLED", "true")
+    monkeypatch.setenv("RUN_LOCK_WAIT_SECONDS", "30")
+    monkeypatch.setenv("S3_BUCKET_NAME", "bucket")
+    monkeypatch.setattr(
+        "lambda_function.boto3.client",
+        lambda name: local_s3 if name == "s3" else object(),
+    )
+
+    holder = S3RunLock(logger_spy, local_s3, "bucket", owner="other-run")
+    assert holder.acquire()
+
+    class FailWhileWaiting(S3RunLock):
+        """Releases the holder's lock after a failed run while this run waits."""
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(
+                *args, sleep=lambda seconds: holder.release(succeeded=False), **kwargs
+            )
+
+    monkeypatch.setattr("lambda_function.S3RunLock", FailWhileWaiting)
+
+    class FakeServices:
+        def get_all_user_details(self):
+            return ({"alice": ["a@ons.gov.uk"]}, {"a@ons.gov.uk": "alice"}, {})
+
+    monkeypatch.setattr(
+        "lambda_function.GitHubServices", lambda *a, **k: FakeServices()
+    )
+
+    result = lambda_handler(event={}, context=None)
+
+    assert result["statusCode"] == 200
+    assert "user_entries" in json.loads(result["body"])
+    assert ("bucket", "AddressBook/addressBookUsernameKey.json") in local_s3.objects
+
+
+def test_lambda_rejects_unknown_output_format(set_env, monkeypatch):
+    """Fails on an unknown format before creating clients or querying GitHub."""
+    monkeypatch.setenv("OUTPUT_FORMATS", "json,jsno")
+
+    def fail_if_called(*args, **kwargs):
+        raise AssertionError("must not be called with an unknown output format")
+
+    monkeypatch.setattr("lambda_function.boto3.client", fail_if_called)
+    monkeypatch.setattr("lambda_function.GitHubServices", fail_if_called)
+
+    with pytest.raises(ValueError, match="jsno"):
+        lambda_handler(event={}, context=None)
+
+
+def test_lambda_releases_lock_when_member_store_fails(set_env, monkeypatch, local_s3):
+    """A member store which can't be created doesn't leave the lock behind."""
+    monkeypatch.setenv("RUN_LOCK_ENABLED", "true")
+    monkeypatch.setenv("S3_BUCKET_NAME", "bucket")
+    monkeypatch.setenv("MEMBER_STORE", "bogus")
+    monkeypatch.setattr(
+        "lambda_function.boto3.client",
+        lambda name: local_s3 if name == "s3" else object(),
+    )
+
+    with pytest.raises(ValueError, match="bogus"):
+        lambda_handler(event={}, context=None)
+
+    assert ("delete_object", "AddressBook/.refresh.lock") in local_s3.calls
+    assert ("bucket", "AddressBook/.refresh.lock") not in local_s3.objects
+
+
+def test_lambda_writes_bloom_output(set_env, monkeypatch):
+    """Publishes the email Bloom filter when it is listed in OUTPUT_FORMATS."""
+    from bloom_reader import BloomFilterReader
+
+    monkeypatch.setenv("OUTPUT_FORMATS", "bloom")
+    monkeypatch.setenv("BLOOM_FALSE_POSITIVE_RATE", "0.01")
+    monkeypatch.setattr("lambda_function.boto3.client", lambda name: object())
+
+    class FakeServices:
+        def get_all_user_details(self):
+            return ({"alice": ["a@ons.gov.uk"]}, {"a@ons.gov.uk": "alice"}, {})
+
+    class S3WriterStub:
+        def __init__(self):
+            self.writes = {}
+
+        def write_data_to_s3(self, filename, payload, content_type="application/json"):
+            self.writes[filename] = (payload, content_type)
+
+    s3writer_stub = S3WriterStub()
+    monkeypatch.setattr(
+        "lambda_function.GitHubServices", lambda *a, **k: FakeServices()
+    )
+    monkeypatch.setattr("lambda_function.S3Writer", lambda *a, **k: s3writer_stub)
+
+    lambda_handler(event={}, context=None)
+
+    payload, content_type = s3writer_stub.writes["AddressBook/addressBookEmails.bloom"]
+    assert content_type == "application/octet-stream"
+    assert "a@ons.gov.uk" in BloomFilterReader.from_bytes(payload)
+
+
+def test_lambda_writes_prefix_index(set_env, monkeypatch):
+    """Uploads each prefix index chunk, then the manifest."""
+    monkeypatch.setenv("OUTPUT_FORMATS", "prefix-index")
+    monkeypatch.setattr("lambda_function.boto3.client", lambda name: object())
+
+    class FakeServices:
+        def get_all_user_details(self):
+            return (
+                {"alice": ["alice@ons.gov.uk"], "bob": ["bob@ons.gov.uk"]},
+                {"alice@ons.gov.uk": "alice", "bob@ons.gov.uk": "bob"},
+                {},
+            )
+
+    class S3WriterStub:
+        def __init__(self):
+            self.writes = []
+
+        def write_data_to_s3(self, filename, payload, content_type="application/json"):
+            self.writes.append((filename, json.loads(payload)))
+
+    s3writer_stub = S3WriterStub()
+    monkeypatch.setattr(
+        "lambda_function.GitHubServices", lambda *a, **k: FakeServices()
+    )
+    monkeypatch.setattr("lambda_function.S3Writer", lambda *a, **k: s3writer_stub)
+
+    lambda_handler(event={}, context=None)
+
+    filenames = [filename for filename, _ in s3writer_stub.writes]
+    assert filenames == [
+        "AddressBook/PrefixIndex/a.json",
+        "AddressBook/PrefixIndex/b.json",
+        "AddressBook/PrefixIndex/manifest.json",
+    ]
+    assert s3writer_stub.writes[0][1]["keys"] == ["alice", "alice@ons.gov.uk"]
+    assert s3writer_stub.writes[-1][1]["count"] == 4
+
+
+def test_lambda_writes_chrome_trace(set_env, monkeypatch, tmp_path):
+    """Writes a Chrome trace of the run when TRACE_OUTPUT is a path."""
+    trace_path = tmp_path / "trace.json"
+    monkeypatch.setenv("TRACE_OUTPUT", str(trace_path))
+    monkeypatch.setenv("S3_BUCKET_NAME", "bucket")
+
+    class FakeS3Client:
+        def put_object(self, **kwargs):
+            return {}
+
+    monkeypatch.setattr(
+        "lambda_function.boto3.client",
+        lambda name: FakeS3Client() if name == "s3" else object(),
+    )
+
+    class FakeServices:
+        def get_all_user_details(self):
+            return ({"alice": ["a@ons.gov.uk"]}, {"a@ons.gov.uk": "alice"}, {})
+
+    monkeypatch.setattr(
+        "lambda_function.GitHubServices", lambda *a, **k: FakeServices()
+    )
+
+    lambda_handler(event={}, context=None)
+
+    names = [
+        event["name"] for event in json.loads(trace_path.read_text())["traceEvents"]
+    ]
+    assert names.count("json.dumps") == 3
+    assert names.count("s3.put_object") == 3
+
+
+def test_lambda_logs_trace_summary(set_env, monkeypatch, caplog):
+    """Logs a compact trace summary when TRACE_OUTPUT is "log"."""
+    monkeypatch.setenv("TRACE_OUTPUT", "log")
+    monkeypatch.setattr("lambda_function.boto3.client", lambda name: object())
+
+    class FakeServices:
+        def get_all_user_details(self):
+            return ({"alice": ["a@ons.gov.uk"]}, {"a@ons.gov.uk": "alice"}, {})
+
+    class FakeS3Writer:
+        def write_data_to_s3(self, *args, **kwargs):
+            pass
+
+    monkeypatch.setattr(
+        "lambda_function.GitHubServices", lambda *a, **k: FakeServices()
+    )
+    monkeypatch.setattr("lambda_function.S3Writer", lambda *a, **k: FakeS3Writer())
+
+    lambda_handler(event={}, context=None)
+
+    assert '"trace_summary"' in caplog.text
+    assert '"json.dumps"' in caplog.text
+
+
+def test_lambda_flushes_queued_logs(set_env, monkeypatch, caplog):
+    """With QUEUE_LOGGING, every log is written before the handler returns."""
+    monkeypatch.setenv("QUEUE_LOGGING", "true")
+    monkeypatch.setenv("TRACE_OUTPUT", "log")
+    monkeypatch.setattr("lambda_function.boto3.client", lambda name: object())
+
+    class FakeServices:
+        def get_all_user_details(self):
+            return ({"alice": ["a@ons.gov.uk"]}, {"a@ons.gov.uk": "alice"}, {})
+
+    class FakeS3Writer:
+        def write_data_to_s3(self, *args, **kwargs):
+            pass
+
+    monkeypatch.setattr(
+        "lambda_function.GitHubServices", lambda *a, **k: FakeServices()
+    )
+    monkeypatch.setattr("lambda_function.S3Writer", lambda *a, **k: FakeS3Writer())
+
+    response = lambda_handler(event={}, context=None)
+
+    assert response["statusCode"] == 200
+    assert '"trace_summary"' in caplog.text
+    assert logging.getLogger("logger").propagate
+    assert logging.getLogger("logger").handlers == []
+
+
+def test_lambda_writes_to_replica_targets(set_env, monkeypatch):
+    """Writes every output to the primary bucket and each S3_REPLICA_TARGETS bucket."""
+    monkeypatch.setenv("S3_BUCKET_NAME", "bucket")
+    monkeypatch.setenv("S3_REPLICA_TARGETS", "bucket-dr:eu-west-1,bucket-us:us-east-1")
+    uploads = []
+    regions = []
+
+    class FakeS3Client:
+        def put_object(self, **kwargs):
+            uploads.append((kwargs["Bucket"], kwargs["Key"]))
+            return {}
+
+    def fake_client(name, region_name=None, config=None):
+        if name == "s3" and region_name is not None:
+            regions.append((region_name, config.max_pool_connections))
+        return FakeS3Client()
+
+    monkeypatch.setattr("lambda_function.boto3.client", fake_client)
+
+    class FakeServices:
+        def get_all_user_details(self):
+            return ({"alice": ["a@ons.gov.uk"]}, {"a@ons.gov.uk": "alice"}, {})
+
+    monkeypatch.setattr(
+        "lambda_function.GitHubServices", lambda *a, **k: FakeServices()
+    )
+
+    response = lambda_handler(event={}, context=None)
+
+    assert response["statusCode"] == 200
+    assert [region for region, _ in regions] == ["eu-west-1", "us-east-1"]
+    assert all(pool_size > 10 for _, pool_size in regions)
+    for bucket_name in ("bucket", "bucket-dr", "bucket-us"):
+        assert sorted(key for bucket, key in uploads if bucket == bucket_name) == [
+            "AddressBook/addressBookEmailKey.json",
+            "AddressBook/addressBookIDKey.json",
+            "AddressBook/addressBookUsernameKey.json",
+        ]
+
+
+def test_lambda_member_store_sqlite(set_env, monkeypatch, tmp_path):
+    """With MEMBER_STORE=sqlite, publishes the same JSON and removes the scratch database."""
+    monkeypatch.setenv("MEMBER_STORE", "sqlite")
+    monkeypatch.setenv("S3_BUCKET_NAME", "bucket")
+    monkeypatch.setenv("TMPDIR", str(tmp_path))
+    monkeypatch.setattr("tempfile.tempdir", None)
+    uploads = {}
+
+    class FakeS3Client:
+        def put_object(self, **kwargs):
+            uploads[kwargs["Key"]] = kwargs["Body"].read()
+            return {}
+
+    monkeypatch.setattr(
+        "lambda_function.boto3.client",
+        lambda name: FakeS3Client() if name == "s3" else object(),
+    )
+
+    members = [
+        ("alice", ["alice@ons.gov.uk", "ünï@ons.gov.uk"], 101),
+        ("bob", ["bob@ons.gov.uk"], None),
+    ]
+
+    class FakeServices:
+        def get_all_user_details(self, store):
+            store.add_members(members)
+            return store.views()
+
+    monkeypatch.setattr(
+        "lambda_function.GitHubServices", lambda *a, **k: FakeServices()
+    )
+
+    response = lambda_handler(event={}, context=None)
+
+    assert response["statusCode"] == 200
+    assert json.loads(response["body"])["user_entries"] == 2
+    assert (
+        uploads["AddressBook/addressBookUsernameKey.json"]
+        == json.dumps(
+            {
+                "alice": ["alice@ons.gov.uk", "ünï@ons.gov.uk"],
+                "bob": ["bob@ons.gov.uk"],
+            },
+            indent=2,
+        ).encode()
+    )
+    assert (
+        uploads["AddressBook/addressBookIDKey.json"]
+        == json.dumps({"alice": 101}, indent=2).encode()
+    )
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_lambda_snapshot_change_detection(
+    set_env, monkeypatch, local_s3, logger_spy, tmp_path
+):
+    """Logs what changed since the last run, reusing the /tmp snapshot when warm."""
+    monkeypatch.setenv("SNAPSHOT_CACHE", "true")
+    monkeypatch.setenv("S3_BUCKET_NAME", "bucket")
+    monkeypatch.setattr(
+        "snapshot_cache.DEFAULT_SNAPSHOT_PATH", str(tmp_path / "snapshot")
+    )
+    monkeypatch.setattr("lambda_function.wrapped_logging", lambda *a, **k: logger_spy)
+    logger_spy.close = lambda: None
+    monkeypatch.setattr(
+        "lambda_function.boto3.client",
+        lambda name: local_s3 if name == "s3" else object(),
+    )
+    runs = iter(
+        [
+            ({"alice": ["a@ons.gov.uk"]}, {"a@ons.gov.uk": "alice"}, {"alice": 1}),
+            (
+                {"alice": ["a2@ons.gov.uk"], "bob": ["b@ons.gov.uk"]},
+                {"a2@ons.gov.uk": "alice", "b@ons.gov.uk": "bob"},
+                {"alice": 1, "bob": 2},
+            ),
+        ]
+    )
+
+    class FakeServices:
+        def get_all_user_details(self):
+            return next(runs)
+
+    monkeypatch.setattr(
+        "lambda_function.GitHubServices", lambda *a, **k: FakeServices()
+    )
+
+    lambda_handler(event={}, context=None)
+    lambda_handler(event={}, context=None)
+
+    assert [call for call in local_s3.calls if call[0] == "get_object"] == []
+    # Only the loads check ETags: the first stops at the missing file, the second checks
+    # all three. Saving uses the ETags the uploads returned.
+    assert len([call for call in local_s3.calls if call[0] == "head_object"]) == 4
+    assert (
+        json.dumps({"address_book_changes": {"added": 1, "removed": 0, "changed": 1}})
+        in logger_spy.infos
+    )
+
+
+def test_lambda_snapshot_skipped_with_sqlite_store(
+    set_env, monkeypatch, local_s3, logger_spy, tmp_path
+):
+    """SNAPSHOT_CACHE is ignored with MEMBER_STORE=sqlite, so no address book is loaded."""
+    monkeypatch.setenv("SNAPSHOT_CACHE", "true")
+    monkeypatch.setenv("MEMBER_STORE", "sqlite")
+    monkeypatch.setenv("S3_BUCKET_NAME", "bucket")
+    monkeypatch.setenv("TMPDIR", str(tmp_path))
+    monkeypatch.setattr("tempfile.tempdir", None)
+    monkeypatch.setattr("lambda_function.wrapped_logging", lambda *a, **k: logger_spy)
+    logger_spy.close = lambda: None
+    monkeypatch.setattr(
+        "lambda_function.boto3.client",
+        lambda name: local_s3 if name == "s3" else object(),
+    )
+
+    class FakeServices:
+        def get_all_user_details(self, store):
+            store.add_members([("alice", ["a@ons.gov.uk"], 1)])
+            return store.views()
+
+    monkeypatch.setattr(
+        "lambda_function.GitHubServices", lambda *a, **k: FakeServices()
+    )
+
+    response = lambda_handler(event={}, context=None)
+
+    assert response["statusCode"] == 200
+    assert [
+        call for call in local_s3.calls if call[0] in ("head_object", "get_object")
+    ] == []
+    assert (
+        "SNAPSHOT_CACHE is ignored with MEMBER_STORE=sqlite, as it would load the address book into memory"
+        in logger_spy.warnings
+    )
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_lambda_uploads_graphql_recording(set_env, monkeypatch):
+    """With GRAPHQL_RECORDING=s3, the sanitized traffic is uploaded beside the outputs."""
+    monkeypatch.setenv("GRAPHQL_RECORDING", "s3")
+    monkeypatch.setattr("lambda_function.boto3.client", lambda name: object())
+
+    class FakeResponse:
+        status_code = 200
+        headers = {}
+
+        def json(self):
+            return {"data": {"organization": {"login": "test-org"}}}
+
+    class FakeQL:
+        def make_ql_request(self, query, params):
+            return FakeResponse()
+
+    class FakeServices:
+        ql = FakeQL()
+
+        def get_all_user_details(self):
+            self.ql.make_ql_request("query", {"org": "test-org", "cursor": None})
+            return ({"alice": ["a@ons.gov.uk"]}, {"a@ons.gov.uk": "alice"}, {})
+
+    uploads = {}
+
+    class FakeS3Writer:
+        def write_data_to_s3(self, key, payload, content_type="application/json"):
+            uploads[key] = payload.read() if hasattr(payload, "read") else payload
+
+    monkeypatch.setattr(
+        "lambda_function.GitHubServices", lambda *a, **k: FakeServices()
+    )
+    monkeypatch.setattr("lambda_function.S3Writer", lambda *a, **k: FakeS3Writer())
+
+    lambda_handler(event={}, context=None)
+
+    (key,) = [key for key in uploads if key.startswith("GraphQLRecordings/")]
+    recording = uploads[key].decode()
+    assert recording.count("\n") == 1
+    assert '"cursor":null' in recording
+    assert "test-org" not in recording
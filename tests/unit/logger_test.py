@@ -1,3 +1,6 @@
+import logging
+import threading
+
 from logger import wrapped_logging
 
 
@@ -26,3 +29,41 @@ class TestWrappedLogging:
         assert "Info message" in caplog.text
         assert "Error message" in caplog.text
         assert "Warning message" in caplog.text
+
+    def test_queue_logging(self, caplog):
+        logger = wrapped_logging(debug=False, use_queue=True)
+        logger.log_info("Info message")
+        logger.log_error("Error message")
+        logger.log_warning("Warning message")
+        logger.close()
+        assert "Info message" in caplog.text
+        assert "Error message" in caplog.text
+        assert "Warning message" in caplog.text
+
+    def test_queue_logging_writes_off_calling_thread(self):
+        emitted_on = []
+
+        class ThreadRecorder(logging.Handler):
+            def emit(self, record):
+                emitted_on.append(threading.get_ident())
+
+        recorder = ThreadRecorder()
+        logging.getLogger().addHandler(recorder)
+        try:
+            logger = wrapped_logging(debug=False, use_queue=True)
+            logger.log_info("Info message")
+            logger.close()
+        finally:
+            logging.getLogger().removeHandler(recorder)
+
+        assert len(emitted_on) == 1
+        assert emitted_on[0] != threading.get_ident()
+
+    def test_close_restores_direct_logging(self, caplog):
+        logger = wrapped_logging(debug=False, use_queue=True)
+        logger.close()
+        logger.close()
+        assert logger.logger.propagate
+        assert logger.logger.handlers == []
+        logger.log_info("Info message")
+        assert "Info message" in caplog.text
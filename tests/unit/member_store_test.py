@@ -0,0 +1,103 @@
+import os
+import threading
+from member_store import InMemoryMemberStore, SqliteMemberStore
+from sqlite_export import build_address_book_db
+
+PAGES = [
+    [
+        ("alice", ["alice@ons.gov.uk"], 101),
+        ("bob", ["bob@ons.gov.uk", "bob2@ons.gov.uk"], None),
+    ],
+    [
+        ("carol", ["carol@ons.gov.uk"], 303),
+        # A member seen twice keeps their first position with their latest details
+        ("alice", ["alice@ons.gov.uk", "a.smith@ons.gov.uk"], 101),
+        ("bob", ["bob@ons.gov.uk"], 202),
+    ],
+]
+
+
+def fill(store):
+    for page in PAGES:
+        store.add_members(page)
+    return store
+
+
+def test_sqlite_store_matches_in_memory(tmp_path):
+    """Produces the same maps, in the same order, as the dicts."""
+    expected = fill(InMemoryMemberStore()).views()
+    store = fill(SqliteMemberStore(str(tmp_path)))
+
+    for view, reference in zip(store.views(), expected):
+        assert list(view.items()) == list(reference.items())
+        assert list(view) == list(reference)
+        assert list(view.values()) == list(reference.values())
+        assert len(view) == len(reference)
+        assert dict(view) == reference
+
+    store.close()
+
+
+def test_sqlite_store_lookups(tmp_path):
+    """Supports the usual read-only mapping operations."""
+    store = fill(SqliteMemberStore(str(tmp_path)))
+    user_to_email, email_to_user, user_to_id = store.views()
+
+    assert user_to_email["alice"] == ["alice@ons.gov.uk", "a.smith@ons.gov.uk"]
+    assert email_to_user["bob2@ons.gov.uk"] == "bob"
+    assert user_to_id.get("bob") == 202
+    assert "dave" not in user_to_email
+    assert user_to_id.get("dave") is None
+
+    store.close()
+
+
+def test_sqlite_store_get_many(tmp_path):
+    """Looks up a batch of keys in one query, leaving out missing keys."""
+    store = fill(SqliteMemberStore(str(tmp_path)))
+    user_to_email, email_to_user, user_to_id = store.views()
+
+    assert user_to_id.get_many(["alice", "bob", "dave"]) == {"alice": 101, "bob": 202}
+    assert user_to_email.get_many(["carol"]) == {"carol": ["carol@ons.gov.uk"]}
+    assert email_to_user.get_many([]) == {}
+
+    store.close()
+
+
+def test_sqlite_store_read_from_threads(tmp_path):
+    """Each thread streams the maps through its own connection."""
+    store = SqliteMemberStore(str(tmp_path))
+    store.add_members([(f"user{i}", [f"user{i}@ons.gov.uk"], i) for i in range(5000)])
+    user_to_email, email_to_user, _ = store.views()
+    results = []
+
+    def read():
+        results.append(sum(1 for _ in email_to_user.items()))
+
+    threads = [threading.Thread(target=read) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [5000] * 4
+    store.close()
+
+
+def test_sqlite_store_feeds_exports(tmp_path):
+    """The maps can be passed straight to the export builders."""
+    store = fill(SqliteMemberStore(str(tmp_path)))
+    db_path = build_address_book_db(*store.views(), str(tmp_path / "book.sqlite3"))
+
+    assert os.path.getsize(db_path) > 0
+    store.close()
+
+
+def test_sqlite_store_close_removes_file(tmp_path):
+    """Deletes the scratch database when closed."""
+    store = fill(SqliteMemberStore(str(tmp_path)))
+    list(store.views()[0].items())
+
+    store.close()
+
+    assert not os.path.exists(store.path)
@@ -0,0 +1,54 @@
+import json
+import pytest
+from member_store import InMemoryMemberStore, SqliteMemberStore
+from normalized_format import (
+    build_normalized_address_book,
+    expand_normalized_address_book,
+)
+
+MEMBERS = [
+    ("alice", ["alice@ons.gov.uk"], 101),
+    ("bob", ["bob@ons.gov.uk", "b@ons.gov.uk"], None),
+    ("carol", ["carol@ons.gov.uk", "b@ons.gov.uk"], 303),
+]
+
+
+def test_build_stores_each_string_once():
+    """Logins and emails appear once, with relations as ordinals."""
+    store = InMemoryMemberStore()
+    store.add_members(MEMBERS)
+
+    assert build_normalized_address_book(*store.views()) == {
+        "version": 1,
+        "logins": ["alice", "bob", "carol"],
+        "databaseIds": [101, None, 303],
+        "emails": [
+            "alice@ons.gov.uk",
+            "bob@ons.gov.uk",
+            "b@ons.gov.uk",
+            "carol@ons.gov.uk",
+        ],
+        # A shared email belongs to the last member listing it, as in email_to_user
+        "emailOwners": [0, 1, 2, 2],
+        "memberEmails": [[0], [1, 2], [3, 2]],
+    }
+
+
+@pytest.mark.parametrize("store_class", [InMemoryMemberStore, SqliteMemberStore])
+def test_round_trip(store_class):
+    """Expanding the parsed file gives back the three maps it was built from."""
+    store = store_class()
+    store.add_members(MEMBERS)
+    # A member seen again with a changed email list keeps the old email's owner
+    store.add_members([("alice", ["alice.new@ons.gov.uk"], 101)])
+    maps = tuple(dict(data) for data in store.views())
+
+    data = json.loads(json.dumps(build_normalized_address_book(*store.views())))
+    store.close()
+
+    assert expand_normalized_address_book(data) == maps
+
+
+def test_expand_rejects_other_versions():
+    with pytest.raises(ValueError, match="version 2"):
+        expand_normalized_address_book({"version": 2})
@@ -0,0 +1,237 @@
+import json
+import threading
+import pytest
+from output_sinks import (
+    SINKS,
+    OutputSink,
+    create_sinks,
+    register_sink,
+    run_sinks,
+    summarise_uploads,
+)
+from serializer import JsonSerializer
+from tracing import Tracer
+from fixtures import logger_spy
+
+USER_TO_EMAIL = {"alice": ["alice@ons.gov.uk"], "bob": ["bob@ons.gov.uk"]}
+EMAIL_TO_USER = {"alice@ons.gov.uk": "alice", "bob@ons.gov.uk": "bob"}
+USER_TO_ID = {"alice": 101, "bob": 202}
+
+
+class S3WriterStub:
+    def __init__(self):
+        self.writes = {}
+
+    def write_data_to_s3(self, key, payload, content_type="application/json"):
+        self.writes[key] = payload
+
+
+class BlockingSink(OutputSink):
+    """Waits until every other BlockingSink is running too."""
+
+    barrier: threading.Barrier
+
+    def write(self, user_to_email, email_to_user, user_to_id):
+        self.barrier.wait(timeout=5)
+        if self.name == "broken":
+            raise RuntimeError("boom")
+
+
+def test_registered_sinks():
+    """Every OUTPUT_FORMATS name has a sink."""
+    assert {
+        "json",
+        "local-json",
+        "sqlite",
+        "parquet",
+        "bloom",
+        "prefix-index",
+        "normalized",
+    } <= set(SINKS)
+
+
+def test_create_sinks_rejects_unknown_format(logger_spy):
+    """Fails clearly on a mistyped format instead of silently skipping it."""
+    with pytest.raises(ValueError, match="sqlit"):
+        create_sinks(["json", "sqlit"], S3WriterStub(), JsonSerializer(), logger_spy)
+
+
+def test_json_sink(logger_spy):
+    """Writes the three lookup files in the published format."""
+    s3writer = S3WriterStub()
+    sinks = create_sinks(["json"], s3writer, JsonSerializer("json"), logger_spy)
+
+    run_sinks(sinks, USER_TO_EMAIL, EMAIL_TO_USER, USER_TO_ID)
+
+    assert s3writer.writes == {
+        "AddressBook/addressBookUsernameKey.json": json.dumps(
+            USER_TO_EMAIL, indent=2
+        ).encode(),
+        "AddressBook/addressBookEmailKey.json": json.dumps(
+            EMAIL_TO_USER, indent=2
+        ).encode(),
+        "AddressBook/addressBookIDKey.json": json.dumps(USER_TO_ID, indent=2).encode(),
+    }
+
+
+def test_local_json_sink(logger_spy, monkeypatch, tmp_path):
+    """Writes the lookup files under LOCAL_OUTPUT_DIR, laid out as in S3."""
+    monkeypatch.setenv("LOCAL_OUTPUT_DIR", str(tmp_path))
+    sinks = create_sinks(
+        ["local-json"], S3WriterStub(), JsonSerializer("json"), logger_spy
+    )
+
+    run_sinks(sinks, USER_TO_EMAIL, EMAIL_TO_USER, USER_TO_ID)
+
+    folder = tmp_path / "AddressBook"
+    assert sorted(path.name for path in folder.iterdir()) == [
+        "addressBookEmailKey.json",
+        "addressBookIDKey.json",
+        "addressBookUsernameKey.json",
+    ]
+    assert json.loads((folder / "addressBookIDKey.json").read_text()) == USER_TO_ID
+
+
+def test_run_sinks_concurrently(logger_spy, monkeypatch):
+    """Runs all sinks at once and records a span for each."""
+    monkeypatch.setattr(BlockingSink, "barrier", threading.Barrier(3), raising=False)
+    monkeypatch.setitem(
+        SINKS, "one", register_sink("one")(type("One", (BlockingSink,), {}))
+    )
+    monkeypatch.setitem(
+        SINKS, "two", register_sink("two")(type("Two", (BlockingSink,), {}))
+    )
+    monkeypatch.setitem(
+        SINKS, "three", register_sink("three")(type("Three", (BlockingSink,), {}))
+    )
+    tracer = Tracer()
+
+    sinks = create_sinks(
+        ["one", "two", "three"], S3WriterStub(), JsonSerializer(), logger_spy
+    )
+    run_sinks(sinks, USER_TO_EMAIL, EMAIL_TO_USER, USER_TO_ID, tracer=tracer)
+
+    assert sorted(span[0] for span in tracer.spans) == [
+        "output.one",
+        "output.three",
+        "output.two",
+    ]
+
+
+def test_run_sinks_reports_failures(logger_spy, monkeypatch):
+    """Lets the other sinks finish, then raises naming the failed sink."""
+    monkeypatch.setattr(BlockingSink, "barrier", threading.Barrier(2), raising=False)
+    monkeypatch.setitem(
+        SINKS, "ok", register_sink("ok")(type("Ok", (BlockingSink,), {}))
+    )
+    monkeypatch.setitem(
+        SINKS, "broken", register_sink("broken")(type("Broken", (BlockingSink,), {}))
+    )
+
+    sinks = create_sinks(["ok", "broken"], S3WriterStub(), JsonSerializer(), logger_spy)
+    with pytest.raises(Exception) as excinfo:
+        run_sinks(sinks, USER_TO_EMAIL, EMAIL_TO_USER, USER_TO_ID)
+
+    assert str(excinfo.value) == "broken output failed: boom"
+
+
+def test_run_sinks_returns_upload_results(logger_spy):
+    """Collects the S3Writer's per-bucket results for every file each sink uploads."""
+
+    class ReplicatedS3Writer(S3WriterStub):
+        def write_data_to_s3(self, key, payload, content_type="application/json"):
+            super().write_data_to_s3(key, payload, content_type)
+            return {
+                bucket_name: {"ok": True, "seconds": 0.25, "error": None}
+                for bucket_name in ("primary", "replica")
+            }
+
+    sinks = create_sinks(
+        ["json", "bloom"], ReplicatedS3Writer(), JsonSerializer("json"), logger_spy
+    )
+
+    uploads = run_sinks(sinks, USER_TO_EMAIL, EMAIL_TO_USER, USER_TO_ID)
+
+    assert set(uploads) == {"json", "bloom"}
+    assert set(uploads["json"]) == {
+        "AddressBook/addressBookUsernameKey.json",
+        "AddressBook/addressBookEmailKey.json",
+        "AddressBook/addressBookIDKey.json",
+    }
+    assert uploads["bloom"]["AddressBook/addressBookEmails.bloom"]["replica"]["ok"]
+    assert summarise_uploads(uploads) == {
+        "bloom": {
+            "primary": {"files": 1, "seconds": 0.25},
+            "replica": {"files": 1, "seconds": 0.25},
+        },
+        "json": {
+            "primary": {"files": 3, "seconds": 0.75},
+            "replica": {"files": 3, "seconds": 0.75},
+        },
+    }
+
+
+@pytest.mark.filterwarnings(
+    "ignore:This process .* is multi-threaded:DeprecationWarning"
+)
+def test_json_sink_serializes_while_preparing(logger_spy, monkeypatch):
+    """The JSON files are encoded in parallel before the sinks' threads start."""
+    monkeypatch.setenv("SERIALIZATION_WORKERS", "2")
+    monkeypatch.setattr("parallel_serializer.PARALLEL_MIN_ENTRIES", 0)
+    monkeypatch.setattr("parallel_serializer.thread_count", lambda: 1)
+    tracer = Tracer()
+    s3writer = S3WriterStub()
+    sinks = create_sinks(
+        ["json"],
+        s3writer,
+        JsonSerializer("json", tracer=tracer),
+        logger_spy,
+        tracer=tracer,
+    )
+
+    run_sinks(sinks, USER_TO_EMAIL, EMAIL_TO_USER, USER_TO_ID, tracer=tracer)
+
+    assert (
+        s3writer.writes["AddressBook/addressBookEmailKey.json"]
+        == json.dumps(EMAIL_TO_USER, indent=2).encode()
+    )
+    assert sinks[0].bodies == {}
+    names = [span[0] for span in tracer.spans]
+    assert names.index("json.parallel_dumps") < names.index("output.json")
+
+
+def test_json_sink_serializes_serially_while_writing(logger_spy, monkeypatch):
+    """Maps too small to fork for are encoded by write, on the sink's own thread."""
+    monkeypatch.setenv("SERIALIZATION_WORKERS", "2")
+    tracer = Tracer()
+    s3writer = S3WriterStub()
+    sinks = create_sinks(
+        ["json"],
+        s3writer,
+        JsonSerializer("json", tracer=tracer),
+        logger_spy,
+        tracer=tracer,
+    )
+
+    sinks[0].prepare(USER_TO_EMAIL, EMAIL_TO_USER, USER_TO_ID)
+    assert sinks[0].bodies == {}
+
+    run_sinks(sinks, USER_TO_EMAIL, EMAIL_TO_USER, USER_TO_ID, tracer=tracer)
+
+    assert (
+        s3writer.writes["AddressBook/addressBookEmailKey.json"]
+        == json.dumps(EMAIL_TO_USER, indent=2).encode()
+    )
+    assert "json.parallel_dumps" not in [span[0] for span in tracer.spans]
+
+
+def test_normalized_sink(logger_spy):
+    """Writes every member once, in one compact file."""
+    s3writer = S3WriterStub()
+    sinks = create_sinks(["normalized"], s3writer, JsonSerializer("json"), logger_spy)
+
+    run_sinks(sinks, USER_TO_EMAIL, EMAIL_TO_USER, USER_TO_ID)
+
+    body = s3writer.writes["AddressBook/addressBook.normalized.json"]
+    assert b"\n" not in body
+    assert json.loads(body)["logins"] == ["alice", "bob"]
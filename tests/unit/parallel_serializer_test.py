@@ -0,0 +1,166 @@
+import json
+import threading
+import pytest
+import parallel_serializer
+from parallel_serializer import ParallelSerializer, available_cpus, default_workers
+from serializer import JsonSerializer
+from tracing import Tracer
+
+USER_TO_EMAIL = {
+    f"user{index}": [f"user{index}@ons.gov.uk", f"ü{index}@ons.gov.uk"]
+    for index in range(101)
+}
+EMAIL_TO_USER = {
+    address: username
+    for username, emails in USER_TO_EMAIL.items()
+    for address in emails
+}
+USER_TO_ID = {username: index for index, username in enumerate(USER_TO_EMAIL)}
+MAPS = [USER_TO_EMAIL, EMAIL_TO_USER, USER_TO_ID]
+
+
+# pyarrow's background thread outlives the Parquet tests, and Python warns about forking with it
+forks_anyway = pytest.mark.filterwarnings(
+    "ignore:This process .* is multi-threaded:DeprecationWarning"
+)
+
+
+@pytest.fixture
+def single_thread(monkeypatch):
+    """Lets the workers fork, whatever threads earlier tests left running."""
+    monkeypatch.setattr(parallel_serializer, "thread_count", lambda: 1)
+
+
+def test_default_workers(monkeypatch):
+    """Defaults to the available CPUs, except with orjson where workers don't pay off."""
+    monkeypatch.delenv("AWS_LAMBDA_FUNCTION_MEMORY_SIZE", raising=False)
+    monkeypatch.setattr(parallel_serializer, "available_cpus", lambda: 6)
+
+    assert ParallelSerializer(JsonSerializer("json")).workers == 6
+    assert ParallelSerializer(JsonSerializer("json"), workers=2).workers == 2
+    if JsonSerializer("auto").backend == "orjson":
+        assert ParallelSerializer(JsonSerializer("orjson")).workers == 1
+
+
+@pytest.mark.parametrize(
+    "memory_size, cpus, expected",
+    [("512", 2, 1), ("3008", 2, 1), ("3538", 2, 2), ("7076", 4, 4), ("10240", 2, 2)],
+)
+def test_default_workers_on_lambda(monkeypatch, memory_size, cpus, expected):
+    """On Lambda, one worker per full vCPU of the memory size, capped at the CPUs seen."""
+    monkeypatch.setenv("AWS_LAMBDA_FUNCTION_MEMORY_SIZE", memory_size)
+    monkeypatch.setattr(parallel_serializer, "available_cpus", lambda: cpus)
+
+    assert default_workers() == expected
+
+
+def test_available_cpus():
+    assert available_cpus() >= 1
+
+
+@forks_anyway
+@pytest.mark.parametrize("backend", ["json", "auto"])
+@pytest.mark.parametrize("compact", [False, True])
+def test_parallel_output_matches_serial(single_thread, backend, compact):
+    """Maps split into chunks across workers are byte-identical to dumps."""
+    serializer = JsonSerializer(backend, compact=compact)
+
+    bodies = ParallelSerializer(serializer, workers=3, min_entries=0).dumps_many(
+        MAPS + [{}, []]
+    )
+
+    assert bodies == [serializer.dumps(data) for data in MAPS + [{}, []]]
+
+
+def test_will_fork(single_thread):
+    """Forks for enough entries across more than one worker."""
+    serializer = JsonSerializer("json")
+
+    assert ParallelSerializer(serializer, workers=2, min_entries=0).will_fork(MAPS)
+    assert not ParallelSerializer(serializer, workers=2, min_entries=10_000).will_fork(
+        MAPS
+    )
+    assert not ParallelSerializer(serializer, workers=1, min_entries=0).will_fork(MAPS)
+
+
+def test_thread_count():
+    """Counts this thread and any other running one."""
+    stop = threading.Event()
+    thread = threading.Thread(target=stop.wait)
+    before = parallel_serializer.thread_count()
+    thread.start()
+
+    try:
+        assert parallel_serializer.thread_count() == before + 1
+    finally:
+        stop.set()
+        thread.join()
+
+
+def test_serial_while_other_threads_run(monkeypatch):
+    """Never forks while another thread could be holding a lock."""
+    monkeypatch.setattr(
+        parallel_serializer,
+        "_fork_context",
+        lambda: pytest.fail("should not fork"),
+    )
+    serializer = JsonSerializer("json")
+    parallel = ParallelSerializer(serializer, workers=2, min_entries=0)
+    stop = threading.Event()
+    thread = threading.Thread(target=stop.wait)
+    thread.start()
+
+    try:
+        assert not parallel.will_fork(MAPS)
+        assert parallel.dumps_many(MAPS) == [serializer.dumps(data) for data in MAPS]
+    finally:
+        stop.set()
+        thread.join()
+
+
+@forks_anyway
+def test_parallel_records_span(single_thread):
+    """Parallel runs record how many workers and tasks were used."""
+    tracer = Tracer()
+    serializer = JsonSerializer("json", tracer=tracer)
+
+    ParallelSerializer(serializer, workers=4, min_entries=0).dumps_many(MAPS)
+
+    span = next(span for span in tracer.spans if span[0] == "json.parallel_dumps")
+    assert span[4]["workers"] == 4
+    assert span[4]["tasks"] > len(MAPS)
+
+
+@pytest.mark.parametrize(
+    "workers, min_entries", [(1, 0), (4, 10_000)], ids=["single-cpu", "small"]
+)
+def test_serial_fallback(monkeypatch, workers, min_entries):
+    """A single worker or a small payload never forks."""
+    monkeypatch.setattr(
+        parallel_serializer,
+        "_fork_context",
+        lambda: pytest.fail("should not fork"),
+    )
+    serializer = JsonSerializer("json")
+
+    parallel = ParallelSerializer(serializer, workers=workers, min_entries=min_entries)
+    bodies = parallel.dumps_many(MAPS)
+
+    assert not parallel.will_fork(MAPS)
+    assert bodies == [json.dumps(data, indent=2).encode() for data in MAPS]
+
+
+@forks_anyway
+def test_failed_worker_falls_back(single_thread, monkeypatch):
+    """Chunks a crashed worker never sent are serialized in the parent."""
+
+    def crash(connection, serializer, values, tasks):
+        connection.close()
+        raise SystemExit(1)
+
+    monkeypatch.setattr(parallel_serializer, "_worker", crash)
+    serializer = JsonSerializer("json")
+
+    bodies = ParallelSerializer(serializer, workers=2, min_entries=0).dumps_many(MAPS)
+
+    assert bodies == [serializer.dumps(data) for data in MAPS]
@@ -0,0 +1,42 @@
+import builtins
+import pytest
+from parquet_export import build_address_book_parquet
+
+
+def test_build_address_book_parquet():
+    """Writes one row per login and email pair with the database ID."""
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    body = build_address_book_parquet(
+        {"alice": ["a@ons.gov.uk", "a2@ons.gov.uk"], "bob": ["b@ons.gov.uk"]},
+        {"alice": 101},
+    )
+
+    table = pq.read_table(pa.BufferReader(body))
+    assert table.to_pydict() == {
+        "login": ["alice", "alice", "bob"],
+        "email": ["a@ons.gov.uk", "a2@ons.gov.uk", "b@ons.gov.uk"],
+        "database_id": [101, 101, None],
+    }
+
+    metadata = pq.ParquetFile(pa.BufferReader(body)).metadata
+    login_column = metadata.row_group(0).column(0)
+    assert any("DICTIONARY" in encoding for encoding in login_column.encodings)
+
+
+def test_build_address_book_parquet_without_pyarrow(monkeypatch):
+    """Raises a helpful ImportError when the extra is not installed."""
+    real_import = builtins.__import__
+
+    def fake_import(name, *args, **kwargs):
+        if name.startswith("pyarrow"):
+            raise ImportError("No module named 'pyarrow'")
+        return real_import(name, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "__import__", fake_import)
+
+    with pytest.raises(ImportError) as excinfo:
+        build_address_book_parquet({"alice": ["a@ons.gov.uk"]}, {})
+
+    assert "--extras parquet" in str(excinfo.value)
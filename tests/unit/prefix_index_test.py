@@ -0,0 +1,74 @@
+from prefix_index import (
+    build_prefix_index,
+    chunks_for_prefix,
+    chunk_file_name,
+    search_chunk,
+)
+
+
+def _lookup(manifest, chunks, typed, limit=10):
+    matches = []
+    for prefix in chunks_for_prefix(manifest, typed):
+        matches.extend(search_chunk(chunks[prefix], typed, limit))
+    return matches[:limit]
+
+
+def test_build_prefix_index_small():
+    """Indexes usernames and emails, sorted and normalised, in one chunk per letter."""
+    manifest, chunks = build_prefix_index(
+        {"Alice": ["alice@ons.gov.uk"], "bob": ["Bob.B@ons.gov.uk"]},
+        {"alice@ons.gov.uk": "Alice", "Bob.B@ons.gov.uk": "bob"},
+    )
+
+    assert manifest["count"] == 4
+    assert [chunk["prefix"] for chunk in manifest["chunks"]] == ["a", "b"]
+    assert chunks["a"]["keys"] == ["alice", "alice@ons.gov.uk"]
+    assert chunks["a"]["logins"] == ["Alice", "Alice"]
+    assert chunks["b"]["keys"] == ["bob", "bob.b@ons.gov.uk"]
+
+
+def test_large_prefixes_are_split():
+    """Chunks over the size limit are split on more leading characters."""
+    user_to_email = {f"aa{i:03d}": [f"aa{i:03d}@ons.gov.uk"] for i in range(50)}
+    user_to_email["ab"] = ["ab@ons.gov.uk"]
+    user_to_email["zed"] = ["zed@ons.gov.uk"]
+    email_to_user = {
+        address: username
+        for username, addresses in user_to_email.items()
+        for address in addresses
+    }
+
+    manifest, chunks = build_prefix_index(user_to_email, email_to_user, 20)
+
+    assert all(len(chunk["keys"]) <= 20 for chunk in chunks.values())
+    assert manifest["count"] == sum(len(chunk["keys"]) for chunk in chunks.values())
+    assert "z" in chunks
+
+    # Typing one character needs every chunk it could continue into
+    assert len(chunks_for_prefix(manifest, "a")) > 1
+    assert chunks_for_prefix(manifest, "zed") == ["z"]
+
+    assert _lookup(manifest, chunks, "AA01", limit=3) == [
+        ("aa010", "aa010"),
+        ("aa010@ons.gov.uk", "aa010"),
+        ("aa011", "aa011"),
+    ]
+    assert _lookup(manifest, chunks, "ab") == [
+        ("ab", "ab"),
+        ("ab@ons.gov.uk", "ab"),
+    ]
+
+
+def test_search_chunk_no_match():
+    """Returns nothing when no key starts with the typed text."""
+    chunk = {"keys": ["alice", "amy"], "logins": ["alice", "amy"]}
+
+    assert search_chunk(chunk, "ab") == []
+    assert search_chunk(chunk, "zz") == []
+
+
+def test_chunk_file_name_is_key_safe():
+    """Escapes characters that are unsafe in URLs and S3 keys."""
+    assert chunk_file_name("a") == "a.json"
+    assert chunk_file_name("a/b") == "a%2Fb.json"
+    assert chunk_file_name("a+") == "a%2B.json"
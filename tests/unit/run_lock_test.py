@@ -0,0 +1,175 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from run_lock import S3RunLock, LOCK_KEY
+from fixtures import logger_spy, local_s3
+
+
+class FakeClock:
+    """Manually advanced clock so TTLs can be tested without sleeping."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_acquire_and_release(logger_spy, local_s3):
+    """Creates the lock object and deletes it on release."""
+    run_lock = S3RunLock(logger_spy, local_s3, "bucket", owner="run-1")
+
+    assert run_lock.acquire() is True
+    stored = json.loads(local_s3.objects[("bucket", LOCK_KEY)]["Body"])
+    assert stored["owner"] == "run-1"
+
+    run_lock.release()
+    assert ("bucket", LOCK_KEY) not in local_s3.objects
+    assert run_lock.etag is None
+
+
+def test_successful_release_records_outcome(logger_spy, local_s3):
+    """A successful run leaves an expired lock recording its outcome, which the next run takes."""
+    clock = FakeClock()
+    run_lock = S3RunLock(logger_spy, local_s3, "bucket", owner="run-1", clock=clock)
+    assert run_lock.acquire() is True
+
+    run_lock.release(succeeded=True)
+    stored = json.loads(local_s3.objects[("bucket", LOCK_KEY)]["Body"])
+    assert stored == {"owner": "run-1", "expires_at": clock.now, "outcome": "succeeded"}
+    assert run_lock.etag is None
+
+    next_run = S3RunLock(logger_spy, local_s3, "bucket", owner="run-2", clock=clock)
+    assert next_run.acquire() is True
+    assert logger_spy.warnings == []
+
+
+def test_second_run_is_refused(logger_spy, local_s3):
+    """A second run cannot take a lock that has not expired."""
+    first = S3RunLock(logger_spy, local_s3, "bucket", owner="run-1")
+    second = S3RunLock(logger_spy, local_s3, "bucket", owner="run-2")
+
+    assert first.acquire() is True
+    assert second.acquire() is False
+    assert any("held by run-1" in m for m in logger_spy.infos)
+
+    # Releasing without holding the lock leaves the holder's lock in place
+    second.release()
+    assert ("bucket", LOCK_KEY) in local_s3.objects
+
+
+def test_expired_lock_is_taken_over(logger_spy, local_s3):
+    """A lock past its TTL is taken over by the next run."""
+    clock = FakeClock()
+    crashed = S3RunLock(
+        logger_spy, local_s3, "bucket", ttl_seconds=60, owner="crashed", clock=clock
+    )
+    assert crashed.acquire() is True
+
+    clock.now += 61
+    next_run = S3RunLock(
+        logger_spy, local_s3, "bucket", ttl_seconds=60, owner="next", clock=clock
+    )
+
+    assert next_run.acquire() is True
+    assert any("Took over expired refresh lock" in m for m in logger_spy.warnings)
+
+    # The crashed run no longer holds the lock, so it must not delete it
+    crashed.release()
+    assert ("bucket", LOCK_KEY) in local_s3.objects
+    assert any("Unable to release refresh lock" in m for m in logger_spy.warnings)
+
+
+def test_wait_for_release(logger_spy, local_s3):
+    """Waiting returns True once the holder records a successful refresh."""
+    clock = FakeClock()
+    holder = S3RunLock(logger_spy, local_s3, "bucket", clock=clock)
+    holder.acquire()
+
+    def sleep_then_release(seconds):
+        clock.sleep(seconds)
+        holder.release(succeeded=True)
+
+    waiter = S3RunLock(
+        logger_spy, local_s3, "bucket", clock=clock, sleep=sleep_then_release
+    )
+
+    assert waiter.wait_for_release(timeout=30, poll_interval=5) is True
+
+
+def test_wait_for_release_after_failed_run(logger_spy, local_s3):
+    """A holder which failed deletes its lock, so the waiter refreshes itself."""
+    clock = FakeClock()
+    holder = S3RunLock(logger_spy, local_s3, "bucket", clock=clock)
+    holder.acquire()
+
+    def sleep_then_fail(seconds):
+        clock.sleep(seconds)
+        holder.release(succeeded=False)
+
+    waiter = S3RunLock(
+        logger_spy, local_s3, "bucket", clock=clock, sleep=sleep_then_fail
+    )
+
+    assert waiter.wait_for_release(timeout=30, poll_interval=5) is False
+    assert clock.now == 1005
+    assert waiter.acquire() is True
+
+
+def test_wait_for_release_times_out(logger_spy, local_s3):
+    """Waiting gives up after the timeout and when the lock expires unreleased."""
+    clock = FakeClock()
+    holder = S3RunLock(logger_spy, local_s3, "bucket", ttl_seconds=60, clock=clock)
+    holder.acquire()
+
+    waiter = S3RunLock(
+        logger_spy, local_s3, "bucket", ttl_seconds=60, clock=clock, sleep=clock.sleep
+    )
+    assert waiter.wait_for_release(timeout=30, poll_interval=5) is False
+    assert clock.now == 1030
+
+    clock.now += 60
+    assert waiter.wait_for_release(timeout=30) is False
+
+
+def test_only_one_parallel_run_acquires(logger_spy, local_s3):
+    """Of many runs racing for the lock, exactly one wins."""
+    runs = 16
+    barrier = threading.Barrier(runs)
+
+    def race(index):
+        run_lock = S3RunLock(logger_spy, local_s3, "bucket", owner=f"run-{index}")
+        barrier.wait()
+        return run_lock.acquire()
+
+    with ThreadPoolExecutor(max_workers=runs) as executor:
+        results = list(executor.map(race, range(runs)))
+
+    assert results.count(True) == 1
+
+
+def test_parallel_runs_take_turns(logger_spy, local_s3):
+    """Runs that retry after a release never hold the lock at the same time."""
+    holders = []
+    overlaps = []
+    guard = threading.Lock()
+
+    def run(index):
+        run_lock = S3RunLock(logger_spy, local_s3, "bucket", owner=f"run-{index}")
+        while not run_lock.acquire():
+            pass
+        with guard:
+            holders.append(index)
+            if len(holders) > 1:
+                overlaps.append(list(holders))
+        with guard:
+            holders.remove(index)
+        run_lock.release()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(run, range(8)))
+
+    assert overlaps == []
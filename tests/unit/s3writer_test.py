@@ -1,6 +1,9 @@
+import io
 import json
+import tempfile
+import threading
 import pytest
-from s3writer import S3Writer
+from s3writer import S3Writer, MemoryviewReader, FileRangeReader, parse_replica_targets
 from fixtures import logger_spy, s3_client
 
 
@@ -40,6 +43,135 @@ def test_writes_to_s3_success(logger_spy):
     assert logger_spy.errors == []
 
 
+def test_writes_bytes_to_s3_with_content_type(logger_spy):
+    """Uploads bytes unchanged with the given content type."""
+    captured = {"calls": []}
+
+    class FakeS3Client:
+        def put_object(self, **kwargs):
+            captured["calls"].append(kwargs)
+            return {"ResponseMetadata": {"HTTPStatusCode": 200}}
+
+    writer = S3Writer(
+        logger=logger_spy, s3_client=FakeS3Client(), bucket_name="my-bucket"
+    )
+
+    payload = b"SQLite format 3\x00"
+    writer.write_data_to_s3(
+        "book.sqlite3", payload, content_type="application/vnd.sqlite3"
+    )
+
+    call = captured["calls"][0]
+    assert call["Body"] == payload
+    assert call["ContentType"] == "application/vnd.sqlite3"
+
+
+def test_writes_dict_with_serializer(logger_spy):
+    """Serializes dict payloads with the configured serializer."""
+    captured = {"calls": []}
+
+    class FakeS3Client:
+        def put_object(self, **kwargs):
+            captured["calls"].append(kwargs)
+
+    class SerializerSpy:
+        def dumps(self, data):
+            return b"serialized"
+
+    writer = S3Writer(
+        logger=logger_spy,
+        s3_client=FakeS3Client(),
+        bucket_name="my-bucket",
+        serializer=SerializerSpy(),
+    )
+    writer.write_data_to_s3("test.json", {"a": 1})
+
+    assert captured["calls"][0]["Body"] == b"serialized"
+
+
+class CapturingS3Client:
+    """Record put_object calls, reading file-like bodies as boto3 would."""
+
+    def __init__(self):
+        self.calls = []
+
+    def put_object(self, **kwargs):
+        body = kwargs["Body"]
+        kwargs["sent"] = body.read() if hasattr(body, "read") else bytes(body)
+        self.calls.append(kwargs)
+
+
+def test_writes_bytes_without_copying(logger_spy):
+    """Passes bytes straight through, leaving the checksum to botocore."""
+    client = CapturingS3Client()
+    writer = S3Writer(logger=logger_spy, s3_client=client, bucket_name="my-bucket")
+
+    payload = b'{"a": 1}'
+    writer.write_data_to_s3("test.json", payload)
+
+    assert client.calls[0]["Body"] is payload
+    assert "ContentMD5" not in client.calls[0]
+
+
+def test_writes_memoryview(logger_spy):
+    """Wraps a memoryview in a reader over the same buffer."""
+    client = CapturingS3Client()
+    writer = S3Writer(logger=logger_spy, s3_client=client, bucket_name="my-bucket")
+
+    payload = bytearray(b"0123456789")
+    writer.write_data_to_s3("test.bin", memoryview(payload)[2:8])
+
+    call = client.calls[0]
+    assert isinstance(call["Body"], MemoryviewReader)
+    assert call["Body"].view.obj is payload
+    assert call["sent"] == b"234567"
+
+
+def test_writes_file_like(logger_spy):
+    """Uploads file-like payloads from their current position."""
+    client = CapturingS3Client()
+    writer = S3Writer(logger=logger_spy, s3_client=client, bucket_name="my-bucket")
+
+    stream = io.BytesIO(b"skip:payload")
+    stream.seek(5)
+    writer.write_data_to_s3("test.bin", stream)
+
+    call = client.calls[0]
+    assert call["Body"] is stream
+    assert call["sent"] == b"payload"
+
+
+def test_memoryview_reader_seek_and_len():
+    """Supports the seek/tell/len calls boto3 uses to size and retry bodies."""
+    reader = MemoryviewReader(memoryview(b"abcdef"))
+
+    assert len(reader) == 6
+    assert reader.read(4) == b"abcd"
+    assert reader.tell() == 4
+    assert reader.seek(-2, io.SEEK_END) == 4
+    assert reader.read() == b"ef"
+    reader.seek(0)
+    assert reader.read() == b"abcdef"
+
+
+def test_file_range_reader_seek_and_len():
+    """Reads part of a file from its own position, leaving the file's alone."""
+    with tempfile.TemporaryFile() as file:
+        file.write(b"xxabcdef")
+        file.seek(1)
+        reader = FileRangeReader(file.fileno(), 2, 8)
+
+        assert len(reader) == 6
+        assert reader.read(4) == b"abcd"
+        assert reader.tell() == 4
+        assert reader.seek(-2, io.SEEK_END) == 4
+        assert reader.read() == b"ef"
+        assert reader.read() == b""
+        reader.seek(0)
+        assert reader.read() == b"abcdef"
+        assert file.tell() == 1
+
+
 def test_writes_to_s3_error_logs(logger_spy):
     """Logs an error and raises when the S3 upload fails."""
 
@@ -81,3 +213,122 @@ def test_write_data_when_none(logger_spy):
         writer.write_data_to_s3("k.json", None)
 
     assert any("filename or data is empty" in m for m in logger_spy.errors)
+
+
+class BarrierS3Client(CapturingS3Client):
+    """Blocks each upload until every target's upload has started."""
+
+    def __init__(self, barrier, fail=False):
+        super().__init__()
+        self.barrier = barrier
+        self.fail = fail
+
+    def put_object(self, **kwargs):
+        self.barrier.wait(timeout=5)
+        if self.fail:
+            raise RuntimeError("region unavailable")
+        super().put_object(**kwargs)
+
+
+def test_writes_to_replicas_concurrently(logger_spy):
+    """Uploads to the primary and every replica at the same time."""
+    barrier = threading.Barrier(3)
+    primary = BarrierS3Client(barrier)
+    replicas = [
+        ("bucket-dr", BarrierS3Client(barrier)),
+        ("bucket-us", BarrierS3Client(barrier)),
+    ]
+    writer = S3Writer(
+        logger=logger_spy,
+        s3_client=primary,
+        bucket_name="my-bucket",
+        replicas=replicas,
+    )
+
+    payload = bytearray(b"0123456789")
+    results = writer.write_data_to_s3("test.bin", memoryview(payload)[2:8])
+
+    assert set(results) == {"my-bucket", "bucket-dr", "bucket-us"}
+    assert all(result["ok"] for result in results.values())
+    for bucket_name, client in [("my-bucket", primary)] + replicas:
+        call = client.calls[0]
+        assert call["Bucket"] == bucket_name
+        assert call["sent"] == b"234567"
+    assert "to 3 S3 targets" in logger_spy.infos[-1]
+
+
+def test_writes_file_to_replicas_without_reading_it(logger_spy):
+    """Gives each target its own reader over a real file, from the file's position."""
+    barrier = threading.Barrier(3)
+    primary = BarrierS3Client(barrier)
+    replicas = [
+        ("bucket-dr", BarrierS3Client(barrier)),
+        ("bucket-us", BarrierS3Client(barrier)),
+    ]
+    writer = S3Writer(
+        logger=logger_spy,
+        s3_client=primary,
+        bucket_name="my-bucket",
+        replicas=replicas,
+    )
+
+    with tempfile.TemporaryFile() as file:
+        file.write(b"skip" + b"payload" * 1000)
+        file.seek(4)
+        writer.write_data_to_s3("test.bin", file)
+
+    readers = set()
+    for _, client in [("my-bucket", primary)] + replicas:
+        call = client.calls[0]
+        assert isinstance(call["Body"], FileRangeReader)
+        assert call["sent"] == b"payload" * 1000
+        readers.add(id(call["Body"]))
+    assert len(readers) == 3
+
+
+def test_writes_file_like_to_replicas(logger_spy):
+    """Reads a stream that isn't a file once and sends the same bytes to every target."""
+    primary = CapturingS3Client()
+    replica = CapturingS3Client()
+    writer = S3Writer(
+        logger=logger_spy,
+        s3_client=primary,
+        bucket_name="my-bucket",
+        replicas=[("bucket-dr", replica)],
+    )
+
+    writer.write_data_to_s3("test.bin", io.BytesIO(b"payload"))
+
+    assert primary.calls[0]["sent"] == b"payload"
+    assert replica.calls[0]["sent"] == b"payload"
+
+
+def test_replica_failure_reported_per_target(logger_spy):
+    """Finishes the other uploads, then raises naming the failed target."""
+    barrier = threading.Barrier(2)
+    primary = BarrierS3Client(barrier)
+    writer = S3Writer(
+        logger=logger_spy,
+        s3_client=primary,
+        bucket_name="my-bucket",
+        replicas=[("bucket-us", BarrierS3Client(barrier, fail=True))],
+    )
+
+    with pytest.raises(Exception) as excinfo:
+        writer.write_data_to_s3("test.json", {"a": 1})
+
+    assert "1 of 2 S3 targets" in str(excinfo.value)
+    assert "bucket-us: region unavailable" in str(excinfo.value)
+    assert len(primary.calls) == 1
+    assert logger_spy.errors == [str(excinfo.value)]
+
+
+def test_parse_replica_targets():
+    """Parses bucket:region pairs and rejects incomplete ones."""
+    assert parse_replica_targets(None) == []
+    assert parse_replica_targets(" book-dr:eu-west-1 , book-us:us-east-1,") == [
+        ("book-dr", "eu-west-1"),
+        ("book-us", "us-east-1"),
+    ]
+    with pytest.raises(ValueError):
+        parse_replica_targets("book-dr")
@@ -0,0 +1,117 @@
+import io
+import json
+from collections.abc import Mapping
+import pytest
+import serializer
+from serializer import JsonSerializer
+
+PAYLOADS = [
+    {},
+    {"alice": ["alice@ons.gov.uk", "a2@ons.gov.uk"], "bob": []},
+    {"alice@ons.gov.uk": "alice"},
+    {"alice": 101, "bob": 2**40},
+    {"ünïcode": "naïve@ons.gov.uk"},
+    {"control": '\x00\x1f\b\t\n"\\/', "del": "\x7f"},
+    {"huge": 2**70},
+]
+
+
+@pytest.mark.parametrize("backend", ["auto", "json"])
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_dumps_matches_stdlib(backend, payload):
+    """Compatibility mode is byte-identical to json.dumps(indent=2)."""
+    body = JsonSerializer(backend).dumps(payload)
+
+    assert isinstance(body, bytes)
+    assert body == json.dumps(payload, indent=2).encode("utf-8")
+
+
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_dumps_orjson_matches_stdlib(payload):
+    """The orjson backend is byte-identical in compatibility mode."""
+    pytest.importorskip("orjson")
+
+    body = JsonSerializer("orjson").dumps(payload)
+
+    assert body == json.dumps(payload, indent=2).encode("utf-8")
+
+
+@pytest.mark.parametrize("backend", ["auto", "json"])
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_dumps_compact_matches_stdlib(backend, payload):
+    """Compact mode matches json.dumps without whitespace."""
+    body = JsonSerializer(backend, compact=True).dumps(payload)
+
+    assert body == json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def test_dumps_non_compatible_writes_utf8():
+    """Without compatibility mode non-ASCII is written as UTF-8."""
+    body = JsonSerializer(compatible=False).dumps({"ünïcode": "naïve"})
+
+    assert "ünïcode".encode("utf-8") in body
+    assert json.loads(body) == {"ünïcode": "naïve"}
+
+
+def test_auto_falls_back_to_stdlib(monkeypatch):
+    """Uses the stdlib when orjson is not installed."""
+    monkeypatch.setattr(serializer, "orjson", None)
+
+    assert JsonSerializer().backend == "json"
+
+    with pytest.raises(ImportError):
+        JsonSerializer("orjson")
+
+
+def test_unknown_backend():
+    """Rejects unknown backend names."""
+    with pytest.raises(ValueError):
+        JsonSerializer("yaml")
+
+
+class StreamedMapping(Mapping):
+    """A mapping that is not a dict, so dump streams it entry by entry."""
+
+    def __init__(self, data):
+        self.data = data
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+
+@pytest.mark.parametrize("compact", [False, True])
+@pytest.mark.parametrize("backend", ["auto", "json"])
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_dump_streams_mapping_like_dumps(backend, compact, payload):
+    """Streaming a mapping writes exactly what dumps returns for the same dict."""
+    json_serializer = JsonSerializer(backend, compact=compact)
+    output = io.BytesIO()
+
+    written = json_serializer.dump(StreamedMapping(payload), output)
+
+    assert output.getvalue() == json_serializer.dumps(payload)
+    assert written == len(output.getvalue())
+
+
+def test_dump_streams_in_buffered_writes(monkeypatch):
+    """Large mappings are written in several buffered chunks."""
+    monkeypatch.setattr(serializer, "STREAM_BUFFER_SIZE", 64)
+    payload = {f"user{i}": [f"user{i}@ons.gov.uk"] for i in range(50)}
+    writes = []
+
+    class Output(io.BytesIO):
+        def write(self, data):
+            writes.append(len(data))
+            return super().write(data)
+
+    output = Output()
+    JsonSerializer("json").dump(StreamedMapping(payload), output)
+
+    assert len(writes) > 1
+    assert output.getvalue() == json.dumps(payload, indent=2).encode("utf-8")
@@ -0,0 +1,134 @@
+import json
+import snapshot_cache
+from snapshot_cache import SnapshotCache, diff_members
+from fixtures import local_s3, logger_spy
+
+BUCKET = "bucket"
+MAPS = (
+    {"alice": ["a@ons.gov.uk"], "bob": ["b@ons.gov.uk"]},
+    {"a@ons.gov.uk": "alice", "b@ons.gov.uk": "bob"},
+    {"alice": 101, "bob": 202},
+)
+FILES = (
+    "addressBookUsernameKey.json",
+    "addressBookEmailKey.json",
+    "addressBookIDKey.json",
+)
+
+
+def publish(s3, maps):
+    """Publishes the maps, returning each key's ETag as put_object gave it."""
+    etags = {}
+    for file_name, data in zip(FILES, maps):
+        key = "AddressBook/" + file_name
+        etags[key] = s3.put_object(
+            Bucket=BUCKET, Key=key, Body=json.dumps(data, indent=2).encode()
+        )["ETag"]
+    return etags
+
+
+def calls(s3, operation):
+    return [call for call in s3.calls if call[0] == operation]
+
+
+def test_nothing_published(local_s3, logger_spy, tmp_path):
+    """Returns None before the first publish."""
+    cache = SnapshotCache(logger_spy, local_s3, BUCKET, str(tmp_path / "snapshot"))
+
+    assert cache.load() is None
+    assert calls(local_s3, "get_object") == []
+
+
+def test_cold_load_downloads_and_snapshots(local_s3, logger_spy, tmp_path):
+    """Downloads the published files once, then serves warm loads from /tmp."""
+    publish(local_s3, MAPS)
+    path = tmp_path / "snapshot"
+
+    assert SnapshotCache(logger_spy, local_s3, BUCKET, str(path)).load() == MAPS
+    assert len(calls(local_s3, "get_object")) == 3
+    assert path.exists()
+
+    # A later warm invocation only checks the ETags
+    assert SnapshotCache(logger_spy, local_s3, BUCKET, str(path)).load() == MAPS
+    assert len(calls(local_s3, "get_object")) == 3
+    assert len(calls(local_s3, "head_object")) == 6
+
+
+def test_stale_snapshot_downloads_again(local_s3, logger_spy, tmp_path):
+    """A file republished by another run makes the snapshot stale."""
+    publish(local_s3, MAPS)
+    cache = SnapshotCache(logger_spy, local_s3, BUCKET, str(tmp_path / "snapshot"))
+    cache.load()
+
+    changed = ({"carol": ["c@ons.gov.uk"]}, {"c@ons.gov.uk": "carol"}, {"carol": 303})
+    publish(local_s3, changed)
+
+    assert cache.load() == changed
+    assert len(calls(local_s3, "get_object")) == 6
+
+
+def test_save_makes_next_load_warm(local_s3, logger_spy, tmp_path):
+    """Saving after a publish records the new ETags, so the next load downloads nothing."""
+    cache = SnapshotCache(logger_spy, local_s3, BUCKET, str(tmp_path / "snapshot"))
+    etags = publish(local_s3, MAPS)
+
+    cache.save(MAPS, etags)
+
+    assert calls(local_s3, "head_object") == []
+    assert cache.load() == MAPS
+    assert calls(local_s3, "get_object") == []
+
+
+def test_save_needs_every_etag(local_s3, logger_spy, tmp_path):
+    """Doesn't snapshot maps it can't validate later."""
+    path = tmp_path / "snapshot"
+    etags = publish(local_s3, MAPS)
+    etags["AddressBook/addressBookIDKey.json"] = None
+
+    SnapshotCache(logger_spy, local_s3, BUCKET, str(path)).save(MAPS, etags)
+
+    assert not path.exists()
+    assert logger_spy.warnings
+
+
+def test_save_skips_maps_not_in_memory(local_s3, logger_spy, tmp_path):
+    """Doesn't load streamed member store maps into memory to snapshot them."""
+    from types import MappingProxyType
+
+    path = tmp_path / "snapshot"
+    etags = publish(local_s3, MAPS)
+
+    SnapshotCache(logger_spy, local_s3, BUCKET, str(path)).save(
+        tuple(MappingProxyType(data) for data in MAPS), etags
+    )
+
+    assert not path.exists()
+
+
+def test_unreadable_snapshot_ignored(local_s3, logger_spy, tmp_path):
+    """A corrupt snapshot is replaced from S3."""
+    path = tmp_path / "snapshot"
+    path.write_bytes(b"\x00not marshal")
+    publish(local_s3, MAPS)
+
+    assert SnapshotCache(logger_spy, local_s3, BUCKET, str(path)).load() == MAPS
+    assert logger_spy.warnings
+
+
+def test_default_path_in_temp_dir(local_s3, logger_spy, monkeypatch, tmp_path):
+    """Uses DEFAULT_SNAPSHOT_PATH when no path is given."""
+    monkeypatch.setattr(snapshot_cache, "DEFAULT_SNAPSHOT_PATH", str(tmp_path / "s"))
+
+    assert SnapshotCache(logger_spy, local_s3, BUCKET).path == str(tmp_path / "s")
+
+
+def test_diff_members():
+    """Lists added, removed and changed usernames."""
+    previous = {"alice": ["a@ons.gov.uk"], "bob": ["b@ons.gov.uk"]}
+    current = {"alice": ["a2@ons.gov.uk"], "carol": ["c@ons.gov.uk"]}
+
+    assert diff_members(previous, current) == {
+        "added": ["carol"],
+        "removed": ["bob"],
+        "changed": ["alice"],
+    }
@@ -0,0 +1,128 @@
+import sqlite3
+import sqlite_export
+from member_store import SqliteMemberStore
+from sqlite_export import build_address_book_db, normalise_key, SQLITE_PAGE_SIZE
+
+
+def _sample_maps():
+    user_to_email = {
+        "Alice": ["Alice@ons.gov.uk", "a2@ons.gov.uk"],
+        "bob": ["bob@ons.gov.uk"],
+    }
+    email_to_user = {
+        "Alice@ons.gov.uk": "Alice",
+        "a2@ons.gov.uk": "Alice",
+        "bob@ons.gov.uk": "bob",
+    }
+    user_to_id = {"Alice": 101}
+    return user_to_email, email_to_user, user_to_id
+
+
+def test_normalise_key():
+    """Trims and lower cases keys."""
+    assert normalise_key("  Alice@ONS.gov.uk ") == "alice@ons.gov.uk"
+
+
+def test_build_address_book_db(tmp_path):
+    """Writes members and emails with normalised lookup columns."""
+    path = build_address_book_db(*_sample_maps(), str(tmp_path / "book.sqlite3"))
+
+    connection = sqlite3.connect(path)
+    try:
+        page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+        assert page_size == SQLITE_PAGE_SIZE
+
+        members = connection.execute(
+            "SELECT login, login_normalised, database_id FROM members ORDER BY member_id"
+        ).fetchall()
+        assert members == [("Alice", "alice", 101), ("bob", "bob", None)]
+
+        row = connection.execute(
+            "SELECT m.login FROM emails e JOIN members m USING (member_id) "
+            "WHERE e.email_normalised = ?",
+            (normalise_key("ALICE@ons.gov.uk"),),
+        ).fetchone()
+        assert row == ("Alice",)
+
+        emails = connection.execute(
+            "SELECT email FROM emails WHERE member_id = 1 ORDER BY rowid"
+        ).fetchall()
+        assert emails == [("Alice@ons.gov.uk",), ("a2@ons.gov.uk",)]
+    finally:
+        connection.close()
+
+
+def test_build_address_book_db_uses_indexes(tmp_path):
+    """Lookups by normalised login and email are served from indexes."""
+    user_to_email = {f"user{i}": [f"user{i}@ons.gov.uk"] for i in range(500)}
+    email_to_user = {f"user{i}@ons.gov.uk": f"user{i}" for i in range(500)}
+    user_to_id = {f"user{i}": i for i in range(500)}
+    path = build_address_book_db(
+        user_to_email, email_to_user, user_to_id, str(tmp_path / "book.sqlite3")
+    )
+
+    connection = sqlite3.connect(path)
+    try:
+        login_plan = connection.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM members WHERE login_normalised = 'bob'"
+        ).fetchall()
+        email_plan = connection.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM emails WHERE email_normalised = 'x'"
+        ).fetchall()
+    finally:
+        connection.close()
+
+    assert "idx_members_login" in str(login_plan)
+    assert "idx_emails_email" in str(email_plan)
+
+
+def test_build_address_book_db_replaces_existing(tmp_path):
+    """An existing file at the target path is replaced, not appended to."""
+    target = str(tmp_path / "book.sqlite3")
+    build_address_book_db(*_sample_maps(), target)
+    build_address_book_db(
+        {"carol": ["c@ons.gov.uk"]}, {"c@ons.gov.uk": "carol"}, {}, target
+    )
+
+    connection = sqlite3.connect(target)
+    try:
+        logins = connection.execute("SELECT login FROM members").fetchall()
+    finally:
+        connection.close()
+
+    assert logins == [("carol",)]
+
+
+def test_build_address_book_db_in_batches(monkeypatch, tmp_path):
+    """Streams a SQLite member store's maps in batches, giving the same rows as dicts."""
+    monkeypatch.setattr(sqlite_export, "FETCH_SIZE", 2)
+    maps = _sample_maps()
+    maps[0]["carol"] = ["carol@ons.gov.uk"]
+    maps[1]["carol@ons.gov.uk"] = "carol"
+    # An email whose member is missing is left out, as with the dicts
+    maps[1]["ghost@ons.gov.uk"] = "ghost"
+    store = SqliteMemberStore(str(tmp_path))
+    store.add_members(
+        (username, emails, maps[2].get(username))
+        for username, emails in maps[0].items()
+    )
+
+    def rows(path):
+        connection = sqlite3.connect(path)
+        try:
+            return [
+                connection.execute(f"SELECT * FROM {table} ORDER BY rowid").fetchall()
+                for table in ("members", "emails")
+            ]
+        finally:
+            connection.close()
+
+    from_dicts = rows(build_address_book_db(*maps, str(tmp_path / "dicts.sqlite3")))
+    from_store = rows(
+        build_address_book_db(*store.views(), str(tmp_path / "store.sqlite3"))
+    )
+    store.close()
+
+    assert from_store == from_dicts
+    assert from_dicts[0][2] == (3, "carol", "carol", None)
+    assert len(from_dicts[1]) == 4
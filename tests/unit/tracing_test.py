@@ -0,0 +1,77 @@
+import json
+import threading
+from tracing import Tracer, NULL_TRACER
+
+
+def test_span_records_duration_and_args():
+    """Records each span with its args, including ones added inside the block."""
+    tracer = Tracer()
+
+    with tracer.span("s3.put_object", key="a.json") as span:
+        span["bytes"] = 10
+
+    assert len(tracer.spans) == 1
+    name, _, duration, thread_id, args = tracer.spans[0]
+    assert name == "s3.put_object"
+    assert duration >= 0
+    assert thread_id == threading.get_ident()
+    assert args == {"key": "a.json", "bytes": 10}
+
+
+def test_span_recorded_when_block_raises():
+    """A failing call still shows up in the trace."""
+    tracer = Tracer()
+
+    try:
+        with tracer.span("github.graphql_page", page=1):
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+
+    assert [span[0] for span in tracer.spans] == ["github.graphql_page"]
+
+
+def test_disabled_tracer_records_nothing():
+    """The shared disabled tracer never collects spans."""
+    with NULL_TRACER.span("json.dumps") as span:
+        span["bytes"] = 1
+
+    assert NULL_TRACER.spans == []
+
+
+def test_chrome_trace_export(tmp_path):
+    """Writes complete events in microseconds that trace viewers can load."""
+    tracer = Tracer()
+    with tracer.span("github.get_access_token"):
+        pass
+    with tracer.span("json.dumps", backend="json"):
+        pass
+
+    path = tmp_path / "trace.json"
+    tracer.write_chrome_trace(str(path))
+    trace = json.loads(path.read_text())
+
+    events = trace["traceEvents"]
+    assert [event["name"] for event in events] == [
+        "github.get_access_token",
+        "json.dumps",
+    ]
+    assert all(event["ph"] == "X" for event in events)
+    assert events[0]["cat"] == "github"
+    assert events[1]["args"] == {"backend": "json"}
+    assert events[1]["ts"] >= events[0]["ts"]
+
+
+def test_summary_totals_by_name():
+    """Summarises count, total and max time per span name."""
+    tracer = Tracer()
+    tracer.spans = [
+        ("s3.put_object", 0, 2_000_000, 1, {}),
+        ("s3.put_object", 0, 4_000_000, 1, {}),
+        ("json.dumps", 0, 500_000, 1, {}),
+    ]
+
+    assert tracer.summary() == {
+        "s3.put_object": {"count": 2, "total_ms": 6.0, "max_ms": 4.0},
+        "json.dumps": {"count": 1, "total_ms": 0.5, "max_ms": 0.5},
+    }